@@ -0,0 +1,112 @@
+"""
+Benchmark de carga de la API en proceso.
+
+Lanza POST /recommendation con concurrencia creciente mientras sondea
+GET /health, y muestra p50/p99 de ambos. Con el disco simulado lento
+(--disk-latency-ms) se ve si la E/S bloquea el event loop: el p99 de
+/health debe mantenerse plano al subir la concurrencia.
+
+Uso:
+    poetry run python -m benchmarks.api_load --levels 1 4 16 64 --requests 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _run_level(client, concurrency: int, total: int, think: float) -> Dict[str, List[float]]:
+    """Ejecuta `total` POST con `concurrency` workers y sondea /health en paralelo."""
+    post_latencies: List[float] = []
+    probe_latencies: List[float] = []
+    remaining = total
+    done = asyncio.Event()
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.post("/recommendation", json={"current_energy": 7})
+            response.raise_for_status()
+            post_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(think)
+
+    async def probe() -> None:
+        # La latencia se mide desde el instante programado, así que un loop
+        # bloqueado se refleja aunque el sondeo no llegue a ejecutarse a tiempo
+        interval = 0.005
+        while not done.is_set():
+            scheduled = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            await client.get("/health")
+            probe_latencies.append(time.perf_counter() - scheduled)
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    done.set()
+    await probe_task
+    return {"post": post_latencies, "health": probe_latencies}
+
+
+async def _main(args: argparse.Namespace) -> None:
+    import httpx
+
+    from src.api.dependencies import container
+    from src.api.main import app
+
+    recommendation_engine = container.engine
+
+    if args.disk_latency_ms:
+        # Tanto el guardado directo como el write-behind pasan por aquí
+        original_write = recommendation_engine.write_current_json
+
+        def slow_write(recommendation):
+            time.sleep(args.disk_latency_ms / 1000)
+            return original_write(recommendation)
+
+        recommendation_engine.write_current_json = slow_write
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'conc':>5} {'post p50':>10} {'post p99':>10} {'health p50':>11} {'health p99':>11}")
+        for level in args.levels:
+            result = await _run_level(client, level, args.requests, args.think_ms / 1000)
+            post, health = result["post"], result["health"] or [0.0]
+            print(
+                f"{level:>5} "
+                f"{statistics.median(post) * 1000:>8.1f}ms {_percentile(post, 99) * 1000:>8.1f}ms "
+                f"{statistics.median(health) * 1000:>9.1f}ms {_percentile(health, 99) * 1000:>9.1f}ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="POST por nivel")
+    parser.add_argument("--disk-latency-ms", type=float, default=20.0, help="latencia simulada del disco")
+    parser.add_argument("--think-ms", type=float, default=5.0, help="pausa de cada cliente entre peticiones")
+    args = parser.parse_args()
+
+    # Directorios temporales para no tocar el vault real
+    workdir = tempfile.mkdtemp(prefix="campo-bench-")
+    os.environ.setdefault("PROJECT_ROOT", workdir)
+    os.environ.setdefault("OBSIDIAN_VAULT_PATH", os.path.join(workdir, "vault"))
+    os.environ.setdefault("ANYTYPE_EXPORT_PATH", os.path.join(workdir, "data", "anytype-exports"))
+    os.environ.setdefault("CACHE_PATH", os.path.join(workdir, "cache"))
+
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
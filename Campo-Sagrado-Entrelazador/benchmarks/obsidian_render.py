@@ -0,0 +1,70 @@
+"""
+Benchmark de renderizado y exportación de notas de Obsidian.
+
+Mide las notas/s de las plantillas precompiladas (dashboard + sección diaria) y
+el tiempo de export_many sobre un vault temporal, en frío y sin cambios.
+
+Uso:
+    poetry run python -m benchmarks.obsidian_render --notes 20000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+
+def _rate(render: Callable, recommendations: List) -> float:
+    """Notas por segundo de `render` sobre todas las recomendaciones."""
+    start = time.perf_counter()
+    for recommendation in recommendations:
+        render(recommendation)
+    return len(recommendations) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=20000, help="recomendaciones a renderizar")
+    parser.add_argument("--days", type=int, default=365, help="días distintos para export_many")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="campo-bench-")
+    os.environ.setdefault("PROJECT_ROOT", workdir)
+    os.environ.setdefault("OBSIDIAN_VAULT_PATH", os.path.join(workdir, "vault"))
+    os.environ.setdefault("CACHE_PATH", os.path.join(workdir, "cache"))
+
+    import numpy as np
+    import pandas as pd
+
+    from src.core.recommendation_engine import SacralRecommendationEngine
+    from src.services.markdown_templates import DAILY_SECTION_TEMPLATE, DASHBOARD_TEMPLATE, recommendation_fields
+    from src.services.obsidian_exporter import obsidian_exporter
+
+    engine = SacralRecommendationEngine()
+    freq = pd.Timedelta(days=args.days) / args.notes
+    timestamps = pd.date_range("2024-01-01", periods=args.notes, freq=freq, tz="UTC")
+    energies = np.random.default_rng(0).integers(1, 11, args.notes)
+    recommendations = list(engine.generate_batch(energies, timestamps))
+
+    def compiled(recommendation):
+        fields = recommendation_fields(recommendation)
+        return DASHBOARD_TEMPLATE.render(fields), DAILY_SECTION_TEMPLATE.render(fields)
+
+    print(f"{'render (dashboard + sección)':<28} {_rate(compiled, recommendations):>10,.0f} notas/s")
+
+    for label in ("export_many (frío)", "export_many (sin cambios)"):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = obsidian_exporter.export_many(recommendations)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<28} {elapsed * 1000:>8.1f} ms  "
+            f"escritas={result['written']} omitidas={result['skipped']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark de tokens de los prompts de análisis.
+
+Compara, para los mismos datos, el prompt antiguo (filas crudas con
+json.dumps(indent=2)) con el prompt con presupuesto (estadísticas
+precalculadas + filas compactas recortadas al presupuesto).
+
+Uso:
+    poetry run python -m benchmarks.prompt_tokens --per-day 40
+    poetry run python -m benchmarks.prompt_tokens --stub   # además, llamadas reales contra el stub local
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+
+LEGACY_WEEKLY = """
+        Analiza estos datos semanales y proporciona insights accionables:
+
+        {data}
+
+        Identifica:
+        1. PATRÓN PRINCIPAL: ¿Cuál es el pattern más significativo?
+        2. MOMENTO ÓPTIMO: ¿Cuándo la persona tiene mejor rendimiento?
+        3. PUNTO DE MEJORA: ¿Qué ajuste tendría mayor impacto?
+        4. PREDICCIÓN: Basado en patterns, ¿qué esperar la próxima semana?
+        5. EXPERIMENTO: Sugiere un experimento para la próxima semana
+
+        Formato: JSON estructurado con estas 5 secciones.
+        """
+
+LEGACY_PATTERN = """
+        Analiza estos patrones de decisión:
+
+        {data}
+
+        Identifica:
+        1. Patrón principal en las decisiones
+        2. Correlación entre energía y satisfacción
+        3. Momentos óptimos para diferentes tipos de decisiones
+        4. Recomendaciones específicas para mejorar
+
+        Responde en formato JSON con estructura:
+        {{
+            "pattern_type": "tipo de patrón identificado",
+            "confidence": 0.0-1.0,
+            "insight": "insight principal",
+            "recommendations": ["rec1", "rec2", "rec3"],
+            "energy_correlation": 0.0-1.0
+        }}
+        """
+
+
+def _week(per_day: int, seed: int = 0) -> Dict[str, Any]:
+    """Una semana sintética de decisiones y registros de energía."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 3, 4, 6, tzinfo=timezone.utc)
+    step = timedelta(hours=16) / per_day
+    decisions: List[Dict[str, Any]] = []
+    for day in range(7):
+        for i in range(per_day):
+            moment = start + timedelta(days=day) + i * step
+            energy = float(rng.uniform(1, 10))
+            decisions.append({
+                "id": f"{day:02d}{i:04d}{rng.integers(1 << 32):08x}",
+                "timestamp": moment.isoformat(),
+                "recommended": "A" if rng.random() < 0.6 else "B",
+                "confidence": float(rng.uniform(0.5, 0.95)),
+                "phase": None,
+                "prayer_time": None,
+                "chosen": "A" if rng.random() < 0.55 else "B",
+                "satisfaction": float(np.clip(energy * 0.5 + rng.normal(4, 1.2), 1, 10)),
+                "energy_before": energy,
+                "energy_after": float(np.clip(energy + rng.normal(0.5, 1), 1, 10)),
+            })
+    energy_log = [
+        {"timestamp": (start + timedelta(hours=h)).isoformat(), "energy": float(rng.uniform(1, 10))}
+        for h in range(0, 7 * 24, 2)
+    ]
+    return {"week": "2024-W10", "decisions": decisions, "energy_log": energy_log}
+
+
+def _report(label: str, prompt: str, system: str, elapsed: float) -> int:
+    from src.services.prompt_budget import estimate_tokens
+
+    tokens = estimate_tokens(system) + estimate_tokens(prompt)
+    print(f"{label:<34} {tokens:>8,} tokens  {len(prompt):>9,} chars  {elapsed * 1000:>7.2f} ms")
+    return tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-day", type=int, default=40, help="decisiones por día de la semana sintética")
+    parser.add_argument("--stub", action="store_true", help="enviar ambos prompts al stub local de Anthropic")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="campo-bench-")
+    os.environ.setdefault("PROJECT_ROOT", workdir)
+    os.environ.setdefault("CACHE_PATH", os.path.join(workdir, "cache"))
+    os.environ["CLAUDE_CACHE_ENABLED"] = "false"
+
+    stub = None
+    if args.stub:
+        from src.services.anthropic_stub import AnthropicStub
+
+        stub = AnthropicStub().start()
+        os.environ["ANTHROPIC_BASE_URL"] = stub.url
+        os.environ["ANTHROPIC_API_KEY"] = "stub"
+
+    from src.services.ai_service import ClaudeService
+    from src.services.pattern_analytics import analyze_decisions
+
+    service = ClaudeService()
+    week = _week(args.per_day)
+    decisions = week["decisions"]
+    print(f"Semana sintética: {len(decisions)} decisiones, {len(week['energy_log'])} registros de energía\n")
+
+    service._weekly_request(_week(1, seed=1))  # calentamiento (importación de pandas)
+
+    start = time.perf_counter()
+    legacy_weekly = LEGACY_WEEKLY.format(data=json.dumps(week, indent=2))
+    legacy_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    weekly = service._weekly_request(week)
+    weekly_elapsed = time.perf_counter() - start
+    before = _report("semanal, filas crudas", legacy_weekly, weekly["system"], legacy_elapsed)
+    after = _report("semanal, con presupuesto", weekly["prompt"], weekly["system"], weekly_elapsed)
+    print(f"{'':<34} {before / after:>8.1f}x menos tokens\n")
+
+    # Las mismas estadísticas solo se pueden deducir del prompt antiguo enviando todas las filas
+    start = time.perf_counter()
+    legacy_pattern = LEGACY_PATTERN.format(data=json.dumps(decisions, indent=2))
+    legacy_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    pattern = service._pattern_request(decisions, None, analyze_decisions(decisions))
+    pattern_elapsed = time.perf_counter() - start
+    before = _report("patrones, filas crudas", legacy_pattern, pattern["system"], legacy_elapsed)
+    after = _report("patrones, con presupuesto", pattern["prompt"], pattern["system"], pattern_elapsed)
+    print(f"{'':<34} {before / after:>8.1f}x menos tokens")
+
+    if stub is not None:
+        print()
+        for label, prompt, request in (
+            ("semanal, filas crudas", legacy_weekly, weekly),
+            ("semanal, con presupuesto", weekly["prompt"], weekly),
+        ):
+            service._create_message(
+                prompt=prompt, system=request["system"], max_tokens=request["max_tokens"],
+                temperature=request["temperature"], kind=label,
+            )
+        for kind, totals in service.token_usage.stats().items():
+            print(f"{kind:<34} {totals['input_tokens']:>8,} tokens de entrada (según el stub)")
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Campo Sagrado - Historial de recomendaciones y decisiones
+Almacén local append-only (SQLite en modo WAL), equivalente en Python
+al modelo SacralDecision de prisma/schema.prisma
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.pattern_stats import PatternStats, observation
+from src.models.recommendation import Recommendation
+from src.utils import metrics
+from src.utils.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sacral_decisions (
+    id               TEXT PRIMARY KEY,
+    timestamp_ms     INTEGER NOT NULL,
+    question         TEXT NOT NULL,
+    context          TEXT,
+    response         TEXT NOT NULL DEFAULT 'unclear',
+    intensity        INTEGER NOT NULL,
+    recommended      TEXT NOT NULL,
+    confidence       REAL NOT NULL,
+    body_sensation   TEXT,
+    action_taken     TEXT,
+    pattern_detected TEXT,
+    prayer_time      TEXT,
+    hijri_date       TEXT,
+    lunar_phase      TEXT,
+    recommendation   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sacral_decisions_timestamp
+    ON sacral_decisions (timestamp_ms, id);
+
+CREATE TABLE IF NOT EXISTS decision_outcomes (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    decision_id   TEXT NOT NULL REFERENCES sacral_decisions (id),
+    recorded_ms   INTEGER NOT NULL,
+    chosen        TEXT,
+    satisfaction  REAL,
+    energy_before REAL,
+    energy_after  REAL,
+    outcome       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_decision_outcomes_decision
+    ON decision_outcomes (decision_id, recorded_ms);
+
+-- Agregados incrementales de los resultados (src/core/pattern_stats.py)
+CREATE TABLE IF NOT EXISTS pattern_stats (
+    id         INTEGER PRIMARY KEY CHECK (id = 1),
+    state      TEXT NOT NULL,
+    updated_ms INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS sacral_decisions_no_update
+    BEFORE UPDATE ON sacral_decisions
+    BEGIN SELECT RAISE(ABORT, 'sacral_decisions es append-only'); END;
+CREATE TRIGGER IF NOT EXISTS sacral_decisions_no_delete
+    BEFORE DELETE ON sacral_decisions
+    BEGIN SELECT RAISE(ABORT, 'sacral_decisions es append-only'); END;
+"""
+
+_DECISION_COLUMNS = (
+    "id, timestamp_ms, question, context, response, intensity, recommended, "
+    "confidence, prayer_time, recommendation"
+)
+
+
+def sqlite_path_from_url(database_url: str) -> str:
+    """Extrae la ruta de un DATABASE_URL sqlite:///... (solo se soporta SQLite)."""
+    prefix = "sqlite:///"
+    if not database_url.startswith(prefix):
+        raise ValueError(f"El historial local solo soporta SQLite, no: {database_url}")
+    return database_url[len(prefix):] or ":memory:"
+
+
+def encode_cursor(timestamp_ms: int, decision_id: str) -> str:
+    """Cursor opaco de paginación por clave (timestamp, id)."""
+    return base64.urlsafe_b64encode(f"{timestamp_ms}:{decision_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Inverso de encode_cursor; lanza ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp_ms, decision_id = raw.split(":", 1)
+        return int(timestamp_ms), decision_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def to_epoch_ms(moment: datetime) -> int:
+    """Milisegundos UTC; los datetime sin zona se interpretan como UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+class RecommendationHistoryStore:
+    """
+    Historial append-only de recomendaciones (sacral_decisions) y de sus
+    resultados (decision_outcomes). Nunca se actualiza ni borra una fila:
+    los resultados se añaden como filas nuevas.
+    """
+
+    def __init__(self, database_url: Optional[str] = None):
+        """Inicializa el almacén; la base de datos se abre en el primer uso."""
+        self.path = sqlite_path_from_url(database_url or settings.DATABASE_URL)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        # ":memory:" daría una base vacía (sin tablas) a cada conexión: los
+        # hilos y stream() comparten una base en memoria con nombre, que
+        # _memory_conn (conexión propia, sin uso) mantiene viva
+        self._memory_uri: Optional[str] = None
+        self._memory_conn: Optional[sqlite3.Connection] = None
+        if self.path == ":memory:":
+            self._memory_uri = f"file:campo-history-{uuid.uuid4().hex}?mode=memory&cache=shared"
+
+    def connect(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo (SQLite no comparte conexiones entre hilos)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        if self._memory_uri:
+            with self._schema_lock:
+                if self._memory_conn is None:
+                    self._memory_conn = sqlite3.connect(self._memory_uri, uri=True, check_same_thread=False)
+            conn = sqlite3.connect(self._memory_uri, uri=True, isolation_level=None, check_same_thread=False)
+        else:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+        return conn
+
+    # --- Escritura -------------------------------------------------------
+
+    def append(self, recommendation: Recommendation, prayer_time: Optional[str] = None) -> str:
+        """Añade una recomendación y devuelve su id."""
+        return self.append_many([recommendation], [prayer_time])[0]
+
+    @metrics.timed("history_save")
+    def append_many(
+        self,
+        recommendations: Iterable[Recommendation],
+        prayer_times: Optional[Iterable[Optional[str]]] = None,
+    ) -> List[str]:
+        """Inserta en bloque dentro de una sola transacción."""
+        recommendations = list(recommendations)
+        prayer_times = list(prayer_times) if prayer_times is not None else [None] * len(recommendations)
+        rows = [self._to_row(r, p) for r, p in zip(recommendations, prayer_times)]
+
+        conn = self.connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"INSERT INTO sacral_decisions ({_DECISION_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return [row[0] for row in rows]
+
+    def record_outcome(
+        self,
+        decision_id: str,
+        chosen: Optional[str] = None,
+        satisfaction: Optional[float] = None,
+        energy_before: Optional[float] = None,
+        energy_after: Optional[float] = None,
+        **outcome: Any,
+    ) -> None:
+        """
+        Añade el resultado de una decisión (satisfacción, energía, aprendizajes)
+        y actualiza los agregados de patrones en la misma transacción: el
+        resultado anterior de la decisión, si lo hay, se resta.
+
+        Raises:
+            KeyError: si la decisión no existe
+        """
+        conn = self.connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            decision = conn.execute(
+                "SELECT timestamp_ms, recommended, json_extract(context, '$.circadian_phase') "
+                "FROM sacral_decisions WHERE id = ?",
+                (decision_id,),
+            ).fetchone()
+            if decision is None:
+                raise KeyError(decision_id)
+            previous = conn.execute(
+                "SELECT chosen, satisfaction, energy_before, energy_after FROM decision_outcomes "
+                "WHERE decision_id = ? ORDER BY recorded_ms DESC, id DESC LIMIT 1",
+                (decision_id,),
+            ).fetchone()
+            stats = self._load_pattern_stats(conn)
+
+            conn.execute(
+                "INSERT INTO decision_outcomes (decision_id, recorded_ms, chosen, satisfaction, "
+                "energy_before, energy_after, outcome) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    decision_id, to_epoch_ms(datetime.now(timezone.utc)), chosen, satisfaction,
+                    energy_before, energy_after, json.dumps(outcome, ensure_ascii=False) if outcome else None,
+                ),
+            )
+            if previous is not None:
+                stats.remove(observation(*decision, *previous))
+            stats.add(observation(*decision, chosen, satisfaction, energy_before, energy_after))
+            self._save_pattern_stats(conn, stats)
+
+    def rebuild_pattern_stats(self) -> PatternStats:
+        """Recalcula los agregados de patrones desde el historial completo."""
+        conn = self.connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            stats = self._rebuild_pattern_stats(conn)
+        return stats
+
+    @staticmethod
+    def _to_row(recommendation: Recommendation, prayer_time: Optional[str]) -> tuple:
+        factors = recommendation.factors
+        return (
+            uuid.uuid4().hex,
+            to_epoch_ms(recommendation.timestamp),
+            f"¿{recommendation.option_a.action} o {recommendation.option_b.action}?",
+            json.dumps({
+                "energy_level": factors.get("user_energy"),
+                "circadian_phase": factors.get("circadian_phase"),
+                "cognitive_capacity": factors.get("cognitive_capacity"),
+                "time_of_day": recommendation.timestamp.strftime("%H:%M"),
+            }, ensure_ascii=False),
+            "unclear",
+            max(1, min(10, round(recommendation.confidence * 10))),
+            recommendation.recommended_option,
+            recommendation.confidence,
+            prayer_time,
+            recommendation.model_dump_json(),
+        )
+
+    # --- Lectura ---------------------------------------------------------
+
+    def iter_range(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[int, str]] = None,
+    ) -> Iterator[sqlite3.Row]:
+        """Recorre las filas en orden temporal sin cargarlas todas en memoria."""
+        sql, params = self._range_query(since, until, after, limit)
+        yield from self.connect().execute(sql, params)
+
+    def page(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[List[sqlite3.Row], Optional[str]]:
+        """Página por clave (timestamp, id): filas y cursor de la siguiente página."""
+        after = decode_cursor(cursor) if cursor else None
+        rows = list(self.iter_range(since, until, limit + 1, after))
+        if len(rows) <= limit:
+            return rows, None
+        last = rows[limit - 1]
+        return rows[:limit], encode_cursor(last["timestamp_ms"], last["id"])
+
+    def stream(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        batch_size: int = 500,
+    ) -> Iterator[List[sqlite3.Row]]:
+        """
+        Recorre el rango con un cursor del lado del servidor sobre una conexión
+        dedicada, en lotes de batch_size filas (memoria constante).
+
+        El cursor se valida al llamar, antes de empezar a iterar.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        sql, params = self._range_query(since, until, after)
+        return self._stream_batches(sql, params, batch_size)
+
+    def _stream_batches(self, sql: str, params: list, batch_size: int) -> Iterator[List[sqlite3.Row]]:
+        conn = self._open()
+        try:
+            result = conn.execute(sql, params)
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    def range(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[Recommendation]:
+        """Recomendaciones en [since, until) usando el índice por timestamp."""
+        return [
+            Recommendation.model_validate_json(row["recommendation"])
+            for row in self.iter_range(since, until, limit)
+        ]
+
+    def latest(self) -> Optional[Recommendation]:
+        """Última recomendación registrada."""
+        row = self.connect().execute(
+            "SELECT recommendation FROM sacral_decisions ORDER BY timestamp_ms DESC, id DESC LIMIT 1"
+        ).fetchone()
+        return Recommendation.model_validate_json(row["recommendation"]) if row else None
+
+    def count(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+        """Número de recomendaciones registradas (en [since, until) si se indica)."""
+        where, params = self._range_filter(since, until)
+        return self.connect().execute(f"SELECT COUNT(*) FROM sacral_decisions{where}", params).fetchone()[0]
+
+    def decisions(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        last: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Decisiones con su último resultado, en el formato que espera
+        ClaudeService.analyze_decision_patterns. Con last, solo las
+        `last` más recientes del rango (en orden cronológico).
+        """
+        sql, params = self._decisions_query(
+            "d.id, d.timestamp_ms, d.recommended, d.confidence, d.context, d.prayer_time, "
+            "o.chosen, o.satisfaction, o.energy_before, o.energy_after",
+            since, until, last,
+        )
+
+        decisions = []
+        for row in self.connect().execute(sql, params):
+            context = json.loads(row["context"] or "{}")
+            decisions.append({
+                "id": row["id"],
+                "timestamp_ms": row["timestamp_ms"],
+                "timestamp": datetime.fromtimestamp(row["timestamp_ms"] / 1000, timezone.utc).isoformat(),
+                "recommended": row["recommended"],
+                "confidence": row["confidence"],
+                "phase": context.get("circadian_phase"),
+                "prayer_time": row["prayer_time"],
+                "chosen": row["chosen"],
+                "satisfaction": row["satisfaction"],
+                "energy_before": row["energy_before"],
+                "energy_after": row["energy_after"],
+            })
+        return decisions
+
+    def pattern_stats(self) -> Dict[str, Any]:
+        """
+        Agregados de patrones de todas las decisiones con resultado, sin leer
+        el historial (se reconstruyen una vez si aún no existen).
+        """
+        row = self.connect().execute("SELECT state FROM pattern_stats WHERE id = 1").fetchone()
+        stats = PatternStats.from_json(row["state"]) if row else None
+        return (stats or self.rebuild_pattern_stats()).snapshot()
+
+    def decision_columns(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Las mismas decisiones que decisions(), como columnas NumPy para la
+        analítica local (sin crear un diccionario por fila).
+        """
+        sql, params = self._decisions_query(
+            "d.timestamp_ms, d.recommended, json_extract(d.context, '$.circadian_phase'), "
+            "o.chosen, o.satisfaction, o.energy_before, o.energy_after",
+            since, until,
+        )
+        cursor = self.connect().cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(sql, params).fetchall()
+        values = list(zip(*rows)) if rows else [()] * 7
+        return {
+            "timestamp_ms": np.array(values[0], dtype=float),
+            "recommended": np.array(values[1], dtype=object),
+            "phase": np.array(values[2], dtype=object),
+            "chosen": np.array(values[3], dtype=object),
+            "satisfaction": np.array(values[4], dtype=float),
+            "energy_before": np.array(values[5], dtype=float),
+            "energy_after": np.array(values[6], dtype=float),
+        }
+
+    def _decisions_query(
+        self,
+        columns: str,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        last: Optional[int] = None,
+    ) -> tuple:
+        """Decisiones unidas a su último resultado, en orden cronológico (las `last` últimas)."""
+        sql = (
+            f"SELECT {columns} "
+            "FROM sacral_decisions d "
+            "JOIN decision_outcomes o ON o.id = ("
+            "  SELECT id FROM decision_outcomes WHERE decision_id = d.id "
+            "  ORDER BY recorded_ms DESC, id DESC LIMIT 1)"
+        )
+        where, params = self._range_filter(since, until, column="d.timestamp_ms")
+        if last is None:
+            return sql + where + " ORDER BY d.timestamp_ms, d.id", params
+        sql += where + " ORDER BY d.timestamp_ms DESC, d.id DESC LIMIT ?"
+        return f"SELECT * FROM ({sql}) ORDER BY timestamp_ms, id", params + [last]
+
+    def _load_pattern_stats(self, conn: sqlite3.Connection) -> PatternStats:
+        """Agregados guardados (llamar dentro de una transacción)."""
+        row = conn.execute("SELECT state FROM pattern_stats WHERE id = 1").fetchone()
+        stats = PatternStats.from_json(row["state"]) if row else None
+        return stats or self._rebuild_pattern_stats(conn)
+
+    def _rebuild_pattern_stats(self, conn: sqlite3.Connection) -> PatternStats:
+        stats = PatternStats()
+        columns = self.decision_columns()
+        for values in zip(*(columns[name].tolist() for name in (
+            "timestamp_ms", "recommended", "phase", "chosen", "satisfaction", "energy_before", "energy_after"
+        ))):
+            stats.add(observation(*(None if value != value else value for value in values)))
+        self._save_pattern_stats(conn, stats)
+        return stats
+
+    @staticmethod
+    def _save_pattern_stats(conn: sqlite3.Connection, stats: PatternStats) -> None:
+        conn.execute(
+            "INSERT INTO pattern_stats (id, state, updated_ms) VALUES (1, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET state = excluded.state, updated_ms = excluded.updated_ms",
+            (stats.to_json(), to_epoch_ms(datetime.now(timezone.utc))),
+        )
+
+    def _range_query(
+        self,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        after: Optional[Tuple[int, str]] = None,
+        limit: Optional[int] = None,
+    ) -> tuple:
+        where, params = self._range_filter(since, until, after=after)
+        sql = f"SELECT {_DECISION_COLUMNS} FROM sacral_decisions{where} ORDER BY timestamp_ms, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    @staticmethod
+    def _range_filter(
+        since: Optional[datetime],
+        until: Optional[datetime],
+        column: str = "timestamp_ms",
+        after: Optional[Tuple[int, str]] = None,
+    ) -> tuple:
+        clauses, params = [], []
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(to_epoch_ms(since))
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(to_epoch_ms(until))
+        if after is not None:
+            clauses.append("(timestamp_ms, id) > (?, ?)")
+            params.extend(after)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+# Instancia global (la base de datos se abre en el primer uso)
+history_store = RecommendationHistoryStore()
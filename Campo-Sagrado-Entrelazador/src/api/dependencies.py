@@ -0,0 +1,149 @@
+"""
+Campo Sagrado - Dependencias de la API
+Contenedor de los servicios de la aplicación: cada uno se construye en su
+primer uso (importar la API no crea el motor, no abre la base de datos ni
+importa NumPy o el SDK de Anthropic)
+"""
+
+import threading
+from typing import Any, Callable, Dict
+
+from src.utils import metrics
+
+
+def _build_engine():
+    from src.core.recommendation_engine import SacralRecommendationEngine
+
+    engine = SacralRecommendationEngine()
+    cache = engine.prayer_cache
+    metrics.watch_cache(
+        "prayer_times",
+        lambda: {"hit": cache.hits, "stale_hit": cache.stale_hits, "miss": cache.misses},
+        hits=("hit", "stale_hit"),
+    )
+    return engine
+
+
+def _build_write_behind():
+    from src.services.persistence_queue import RecommendationWriteBehind
+
+    write_behind = RecommendationWriteBehind(container.engine)
+    metrics.watch_queue(
+        "write_behind",
+        lambda: write_behind.pending,
+        failures=lambda: {"failed": write_behind.failed_writes, "lost": write_behind.lost},
+    )
+    return write_behind
+
+
+def _build_current_cache():
+    from src.services.current_cache import CurrentRecommendationCache, load_current_recommendation
+
+    engine = container.engine
+    return CurrentRecommendationCache(
+        lambda: load_current_recommendation(engine.current_json_path, engine.history_store)
+    )
+
+
+def _build_guidance_prefetcher():
+    from src.services.guidance_prefetch import GuidancePrefetcher
+
+    prefetcher = GuidancePrefetcher(container.engine)
+    service = prefetcher.service
+    if service.cache is not None:
+        cache = service.cache
+        metrics.watch_cache(
+            "claude_responses",
+            lambda: {"hit": cache.hits, "disk_hit": cache.disk_hits, "miss": cache.misses,
+                     "bypass": cache.bypassed},
+            hits=("hit", "disk_hit"),
+        )
+    metrics.watch_queue("claude_in_flight", lambda: len(service._in_flight))
+    return prefetcher
+
+
+class Container:
+    """
+    Instancias compartidas de la aplicación, creadas bajo demanda.
+
+    override() sustituye una instancia (pruebas, benchmarks) y built()
+    indica si ya existe, para apagar solo lo que llegó a arrancarse.
+    """
+
+    _factories: Dict[str, Callable[[], Any]] = {
+        "engine": _build_engine,
+        "write_behind": _build_write_behind,
+        "current_cache": _build_current_cache,
+        "guidance_prefetcher": _build_guidance_prefetcher,
+    }
+
+    def __init__(self):
+        """Contenedor vacío."""
+        self._instances: Dict[str, Any] = {}
+        # Reentrante: unas fábricas piden otras instancias (p. ej. el motor)
+        self._lock = threading.RLock()
+
+    def get(self, name: str) -> Any:
+        """Instancia `name`, construyéndola la primera vez."""
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = self._factories[name]()
+        return instance
+
+    def built(self, name: str) -> bool:
+        return name in self._instances
+
+    def override(self, name: str, instance: Any) -> None:
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self) -> None:
+        """Olvida todas las instancias (la siguiente petición las vuelve a crear)."""
+        with self._lock:
+            self._instances.clear()
+
+    @property
+    def engine(self):
+        return self.get("engine")
+
+    @property
+    def write_behind(self):
+        return self.get("write_behind")
+
+    @property
+    def current_cache(self):
+        return self.get("current_cache")
+
+    @property
+    def guidance_prefetcher(self):
+        return self.get("guidance_prefetcher")
+
+
+# Instancia global
+container = Container()
+
+
+# Dependencias de FastAPI (Depends). Son corrutinas para que FastAPI no las
+# ejecute en su pool de hilos: en cuanto existen, resolverlas es inmediato
+
+async def get_engine():
+    return container.engine
+
+
+async def get_history_store():
+    return container.engine.history_store
+
+
+async def get_write_behind():
+    return container.write_behind
+
+
+async def get_current_cache():
+    return container.current_cache
+
+
+async def get_guidance_prefetcher():
+    return container.guidance_prefetcher
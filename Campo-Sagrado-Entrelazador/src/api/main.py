@@ -3,13 +3,53 @@ Campo Sagrado - API Principal
 Servidor FastAPI para el sistema de recomendaciones sacrales
 """
 
-from fastapi import FastAPI, HTTPException
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional
 
-from src.core.recommendation_engine import SacralRecommendationEngine
+from src.api.dependencies import (
+    container,
+    get_current_cache,
+    get_engine,
+    get_guidance_prefetcher,
+    get_history_store,
+    get_write_behind,
+)
 from src.models.recommendation import Recommendation
+from src.services.guidance_prefetch import PRAYERS
+from src.services.vault_index import vault_index
+from src.utils import metrics
+from src.utils.config import settings
+from src.utils.executors import pending_tasks, run_blocking, shutdown_io_executor
+from src.utils.profiling import ProfilingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque y apagado de la aplicación."""
+    if metrics.enabled():
+        metrics.watch_queue("io_executor", pending_tasks)
+        metrics.start_server()
+    if settings.VAULT_INDEX_WATCH:
+        await run_blocking(vault_index.start_watching)
+    if settings.GUIDANCE_PREFETCH_ENABLED:
+        container.guidance_prefetcher.start()
+    yield
+    # Solo se apaga lo que llegó a construirse
+    if container.built("guidance_prefetcher"):
+        await container.guidance_prefetcher.stop()
+    vault_index.stop_watching()
+    if container.built("write_behind"):
+        container.write_behind.stop()
+    shutdown_io_executor(wait=True)
+    metrics.stop_server()
+
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -17,7 +57,8 @@ app = FastAPI(
     description="Sistema de recomendaciones sacrales basado en ritmos naturales y autoridad interna",
     version="0.1.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -29,6 +70,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Perfil y Server-Timing bajo demanda (no hace nada con PROFILING_ENABLED=false)
+app.add_middleware(ProfilingMiddleware)
+
+# Latencia por endpoint (no hace nada con ENABLE_METRICS=false)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Modelos de respuesta
 class HealthResponse(BaseModel):
     status: str
@@ -43,12 +90,22 @@ class RecommendationResponse(BaseModel):
     recommendation: Recommendation
     message: str
 
+class OutcomeRequest(BaseModel):
+    chosen: Optional[str] = Field(None, pattern="^[AB]$")
+    satisfaction: Optional[float] = Field(None, ge=1, le=10)
+    energy_before: Optional[float] = Field(None, ge=1, le=10)
+    energy_after: Optional[float] = Field(None, ge=1, le=10)
+    notes: Optional[str] = None
+
 class ObsidianExportResponse(BaseModel):
     message: str
     files_created: Dict[str, str]
+    written: int = 0
+    skipped: int = 0
+
+# El motor, la persistencia en segundo plano, la recomendación actual en
+# memoria y la pre-generación de guías viven en src.api.dependencies.container
 
-# Instancia del motor de recomendaciones
-recommendation_engine = SacralRecommendationEngine()
 
 @app.get("/", response_model=HealthResponse)
 async def root():
@@ -71,7 +128,12 @@ async def health_check():
     )
 
 @app.post("/recommendation", response_model=RecommendationResponse)
-async def get_recommendation(request: RecommendationRequest):
+async def get_recommendation(
+    request: RecommendationRequest,
+    recommendation_engine=Depends(get_engine),
+    write_behind=Depends(get_write_behind),
+    current_cache=Depends(get_current_cache)
+):
     """Genera una nueva recomendación basada en el contexto proporcionado."""
     try:
         context = {"current_energy": request.current_energy}
@@ -79,8 +141,10 @@ async def get_recommendation(request: RecommendationRequest):
         
         recommendation = recommendation_engine.generate_binary_recommendation(context)
         
-        # Guardar la recomendación (esto también exporta a Obsidian automáticamente)
-        recommendation_engine.save_recommendation(recommendation)
+        # Guardar la recomendación (esto también exporta a Obsidian automáticamente).
+        # Se encola y la escritura a disco ocurre fuera del camino de la respuesta.
+        write_behind.submit(recommendation)
+        current_cache.set(recommendation)
         
         return RecommendationResponse(
             recommendation=recommendation,
@@ -90,23 +154,95 @@ async def get_recommendation(request: RecommendationRequest):
         raise HTTPException(status_code=500, detail=f"Error generando recomendación: {str(e)}")
 
 @app.get("/recommendation/current")
-async def get_current_recommendation():
-    """Obtiene la recomendación actual guardada."""
+async def get_current_recommendation(request: Request, current_cache=Depends(get_current_cache)):
+    """Obtiene la recomendación actual guardada (con ETag / 304)."""
     try:
-        from pathlib import Path
-        import json
-        
-        export_path = Path.home() / "Campo-Sagrado-Entrelazador" / "data" / "anytype-exports" / "daily"
-        json_path = export_path / "current_recommendation.json"
-        
-        if json_path.exists():
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return {"recommendation": data, "message": "Recomendación actual recuperada"}
-        else:
-            raise HTTPException(status_code=404, detail="No hay recomendación actual disponible")
+        entry = current_cache.get() if current_cache.loaded else await run_blocking(current_cache.get)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error recuperando recomendación: {str(e)}")
+    
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No hay recomendación actual disponible")
+    
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if entry.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def _history_line(row) -> str:
+    """Fila del historial como JSON sin re-serializar la recomendación guardada."""
+    return f'{{"id":"{row["id"]}","recommendation":{row["recommendation"]}}}'
+
+
+@app.get("/recommendations")
+async def list_recommendations(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    store=Depends(get_history_store)
+):
+    """
+    Historial de recomendaciones en [since, until).
+
+    - format=json: página de `limit` elementos con `next_cursor` (paginación por clave).
+    - format=ndjson: todo el rango en streaming, una recomendación por línea.
+    """
+    try:
+        if format == "ndjson":
+            batches = store.stream(since, until, cursor)
+
+            def ndjson():
+                for rows in batches:
+                    yield "".join(_history_line(row) + "\n" for row in rows).encode("utf-8")
+
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        rows, next_cursor = await run_blocking(store.page, since, until, cursor, limit)
+        items = ",".join(_history_line(row) for row in rows)
+        body = f'{{"items":[{items}],"next_cursor":{json.dumps(next_cursor)}}}'
+        return Response(content=body, media_type="application/json")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/recommendations/{decision_id}/outcome", status_code=201)
+async def record_outcome(decision_id: str, outcome: OutcomeRequest, store=Depends(get_history_store)):
+    """Registra el resultado de una decisión y actualiza las estadísticas de patrones."""
+    extra = {"notes": outcome.notes} if outcome.notes else {}
+    try:
+        await run_blocking(
+            store.record_outcome, decision_id, outcome.chosen, outcome.satisfaction,
+            outcome.energy_before, outcome.energy_after, **extra
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Decisión no encontrada: {decision_id}")
+    return {"id": decision_id, "recorded": True}
+
+@app.get("/patterns/stats")
+async def get_pattern_stats(store=Depends(get_history_store)):
+    """Estadísticas acumuladas de las decisiones (sin recorrer el historial)."""
+    try:
+        return await run_blocking(store.pattern_stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error leyendo estadísticas: {str(e)}")
+
+@app.get("/guidance/{prayer}")
+async def get_prayer_guidance(prayer: str, guidance_prefetcher=Depends(get_guidance_prefetcher)):
+    """Guía del rezo desde memoria (pre-generada o, si no la hay, la guía por defecto)."""
+    name = prayer.capitalize()
+    if name not in PRAYERS:
+        raise HTTPException(status_code=404, detail=f"Rezo desconocido: {prayer}")
+    entry = guidance_prefetcher.get(name)
+    if entry is None:
+        return {"prayer": name, "guidance": guidance_prefetcher.guidance(name), "prefetched": False}
+    return {
+        "prayer": name,
+        "guidance": entry.guidance,
+        "prefetched": True,
+        "at": entry.at.isoformat(),
+        "recommendation": entry.recommendation,
+    }
 
 @app.post("/export/obsidian", response_model=ObsidianExportResponse)
 async def export_to_obsidian():
@@ -115,14 +251,16 @@ async def export_to_obsidian():
         from src.services.obsidian_exporter import obsidian_exporter
         
         # Exportar desde el archivo JSON existente
-        obsidian_paths = obsidian_exporter.export_from_json_file()
+        obsidian_paths = await run_blocking(obsidian_exporter.export_from_json_file)
         
         return ObsidianExportResponse(
             message="Exportación a Obsidian completada exitosamente",
             files_created={
                 "dashboard": str(obsidian_paths["dashboard"]),
                 "daily": str(obsidian_paths["daily"])
-            }
+            },
+            written=obsidian_paths["written"],
+            skipped=obsidian_paths["skipped"]
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exportando a Obsidian: {str(e)}")
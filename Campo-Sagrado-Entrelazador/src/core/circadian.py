@@ -0,0 +1,98 @@
+"""
+Campo Sagrado - Curva circadiana
+Tabla precalculada por minuto del día con energía y capacidad cognitiva interpoladas
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+from src.utils.config import settings
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class CircadianPhase(BaseModel):
+    """Modelo para fase circadiana"""
+    model_config = ConfigDict(frozen=True)
+
+    phase: str
+    energy: float
+    cognitive_capacity: float
+    optimal_activity: str
+
+
+# Fases circadianas (índice usado por las tablas vectorizadas)
+PHASE_SPECS: Tuple[Dict[str, Any], ...] = (
+    {"phase": "AMANECER", "energy": 0.9, "cognitive_capacity": 0.95, "optimal_activity": "Trabajo profundo"},
+    {"phase": "MAÑANA", "energy": 0.85, "cognitive_capacity": 0.9, "optimal_activity": "Tareas creativas"},
+    {"phase": "MEDIODÍA", "energy": 0.6, "cognitive_capacity": 0.7, "optimal_activity": "Tareas colaborativas"},
+    {"phase": "TARDE", "energy": 0.7, "cognitive_capacity": 0.75, "optimal_activity": "Revisión y planificación"},
+    {"phase": "NOCHE", "energy": 0.4, "cognitive_capacity": 0.5, "optimal_activity": "Descanso y restauración"},
+)
+PHASE_NAMES = np.array([p["phase"] for p in PHASE_SPECS])
+# Energía nominal de cada fase: la que decide A/B (la curva suavizada solo se muestra)
+PHASE_ENERGY = np.array([p["energy"] for p in PHASE_SPECS])
+
+# Hora local -> índice de fase: 5-9 AMANECER, 9-13 MAÑANA, 13-16 MEDIODÍA, 16-20 TARDE, resto NOCHE
+HOUR_TO_PHASE = np.array([4] * 5 + [0] * 4 + [1] * 4 + [2] * 3 + [3] * 4 + [4] * 4, dtype=np.int8)
+
+# Centro de cada fase (minuto del día): ahí la curva toma el valor nominal de la fase
+PHASE_CENTERS = np.array([7 * 60, 11 * 60, 14 * 60 + 30, 18 * 60, 30])
+
+
+class CircadianCurve:
+    """
+    Tabla de 1440 entradas (una por minuto) con la fase, la energía y la
+    capacidad cognitiva. Cada entrada apunta a un CircadianPhase inmutable
+    compartido, así que consultar la fase no reserva memoria.
+    """
+
+    def __init__(self, smoothing: bool = True):
+        """Construye la tabla; con smoothing=False reproduce los escalones por hora."""
+        minutes = np.arange(MINUTES_PER_DAY)
+        self.phase_index = HOUR_TO_PHASE[minutes // 60]
+
+        nominal_energy = PHASE_ENERGY
+        nominal_cognitive = np.array([p["cognitive_capacity"] for p in PHASE_SPECS])
+        if smoothing:
+            self.energy = np.interp(minutes, PHASE_CENTERS, nominal_energy, period=MINUTES_PER_DAY)
+            self.cognitive = np.interp(minutes, PHASE_CENTERS, nominal_cognitive, period=MINUTES_PER_DAY)
+        else:
+            self.energy = nominal_energy[self.phase_index]
+            self.cognitive = nominal_cognitive[self.phase_index]
+        self.energy = np.round(self.energy, 3)
+        self.cognitive = np.round(self.cognitive, 3)
+        for array in (self.phase_index, self.energy, self.cognitive):
+            array.flags.writeable = False
+
+        shared: Dict[Tuple[int, float, float], CircadianPhase] = {}
+        phases = []
+        for idx, energy, cognitive in zip(self.phase_index.tolist(), self.energy.tolist(), self.cognitive.tolist()):
+            key = (idx, energy, cognitive)
+            if key not in shared:
+                spec = PHASE_SPECS[idx]
+                shared[key] = CircadianPhase(
+                    phase=spec["phase"],
+                    energy=energy,
+                    cognitive_capacity=cognitive,
+                    optimal_activity=spec["optimal_activity"],
+                )
+            phases.append(shared[key])
+        self.phases: Tuple[CircadianPhase, ...] = tuple(phases)
+
+    def phase_at(self, minute_of_day: int) -> CircadianPhase:
+        """Fase compartida para un minuto del día (0-1439)."""
+        return self.phases[minute_of_day]
+
+
+@lru_cache(maxsize=4)
+def _build_curve(smoothing: bool) -> CircadianCurve:
+    return CircadianCurve(smoothing=smoothing)
+
+
+def circadian_curve() -> CircadianCurve:
+    """Curva para la configuración actual; solo se reconstruye si cambia."""
+    return _build_curve(settings.CIRCADIAN_SMOOTHING)
@@ -0,0 +1,284 @@
+"""
+Campo Sagrado - Estadísticas incrementales de decisiones
+Agregados que se actualizan en O(1) con cada resultado registrado (Welford,
+co-momentos, contadores por hora y fase, medias con decaimiento temporal)
+"""
+
+import json
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import pytz
+
+from src.core.circadian import HOUR_TO_PHASE, PHASE_NAMES
+from src.utils.config import settings
+
+STATS_VERSION = 1
+
+OPTIONS = ("A", "B")
+
+# Vidas medias (días) de las medias con decaimiento: reciente frente a base
+HALF_LIVES_DAYS = (7, 30)
+
+# Diferencia mínima (puntos de satisfacción) entre ambas para hablar de tendencia
+TREND_THRESHOLD = 0.25
+
+_MS_PER_DAY = 86_400_000
+
+# Pares (x, y) con co-momentos: energía frente a satisfacción
+_PAIRS = ("energy_before", "energy_after", "energy_delta")
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+class PatternStats:
+    """
+    Agregados de las decisiones con satisfacción registrada.
+
+    Cada observación se suma (add) o se resta (remove) en tiempo constante,
+    de modo que un resultado corregido sustituye al anterior sin recorrer
+    el historial. El estado es un diccionario JSON de tamaño fijo.
+
+    snapshot() devuelve las mismas claves que pattern_analytics.analyze_columns
+    (la tendencia sale de las medias con decaimiento en lugar de ventanas).
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        """Parte de un estado guardado o de cero."""
+        self.state = state or self.empty_state()
+
+    @staticmethod
+    def empty_state() -> Dict[str, Any]:
+        return {
+            "version": STATS_VERSION,
+            # Welford: n, media y suma de cuadrados de las desviaciones
+            "satisfaction": [0, 0.0, 0.0],
+            # Co-momentos: n, media x, media y, M2 x, M2 y, C xy
+            "pairs": {name: [0, 0.0, 0.0, 0.0, 0.0, 0.0] for name in _PAIRS},
+            # [n, suma de satisfacción] por hora local y por fase
+            "by_hour": [[0, 0.0] for _ in range(24)],
+            "by_phase": [[0, 0.0] for _ in PHASE_NAMES],
+            "options": {key: [0, 0.0] for key in OPTIONS + ("followed", "overridden")},
+            # Medias con decaimiento: [suma ponderada, peso, timestamp de referencia]
+            "decayed": [[0.0, 0.0, None] for _ in HALF_LIVES_DAYS],
+        }
+
+    @classmethod
+    def from_json(cls, raw: str) -> Optional["PatternStats"]:
+        """Estado guardado; None si es de otra versión (hay que reconstruirlo)."""
+        state = json.loads(raw)
+        return cls(state) if state.get("version") == STATS_VERSION else None
+
+    def to_json(self) -> str:
+        return json.dumps(self.state, separators=(",", ":"))
+
+    # --- Actualización ---------------------------------------------------
+
+    def add(self, observation: Dict[str, Any]) -> None:
+        """Suma una decisión (ver observation())."""
+        self._apply(observation, 1)
+
+    def remove(self, observation: Dict[str, Any]) -> None:
+        """Resta una decisión sumada antes con los mismos valores."""
+        self._apply(observation, -1)
+
+    def _apply(self, obs: Dict[str, Any], sign: int) -> None:
+        satisfaction = obs.get("satisfaction")
+        if satisfaction is None:
+            return
+        state = self.state
+        state["satisfaction"] = _welford(state["satisfaction"], satisfaction, sign)
+
+        energy_before, energy_after = obs.get("energy_before"), obs.get("energy_after")
+        pair_values = {
+            "energy_before": energy_before,
+            "energy_after": energy_after,
+            "energy_delta": energy_after - energy_before
+            if energy_before is not None and energy_after is not None else None,
+        }
+        for name, x in pair_values.items():
+            if x is not None:
+                state["pairs"][name] = _comoment(state["pairs"][name], x, satisfaction, sign)
+
+        if obs.get("hour") is not None:
+            _bump(state["by_hour"][obs["hour"]], satisfaction, sign)
+        if obs.get("phase") is not None:
+            _bump(state["by_phase"][obs["phase"]], satisfaction, sign)
+
+        chosen = obs.get("chosen")
+        if chosen in OPTIONS:
+            _bump(state["options"][chosen], satisfaction, sign)
+            followed = "followed" if chosen == obs.get("recommended") else "overridden"
+            _bump(state["options"][followed], satisfaction, sign)
+
+        if obs.get("timestamp_ms") is not None:
+            for entry, half_life in zip(state["decayed"], HALF_LIVES_DAYS):
+                _decay(entry, obs["timestamp_ms"], satisfaction, sign, half_life)
+
+    # --- Lectura ---------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estadísticas actuales (formato de pattern_analytics.analyze_columns)."""
+        state = self.state
+        n, mean, m2 = state["satisfaction"]
+        if n <= 0:
+            return {"sample_size": 0}
+
+        options = {}
+        for option in OPTIONS:
+            count, total = state["options"][option]
+            options[option] = {
+                "count": count,
+                "share": round(count / n, 3),
+                "satisfaction": _round(total / count) if count else None,
+            }
+        followed, overridden = state["options"]["followed"], state["options"]["overridden"]
+        decided = followed[0] + overridden[0]
+        options["followed"] = {
+            "rate": round(followed[0] / decided, 3) if decided else None,
+            "satisfaction": _round(followed[1] / followed[0]) if followed[0] else None,
+            "satisfaction_overridden": _round(overridden[1] / overridden[0]) if overridden[0] else None,
+        }
+
+        return {
+            "sample_size": n,
+            "satisfaction_mean": round(mean, 2),
+            "satisfaction_std": round(math.sqrt(max(m2, 0.0) / n), 2),
+            "correlations": {name: _pearson(values) for name, values in state["pairs"].items()},
+            "by_hour": _breakdown(state["by_hour"]),
+            "by_phase": {str(PHASE_NAMES[code]): stats for code, stats in _breakdown(state["by_phase"]).items()},
+            "options": options,
+            "trend": self._trend(),
+        }
+
+    def _trend(self) -> Optional[Dict[str, Any]]:
+        """Media reciente (vida media corta) frente a la de base (vida media larga)."""
+        recent, baseline = (entry[0] / entry[1] if entry[1] > 0 else None for entry in self.state["decayed"])
+        if recent is None or baseline is None:
+            return None
+        change = recent - baseline
+        if abs(change) < TREND_THRESHOLD:
+            direction = "estable"
+        else:
+            direction = "al_alza" if change > 0 else "a_la_baja"
+        return {
+            "half_life_days": list(HALF_LIVES_DAYS),
+            "current": round(recent, 2),
+            "previous": round(baseline, 2),
+            "change": round(change, 2),
+            "direction": direction,
+        }
+
+
+def observation(
+    timestamp_ms: Optional[int],
+    recommended: Optional[str],
+    phase: Optional[str],
+    chosen: Optional[str],
+    satisfaction: Optional[float],
+    energy_before: Optional[float],
+    energy_after: Optional[float],
+) -> Dict[str, Any]:
+    """
+    Observación de una decisión para PatternStats: hora local y fase
+    (la registrada o, si falta, la que corresponde a la hora).
+    """
+    hour = None
+    if timestamp_ms is not None:
+        moment = datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc)
+        hour = moment.astimezone(pytz.timezone(settings.TIMEZONE)).hour
+    phase_code: Optional[int] = None
+    if phase in PHASE_NAMES:
+        phase_code = int((PHASE_NAMES == phase).argmax())
+    elif hour is not None:
+        phase_code = int(HOUR_TO_PHASE[hour])
+    return {
+        "timestamp_ms": timestamp_ms,
+        "hour": hour,
+        "phase": phase_code,
+        "recommended": recommended,
+        "chosen": chosen,
+        "satisfaction": satisfaction,
+        "energy_before": energy_before,
+        "energy_after": energy_after,
+    }
+
+
+def _welford(moments: List[float], x: float, sign: int) -> List[float]:
+    n, mean, m2 = moments
+    if sign > 0:
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        return [n, mean, m2 + delta * (x - mean)]
+    if n <= 1:
+        return [0, 0.0, 0.0]
+    previous_mean = (n * mean - x) / (n - 1)
+    return [n - 1, previous_mean, m2 - (x - previous_mean) * (x - mean)]
+
+
+def _comoment(moments: List[float], x: float, y: float, sign: int) -> List[float]:
+    n, mean_x, mean_y, m2_x, m2_y, c = moments
+    if sign > 0:
+        n += 1
+        dx = x - mean_x
+        mean_x += dx / n
+        dy = y - mean_y
+        mean_y += dy / n
+        return [n, mean_x, mean_y, m2_x + dx * (x - mean_x), m2_y + dy * (y - mean_y), c + dx * (y - mean_y)]
+    if n <= 1:
+        return [0, 0.0, 0.0, 0.0, 0.0, 0.0]
+    previous_x = (n * mean_x - x) / (n - 1)
+    previous_y = (n * mean_y - y) / (n - 1)
+    return [
+        n - 1, previous_x, previous_y,
+        m2_x - (x - previous_x) * (x - mean_x),
+        m2_y - (y - previous_y) * (y - mean_y),
+        c - (x - previous_x) * (y - mean_y),
+    ]
+
+
+def _pearson(moments: List[float]) -> Optional[float]:
+    n, _, _, m2_x, m2_y, c = moments
+    # Varianza despreciable (p. ej. diferencias de energía constantes salvo redondeo)
+    if n < 3 or m2_x / n <= 1e-12 or m2_y / n <= 1e-12:
+        return None
+    return max(-1.0, min(1.0, c / math.sqrt(m2_x * m2_y)))
+
+
+def _bump(bucket: List[float], value: float, sign: int) -> None:
+    bucket[0] += sign
+    bucket[1] = bucket[1] + sign * value if bucket[0] else 0.0
+
+
+def _breakdown(buckets: List[List[float]]) -> Dict[int, Dict[str, Any]]:
+    return {
+        code: {"count": count, "satisfaction": round(total / count, 2)}
+        for code, (count, total) in enumerate(buckets)
+        if count > 0
+    }
+
+
+def _decay(entry: List[Any], timestamp_ms: int, value: float, sign: int, half_life_days: float) -> None:
+    """
+    Media con decaimiento exponencial en el tiempo de la decisión. La
+    referencia es el timestamp más reciente visto: las decisiones antiguas
+    entran ya decaídas y las nuevas decaen lo acumulado.
+    """
+    total, weight, reference = entry
+    if reference is None or timestamp_ms > reference:
+        if reference is not None:
+            factor = 0.5 ** ((timestamp_ms - reference) / (half_life_days * _MS_PER_DAY))
+            total, weight = total * factor, weight * factor
+        reference = timestamp_ms
+        factor = 1.0
+    else:
+        factor = 0.5 ** ((reference - timestamp_ms) / (half_life_days * _MS_PER_DAY))
+    total += sign * factor * value
+    weight += sign * factor
+    if weight <= 1e-9:
+        total = weight = 0.0
+    entry[:] = [total, weight, reference]
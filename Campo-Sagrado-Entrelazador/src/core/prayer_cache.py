@@ -0,0 +1,169 @@
+"""
+Campo Sagrado - Caché diaria de horarios de rezo
+Persistida en data/cache/, con stale-while-revalidate y peticiones colapsadas
+"""
+
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import pytz
+from loguru import logger
+
+from src.utils.config import settings
+from src.utils.fs import atomic_write_bytes
+
+PrayerFetcher = Callable[[date], Dict[str, str]]
+
+# Días hacia atrás que se conservan en disco
+_RETENTION_DAYS = 7
+
+
+@dataclass
+class _Flight:
+    """Petición en curso compartida por todos los que esperan la misma clave."""
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[Dict[str, str]] = None
+    error: Optional[BaseException] = None
+
+
+class PrayerTimesCache:
+    """
+    Caché de horarios por (fecha, celda lat/long, método, escuela).
+
+    - Una entrada fresca se sirve directamente.
+    - Una entrada caducada se sirve de inmediato y se lanza un único refresco
+      en segundo plano.
+    - Varios fallos simultáneos de la misma clave comparten una sola llamada
+      al fetcher.
+    """
+
+    def __init__(
+        self,
+        fetcher: PrayerFetcher,
+        cache_dir: Optional[Path] = None,
+        ttl_hours: Optional[float] = None,
+        grid_deg: Optional[float] = None,
+    ):
+        """Inicializa la caché y carga las entradas persistidas."""
+        self.fetcher = fetcher
+        self.path = Path(cache_dir or settings.CACHE_PATH) / "prayer_times.json"
+        self.ttl_seconds = 3600 * (settings.PRAYER_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours)
+        self.grid_deg = settings.PRAYER_CACHE_GRID_DEG if grid_deg is None else grid_deg
+
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._inflight: Dict[str, _Flight] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def key_for(self, day: date) -> str:
+        """Clave de caché: fecha + celda de la rejilla + método + escuela."""
+        lat_cell = round(settings.LATITUDE / self.grid_deg)
+        lon_cell = round(settings.LONGITUDE / self.grid_deg)
+        return (
+            f"{day.isoformat()}|{lat_cell}:{lon_cell}@{self.grid_deg}"
+            f"|m{settings.PRAYER_METHOD}|s{settings.PRAYER_SCHOOL}"
+        )
+
+    def get(self, day: date) -> Dict[str, str]:
+        """Devuelve los horarios del día; lanza la excepción del fetcher si no hay entrada."""
+        key = self.key_for(day)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Contadores con el lock: += no es atómico entre hilos
+            if entry is None:
+                self.misses += 1
+            elif time.time() - entry["fetched_at"] < self.ttl_seconds:
+                self.hits += 1
+                return entry["timings"]
+            else:
+                self.stale_hits += 1
+
+        if entry is not None:
+            self._refresh_in_background(key, day)
+            return entry["timings"]
+        return self._fetch_once(key, day)
+
+    def _fetch_once(self, key: str, day: date) -> Dict[str, str]:
+        """Ejecuta el fetcher una sola vez por clave aunque haya varios llamadores."""
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if leader:
+            self._run_flight(key, day, flight)
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _refresh_in_background(self, key: str, day: date) -> None:
+        """Lanza un refresco en segundo plano si no hay ya uno en curso."""
+        with self._lock:
+            if key in self._inflight:
+                return
+            flight = self._inflight[key] = _Flight()
+
+        threading.Thread(
+            target=self._run_flight, args=(key, day, flight),
+            name="prayer-cache-refresh", daemon=True,
+        ).start()
+
+    def _run_flight(self, key: str, day: date, flight: _Flight) -> None:
+        """Llama al fetcher, guarda el resultado y despierta a los que esperan."""
+        try:
+            timings = self.fetcher(day)
+            with self._lock:
+                self._entries[key] = {"timings": timings, "fetched_at": time.time()}
+                self._prune()
+            self._persist()
+            flight.result = timings
+        except Exception as e:
+            logger.warning(f"Error obteniendo horarios de rezo para {day}: {e}")
+            flight.error = e
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _prune(self) -> None:
+        """
+        Elimina las entradas de más de _RETENTION_DAYS días antes de hoy en
+        TIMEZONE; no del día pedido, que puede ser futuro (llamar con el lock tomado).
+        """
+        today = datetime.now(pytz.timezone(settings.TIMEZONE)).date()
+        cutoff = (today - timedelta(days=_RETENTION_DAYS)).isoformat()
+        for key in [k for k in self._entries if k.split("|", 1)[0] < cutoff]:
+            del self._entries[key]
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Carga las entradas persistidas (una caché corrupta se descarta)."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Caché de horarios ilegible, se descarta: {e}")
+            return {}
+
+    def _persist(self) -> None:
+        """Escribe la caché completa de forma atómica (la última escritura gana)."""
+        with self._persist_lock:
+            with self._lock:
+                data = json.dumps(self._entries, ensure_ascii=False).encode('utf-8')
+            try:
+                atomic_write_bytes(self.path, data)
+            except OSError as e:
+                logger.warning(f"No se pudo persistir la caché de horarios: {e}")
@@ -0,0 +1,240 @@
+"""
+Campo Sagrado - Calculadora astronómica de horarios de rezo
+Calcula localmente Fajr/Dhuhr/Asr/Maghrib/Isha sin depender de api.aladhan.com
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pytz
+
+from src.utils import metrics
+from src.utils.config import settings
+
+# Columnas de la tabla anual (minutos desde medianoche, hora local)
+PRAYER_NAMES: Tuple[str, ...] = (
+    "Fajr", "Sunrise", "Dhuhr", "Asr", "Sunset", "Maghrib", "Isha"
+)
+
+# Ángulo del sol bajo el horizonte en orto/ocaso (refracción + semidiámetro)
+RISE_SET_ANGLE = 0.833
+
+# Hora aproximada (fracción de día) usada como semilla para cada evento,
+# igual que el algoritmo de praytimes.org en el que se basa aladhan
+_SEED_HOURS = {
+    "Fajr": 5.0, "Sunrise": 6.0, "Dhuhr": 12.0, "Asr": 13.0,
+    "Sunset": 18.0, "Maghrib": 18.0, "Isha": 18.0,
+}
+
+_JD_UNIX_EPOCH = 2440587.5
+
+
+@dataclass(frozen=True)
+class PrayerMethod:
+    """Parámetros de un método de cálculo (mismos ids que aladhan)."""
+    name: str
+    fajr_angle: float
+    isha_angle: Optional[float] = None
+    isha_minutes: Optional[float] = None
+    maghrib_angle: Optional[float] = None
+
+
+PRAYER_METHODS: Dict[int, PrayerMethod] = {
+    0: PrayerMethod("Shia Ithna-Ashari", 16.0, isha_angle=14.0, maghrib_angle=4.0),
+    1: PrayerMethod("University of Islamic Sciences, Karachi", 18.0, isha_angle=18.0),
+    2: PrayerMethod("Islamic Society of North America", 15.0, isha_angle=15.0),
+    3: PrayerMethod("Muslim World League", 18.0, isha_angle=17.0),
+    4: PrayerMethod("Umm Al-Qura University, Makkah", 18.5, isha_minutes=90.0),
+    5: PrayerMethod("Egyptian General Authority of Survey", 19.5, isha_angle=17.5),
+    7: PrayerMethod("Institute of Geophysics, University of Tehran", 17.7, isha_angle=14.0, maghrib_angle=4.5),
+    8: PrayerMethod("Gulf Region", 19.5, isha_minutes=90.0),
+    9: PrayerMethod("Kuwait", 18.0, isha_angle=17.5),
+    10: PrayerMethod("Qatar", 18.0, isha_minutes=90.0),
+    11: PrayerMethod("Majlis Ugama Islam Singapura", 20.0, isha_angle=18.0),
+    12: PrayerMethod("Union Organization islamic de France", 12.0, isha_angle=12.0),
+    13: PrayerMethod("Diyanet İşleri Başkanlığı, Turkey", 18.0, isha_angle=17.0),
+    14: PrayerMethod("Spiritual Administration of Muslims of Russia", 16.0, isha_angle=15.0),
+}
+
+
+def _sin(d: np.ndarray) -> np.ndarray:
+    return np.sin(np.radians(d))
+
+
+def _cos(d: np.ndarray) -> np.ndarray:
+    return np.cos(np.radians(d))
+
+
+def _sun_position(jd: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Declinación (grados) y ecuación del tiempo (horas) para cada día juliano."""
+    d = jd - 2451545.0
+    g = np.mod(357.529 + 0.98560028 * d, 360.0)
+    q = np.mod(280.459 + 0.98564736 * d, 360.0)
+    L = np.mod(q + 1.915 * _sin(g) + 0.020 * _sin(2 * g), 360.0)
+    e = 23.439 - 0.00000036 * d
+
+    ra = np.degrees(np.arctan2(_cos(e) * _sin(L), _cos(L))) / 15.0
+    eqt = q / 15.0 - np.mod(ra, 24.0)
+    decl = np.degrees(np.arcsin(_sin(e) * _sin(L)))
+    return decl, eqt
+
+
+class PrayerTimesCalculator:
+    """
+    Calcula tablas anuales de horarios de rezo en una sola pasada vectorizada.
+
+    La tabla de cada año se calcula la primera vez que se consulta y después
+    cada búsqueda es un índice directo por día del año.
+    """
+
+    def __init__(
+        self,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        method: Optional[int] = None,
+        school: Optional[int] = None,
+        timezone: Optional[str] = None,
+    ):
+        """Inicializa la calculadora con la configuración (o valores explícitos)."""
+        self.latitude = settings.LATITUDE if latitude is None else latitude
+        self.longitude = settings.LONGITUDE if longitude is None else longitude
+        self.method_id = settings.PRAYER_METHOD if method is None else method
+        self.school = settings.PRAYER_SCHOOL if school is None else school
+        self.tz = pytz.timezone(timezone or settings.TIMEZONE)
+
+        if self.method_id not in PRAYER_METHODS:
+            raise ValueError(
+                f"Método de cálculo no soportado localmente: {self.method_id}"
+            )
+        self.method = PRAYER_METHODS[self.method_id]
+        self._tables: Dict[int, np.ndarray] = {}
+
+    def year_table(self, year: int) -> np.ndarray:
+        """Tabla (días x PRAYER_NAMES) en minutos locales desde medianoche."""
+        table = self._tables.get(year)
+        if table is None:
+            table = self._compute_year(year)
+            self._tables[year] = table
+        return table
+
+    def minutes_for(self, day: Union[date, datetime]) -> np.ndarray:
+        """Fila de la tabla para un día concreto (minutos desde medianoche)."""
+        return self.year_table(day.year)[day.timetuple().tm_yday - 1]
+
+    def times_for(self, day: Union[date, datetime]) -> Dict[str, str]:
+        """Horarios de un día en formato 'HH:MM', con las claves de aladhan."""
+        row = self.minutes_for(day)
+        return {
+            name: f"{int(m) // 60:02d}:{int(m) % 60:02d}"
+            for name, m in zip(PRAYER_NAMES, row)
+        }
+
+    def _compute_year(self, year: int) -> np.ndarray:
+        """Calcula todos los días de un año en una pasada vectorizada."""
+        days = np.arange(
+            np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01")
+        )
+        epoch_days = days.astype("datetime64[D]").astype(np.int64).astype(float)
+        jdate = epoch_days + _JD_UNIX_EPOCH - self.longitude / (15.0 * 24.0)
+
+        lat = self.latitude
+        method = self.method
+
+        def mid_day(seed: float) -> np.ndarray:
+            _, eqt = _sun_position(jdate + seed / 24.0)
+            return np.mod(12.0 - eqt, 24.0)
+
+        def sun_angle_time(angle, seed: float, ccw: bool = False) -> np.ndarray:
+            decl, _ = _sun_position(jdate + seed / 24.0)
+            noon = mid_day(seed)
+            cos_t = (-_sin(angle) - _sin(decl) * _sin(lat)) / (_cos(decl) * _cos(lat))
+            with np.errstate(invalid="ignore"):
+                t = np.degrees(np.arccos(cos_t)) / 15.0
+            return noon - t if ccw else noon + t
+
+        def asr_time(factor: float, seed: float) -> np.ndarray:
+            decl, _ = _sun_position(jdate + seed / 24.0)
+            angle = -np.degrees(np.arctan(1.0 / (factor + np.tan(np.radians(np.abs(lat - decl))))))
+            return sun_angle_time(angle, seed)
+
+        seeds = _SEED_HOURS
+        fajr = sun_angle_time(method.fajr_angle, seeds["Fajr"], ccw=True)
+        sunrise = sun_angle_time(RISE_SET_ANGLE, seeds["Sunrise"], ccw=True)
+        dhuhr = mid_day(seeds["Dhuhr"])
+        asr = asr_time(2.0 if self.school == 1 else 1.0, seeds["Asr"])
+        sunset = sun_angle_time(RISE_SET_ANGLE, seeds["Sunset"])
+        if method.maghrib_angle is not None:
+            maghrib = sun_angle_time(method.maghrib_angle, seeds["Maghrib"])
+        else:
+            maghrib = sunset.copy()
+        if method.isha_angle is not None:
+            isha = sun_angle_time(method.isha_angle, seeds["Isha"])
+        else:
+            isha = maghrib + method.isha_minutes / 60.0
+
+        # De hora solar (UTC corregida por longitud) a hora local con DST
+        offsets = np.array([
+            self.tz.utcoffset(datetime.combine(d, time(12))).total_seconds() / 3600.0
+            for d in days.astype(object)
+        ])
+        shift = offsets - self.longitude / 15.0
+        times = np.stack([fajr, sunrise, dhuhr, asr, sunset, maghrib, isha], axis=1)
+        times += shift[:, None]
+
+        times = self._adjust_high_latitudes(times)
+
+        # Redondeo al minuto más cercano, como la salida 'HH:MM' de aladhan
+        minutes = np.floor(np.mod(times + 0.5 / 60.0, 24.0) * 60.0)
+        return minutes.astype(np.int16)
+
+    def _adjust_high_latitudes(self, times: np.ndarray) -> np.ndarray:
+        """
+        Ajuste 'angle based' (el de aladhan por defecto) para Fajr e Isha y,
+        en los métodos con ángulo de Maghrib (Jafari, Teherán), también para
+        Maghrib, como en praytimes.org.
+        """
+        fajr, sunrise, sunset, maghrib, isha = times[:, 0], times[:, 1], times[:, 4], times[:, 5], times[:, 6]
+        night = np.mod(sunrise - sunset, 24.0)
+
+        fajr_portion = self.method.fajr_angle / 60.0 * night
+        too_early = np.isnan(fajr) | (np.mod(sunrise - fajr, 24.0) > fajr_portion)
+        times[:, 0] = np.where(too_early, sunrise - fajr_portion, fajr)
+
+        if self.method.maghrib_angle is not None:
+            maghrib_portion = self.method.maghrib_angle / 60.0 * night
+            too_late = np.isnan(maghrib) | (np.mod(maghrib - sunset, 24.0) > maghrib_portion)
+            times[:, 5] = np.where(too_late, sunset + maghrib_portion, maghrib)
+
+        if self.method.isha_angle is not None:
+            isha_portion = self.method.isha_angle / 60.0 * night
+            too_late = np.isnan(isha) | (np.mod(isha - sunset, 24.0) > isha_portion)
+            times[:, 6] = np.where(too_late, sunset + isha_portion, isha)
+        return times
+
+
+def fetch_aladhan_timings(day: Union[date, datetime]) -> Dict[str, str]:
+    """
+    Consulta los horarios en api.aladhan.com (fuente remota opcional).
+
+    Lanza requests.RequestException si la petición falla; el llamador decide
+    si recurre al cálculo local.
+    """
+    import requests
+
+    with metrics.upstream("aladhan"):
+        response = requests.get(
+            f"http://api.aladhan.com/v1/timings/{day.strftime('%d-%m-%Y')}",
+            params={
+                "latitude": settings.LATITUDE,
+                "longitude": settings.LONGITUDE,
+                "method": settings.PRAYER_METHOD,
+                "school": settings.PRAYER_SCHOOL,
+                "timezonestring": settings.TIMEZONE,
+            },
+            timeout=5
+        )
+        response.raise_for_status()
+        timings = response.json()['data']['timings']
+    return {name: timings[name][:5] for name in PRAYER_NAMES if name in timings}
@@ -5,24 +5,119 @@ Versión funcional simplificada
 """
 
 import json
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pytz
-import requests
-from pydantic import BaseModel
 
+from src.adapters.history_store import history_store
+from src.core.circadian import (
+    PHASE_ENERGY,
+    PHASE_NAMES,
+    PHASE_SPECS,
+    CircadianPhase,
+    circadian_curve,
+)
+from src.core.prayer_cache import PrayerTimesCache
+from src.core.prayer_times import PrayerTimesCalculator, fetch_aladhan_timings
 from src.models.recommendation import Recommendation, RecommendationOption
+from src.utils import metrics
 from src.utils.config import settings
+from src.utils.executors import run_blocking
+from src.utils.fs import atomic_write_bytes
 
 
-class CircadianPhase(BaseModel):
-    """Modelo para fase circadiana"""
-    phase: str
-    energy: float
-    cognitive_capacity: float
-    optimal_activity: str
+# Bandas de energía del usuario: 0 alta (>= 8), 1 baja (< 4), 2 media
+ENERGY_HIGH, ENERGY_LOW, ENERGY_MID = 0, 1, 2
+
+OPTION_SPECS: Tuple[Tuple[Dict[str, Any], Dict[str, Any]], ...] = (
+    (
+        {"action": "TRABAJO INTENSO", "duration": "90 min",
+         "description": "Tareas que requieren máxima concentración y creatividad", "alignment_score": 0.9},
+        {"action": "PROYECTOS COMPLEJOS", "duration": "75 min",
+         "description": "Desarrollo de ideas, planificación estratégica, innovación", "alignment_score": 0.85},
+    ),
+    (
+        {"action": "DESCANSO ACTIVO", "duration": "30 min",
+         "description": "Caminar, estirar, respiración consciente", "alignment_score": 0.85},
+        {"action": "TRABAJO LIGERO", "duration": "45 min",
+         "description": "Tareas simples que no requieren mucha energía", "alignment_score": 0.6},
+    ),
+    (
+        {"action": "TRABAJO MODERADO", "duration": "60 min",
+         "description": "Tareas que requieren atención pero no máxima intensidad", "alignment_score": 0.75},
+        {"action": "REUNIONES/COLABORACIÓN", "duration": "45 min",
+         "description": "Interacción con otros, brainstorming, feedback", "alignment_score": 0.7},
+    ),
+)
+BAND_CONFIDENCE = np.array([0.85, 0.8, 0.7])
+
+
+def energy_band(user_energy: Any) -> Any:
+    """Banda de energía (escalar o array NumPy)."""
+    energy = np.asarray(user_energy)
+    band = np.where(energy >= 8, ENERGY_HIGH, np.where(energy < 4, ENERGY_LOW, ENERGY_MID))
+    return band.item() if band.ndim == 0 else band.astype(np.int8)
+
+
+def recommended_is_a(band: Any, phase_energy: Any) -> Any:
+    """
+    A salvo en energía media con fase circadiana baja (escalar o array).
+
+    phase_energy es la energía nominal de la fase (PHASE_ENERGY), no la curva
+    suavizada: CIRCADIAN_SMOOTHING no cambia las decisiones.
+    """
+    return np.logical_or(np.asarray(band) != ENERGY_MID, np.asarray(phase_energy) > 0.6)
+
+
+@dataclass
+class RecommendationBatch:
+    """
+    Resultado vectorizado de generate_batch.
+
+    Todas las columnas son arrays NumPy alineados con la entrada; los objetos
+    Recommendation solo se construyen al pedirlos con recommendation(i).
+    """
+    timestamps: Any  # pandas.DatetimeIndex en la zona horaria configurada
+    energies: np.ndarray
+    phase_index: np.ndarray
+    energy_band: np.ndarray
+    recommended: np.ndarray
+    confidence: np.ndarray
+    cognitive_capacity: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.energies)
+
+    @property
+    def phases(self) -> np.ndarray:
+        """Nombre de la fase circadiana de cada fila."""
+        return PHASE_NAMES[self.phase_index]
+
+    def recommendation(self, i: int) -> Recommendation:
+        """Construye el modelo Recommendation de la fila i."""
+        phase = PHASE_SPECS[self.phase_index[i]]
+        option_a, option_b = OPTION_SPECS[self.energy_band[i]]
+        user_energy = self.energies[i].item()
+        return Recommendation(
+            timestamp=self.timestamps[i].to_pydatetime(),
+            option_a=RecommendationOption(**option_a),
+            option_b=RecommendationOption(**option_b),
+            recommended_option=str(self.recommended[i]),
+            confidence=float(self.confidence[i]),
+            factors={
+                "circadian_phase": phase["phase"],
+                "cognitive_capacity": f"{self.cognitive_capacity[i]:.0%}",
+                "user_energy": f"{user_energy}/10",
+                "optimal_activity": phase["optimal_activity"]
+            }
+        )
+
+    def __iter__(self) -> Iterator[Recommendation]:
+        return (self.recommendation(i) for i in range(len(self)))
 
 
 class SacralRecommendationEngine:
@@ -32,121 +127,70 @@ class SacralRecommendationEngine:
         """Inicializa el motor."""
         self.tz = pytz.timezone(settings.TIMEZONE)
         self.base_path = settings.PROJECT_ROOT
+        self._prayer_calculator: Optional[PrayerTimesCalculator] = None
+        self.prayer_cache = PrayerTimesCache(self._fetch_prayer_times)
+        self.history_store = history_store
         print("🔧 Motor inicializado para Madrid")
     
-    def get_prayer_times(self) -> Optional[Dict[str, str]]:
-        """Obtiene horarios de rezo."""
+    def get_prayer_times(self, day: Optional[date] = None) -> Optional[Dict[str, str]]:
+        """Obtiene horarios de rezo (caché diaria sobre el cálculo local)."""
+        day = day or datetime.now(self.tz).date()
         try:
-            response = requests.get(
-                "http://api.aladhan.com/v1/timings",
-                params={
-                    "latitude": settings.LATITUDE,
-                    "longitude": settings.LONGITUDE,
-                    "method": settings.PRAYER_METHOD,
-                },
-                timeout=5
-            )
-            if response.status_code == 200:
-                return response.json()['data']['timings']
-        except:
-            pass
-        return None
+            return self.prayer_cache.get(day)
+        except Exception as e:
+            print(f"⚠️  No se pudieron obtener los horarios de rezo: {e}")
+            return None
+
+    def _fetch_prayer_times(self, day: date) -> Dict[str, str]:
+        """Fuente de horarios para la caché: aladhan opcional, cálculo local por defecto."""
+        if settings.PRAYER_TIMES_SOURCE == "aladhan":
+            import requests
+
+            try:
+                return fetch_aladhan_timings(day)
+            except (requests.RequestException, KeyError, ValueError) as e:
+                print(f"⚠️  aladhan no disponible, usando cálculo local: {e}")
+
+        if self._prayer_calculator is None:
+            self._prayer_calculator = PrayerTimesCalculator()
+        return self._prayer_calculator.times_for(day)
+    
+    def prayer_period_at(self, moment: datetime) -> Optional[str]:
+        """Rezo cuyo periodo contiene el instante ('fajr', 'dhuhr', ...)."""
+        timings = self.get_prayer_times(moment.date())
+        if not timings:
+            return None
+        hhmm = moment.strftime("%H:%M")
+        current = "isha"  # antes de Fajr seguimos en el periodo de Isha
+        for name in ("Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"):
+            if timings.get(name, "99:99") <= hhmm:
+                current = name.lower()
+        return current
     
     def get_circadian_phase(self) -> CircadianPhase:
-        """Determina la fase circadiana actual."""
-        hour = datetime.now(self.tz).hour
-        
-        if 5 <= hour < 9:
-            return CircadianPhase(
-                phase="AMANECER",
-                energy=0.9,
-                cognitive_capacity=0.95,
-                optimal_activity="Trabajo profundo"
-            )
-        elif 9 <= hour < 13:
-            return CircadianPhase(
-                phase="MAÑANA",
-                energy=0.85,
-                cognitive_capacity=0.9,
-                optimal_activity="Tareas creativas"
-            )
-        elif 13 <= hour < 16:
-            return CircadianPhase(
-                phase="MEDIODÍA",
-                energy=0.6,
-                cognitive_capacity=0.7,
-                optimal_activity="Tareas colaborativas"
-            )
-        elif 16 <= hour < 20:
-            return CircadianPhase(
-                phase="TARDE",
-                energy=0.7,
-                cognitive_capacity=0.75,
-                optimal_activity="Revisión y planificación"
-            )
-        else:
-            return CircadianPhase(
-                phase="NOCHE",
-                energy=0.4,
-                cognitive_capacity=0.5,
-                optimal_activity="Descanso y restauración"
-            )
+        """Determina la fase circadiana actual (objeto compartido e inmutable)."""
+        now = datetime.now(self.tz)
+        return circadian_curve().phase_at(now.hour * 60 + now.minute)
     
+    @metrics.timed("engine_compute")
     def generate_binary_recommendation(self, context: Optional[Dict[str, Any]] = None) -> Recommendation:
         """Genera recomendación binaria principal."""
         if context is None:
             context = {}
         
         now = datetime.now(self.tz)
-        circadian = self.get_circadian_phase()
+        curve = circadian_curve()
+        minute = now.hour * 60 + now.minute
+        circadian = curve.phase_at(minute)
         user_energy = context.get('current_energy', 7)
         
         # Lógica de recomendación basada en energía y fase circadiana
-        if user_energy >= 8:
-            option_a = RecommendationOption(
-                action="TRABAJO INTENSO",
-                duration="90 min",
-                description="Tareas que requieren máxima concentración y creatividad",
-                alignment_score=0.9
-            )
-            option_b = RecommendationOption(
-                action="PROYECTOS COMPLEJOS",
-                duration="75 min",
-                description="Desarrollo de ideas, planificación estratégica, innovación",
-                alignment_score=0.85
-            )
-            recommended = "A"
-            confidence = 0.85
-        elif user_energy < 4:
-            option_a = RecommendationOption(
-                action="DESCANSO ACTIVO",
-                duration="30 min",
-                description="Caminar, estirar, respiración consciente",
-                alignment_score=0.85
-            )
-            option_b = RecommendationOption(
-                action="TRABAJO LIGERO",
-                duration="45 min",
-                description="Tareas simples que no requieren mucha energía",
-                alignment_score=0.6
-            )
-            recommended = "A"
-            confidence = 0.8
-        else:
-            option_a = RecommendationOption(
-                action="TRABAJO MODERADO",
-                duration="60 min",
-                description="Tareas que requieren atención pero no máxima intensidad",
-                alignment_score=0.75
-            )
-            option_b = RecommendationOption(
-                action="REUNIONES/COLABORACIÓN",
-                duration="45 min",
-                description="Interacción con otros, brainstorming, feedback",
-                alignment_score=0.7
-            )
-            recommended = "A" if circadian.energy > 0.6 else "B"
-            confidence = 0.7
+        band = energy_band(user_energy)
+        option_a_spec, option_b_spec = OPTION_SPECS[band]
+        option_a = RecommendationOption(**option_a_spec)
+        option_b = RecommendationOption(**option_b_spec)
+        recommended = "A" if recommended_is_a(band, PHASE_ENERGY[curve.phase_index[minute]]) else "B"
+        confidence = float(BAND_CONFIDENCE[band])
         
         return Recommendation(
             timestamp=now,
@@ -162,16 +206,48 @@ class SacralRecommendationEngine:
             }
         )
     
+    @metrics.timed("engine_compute")
+    def generate_batch(self, energies: Any, timestamps: Any = None) -> RecommendationBatch:
+        """
+        Genera recomendaciones para muchas filas a la vez con operaciones de array.
+
+        Args:
+            energies: Energías del usuario (1-10), array-like
+            timestamps: datetime64/datetimes alineados con energies; los valores
+                sin zona se interpretan como UTC. Por defecto, ahora.
+
+        Returns:
+            RecommendationBatch con fase, opción, recomendada y confianza por fila
+        """
+        import pandas as pd
+
+        energies = np.asarray(energies)
+        if timestamps is None:
+            local = pd.DatetimeIndex([datetime.now(self.tz)]).repeat(len(energies))
+        else:
+            local = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True)).tz_convert(self.tz.zone)
+        if len(local) != len(energies):
+            raise ValueError("energies y timestamps deben tener la misma longitud")
+
+        curve = circadian_curve()
+        minute = local.hour.to_numpy() * 60 + local.minute.to_numpy()
+        phase_index = curve.phase_index[minute]
+        band = energy_band(energies)
+        is_a = recommended_is_a(band, PHASE_ENERGY[phase_index])
+
+        return RecommendationBatch(
+            timestamps=local,
+            energies=energies,
+            phase_index=phase_index,
+            energy_band=band,
+            recommended=np.where(is_a, "A", "B"),
+            confidence=BAND_CONFIDENCE[band],
+            cognitive_capacity=curve.cognitive[minute],
+        )
+    
     def save_recommendation(self, recommendation: Recommendation) -> Path:
-        """Guarda la recomendación y la exporta a Obsidian."""
-        # Guardar en JSON
-        export_path = self.base_path / "data" / "anytype-exports" / "daily"
-        export_path.mkdir(parents=True, exist_ok=True)
-        
-        json_path = export_path / "current_recommendation.json"
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(recommendation.model_dump(), f, indent=2, ensure_ascii=False, default=str)
-        
+        """Guarda la recomendación en el historial y la exporta a Obsidian."""
+        json_path = self.record_history([recommendation])
         print(f"💾 Recomendación guardada en: {json_path}")
         
         # Exportar a Obsidian
@@ -185,6 +261,34 @@ class SacralRecommendationEngine:
         
         return json_path
 
+    @property
+    def current_json_path(self) -> Path:
+        """Ruta del JSON con la recomendación actual."""
+        return self.base_path / "data" / "anytype-exports" / "daily" / "current_recommendation.json"
+
+    def record_history(self, recommendations: List[Recommendation]) -> Path:
+        """
+        Añade las recomendaciones al historial append-only y regenera
+        current_recommendation.json como vista derivada de la última.
+        """
+        self.history_store.append_many(
+            recommendations,
+            [self.prayer_period_at(r.timestamp) for r in recommendations],
+        )
+        return self.write_current_json(recommendations[-1])
+
+    @metrics.timed("json_save")
+    def write_current_json(self, recommendation: Recommendation) -> Path:
+        """Escribe current_recommendation.json de forma atómica."""
+        json_path = self.current_json_path
+        data = json.dumps(recommendation.model_dump(), indent=2, ensure_ascii=False, default=str)
+        atomic_write_bytes(json_path, data.encode('utf-8'))
+        return json_path
+
+    async def asave_recommendation(self, recommendation: Recommendation) -> Path:
+        """Versión async de save_recommendation: la E/S corre en el pool acotado."""
+        return await run_blocking(self.save_recommendation, recommendation)
+
 
 def main():
     """Función principal para testing."""
@@ -3,15 +3,33 @@ Servicio de IA para Campo Sagrado
 Integración con Claude para análisis de patrones y enriquecimiento de recomendaciones
 """
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+import asyncio
 import json
+import random
 
-from anthropic import Anthropic
 from loguru import logger
 from pydantic import BaseModel
 
+from src.services.pattern_analytics import analyze_decisions, best_bucket
+from src.services.prompt_budget import (
+    PromptBudget,
+    TokenLedger,
+    request_tokens,
+    summarize_value,
+)
+from src.services.response_cache import ResponseCache
+from src.utils import metrics
 from src.utils.config import settings
+from src.utils.executors import run_blocking
+
+
+# Columnas de las decisiones que se envían fila a fila
+DECISION_COLUMNS = ("timestamp", "recommended", "chosen", "satisfaction", "energy_before", "energy_after")
+# Columnas de las reflexiones del vault y caracteres máximos de cada una
+REFLECTION_COLUMNS = ("date", "time", "option", "reflection")
+REFLECTION_MAX_CHARS = 280
 
 
 class PatternAnalysis(BaseModel):
@@ -22,9 +40,438 @@ class PatternAnalysis(BaseModel):
     insight: str
     recommendations: List[str]
     energy_correlation: Optional[float] = None
+    # Estadísticas del análisis local (pattern_analytics)
+    sample_size: Optional[int] = None
+    satisfaction_mean: Optional[float] = None
+    correlations: Optional[Dict[str, Optional[float]]] = None
+    by_hour: Optional[Dict[int, Dict[str, Any]]] = None
+    by_phase: Optional[Dict[str, Dict[str, Any]]] = None
+    options: Optional[Dict[str, Dict[str, Any]]] = None
+    trend: Optional[Dict[str, Any]] = None
+
+
+class ClaudeServiceBase:
+    """
+    Parte común de ClaudeService y AsyncClaudeService: prompts, caché de
+    respuestas, parseo de resultados y respuestas offline.
+    """
+    
+    def __init__(self):
+        """Inicializa la caché de respuestas."""
+        # Respuestas repetidas (mismo prompt) se sirven desde caché
+        self.cache = ResponseCache() if settings.CLAUDE_CACHE_ENABLED else None
+        # Tokens enviados por tipo de petición
+        self.token_usage = TokenLedger()
+    
+    # Cada *_request devuelve los argumentos de create_message
+    
+    def _pattern_request(
+        self,
+        decisions: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]],
+        stats: Optional[Dict[str, Any]] = None,
+        reflections: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Petición de análisis de patrones."""
+        system = "Eres un experto en análisis de patrones de comportamiento y toma de decisiones. Tu objetivo es identificar patrones que ayuden a la persona a tomar mejores decisiones alineadas con su autoridad sacral y ritmos naturales."
+        return {
+            "prompt": self._build_pattern_prompt(decisions, context, stats, system, reflections),
+            "model": "claude-3-haiku-20240307",  # Modelo rápido para análisis frecuentes
+            "max_tokens": 500,
+            "temperature": 0.7,
+            "system": system,
+            "kind": "patrones",
+        }
+    
+    def _enhance_request(self, recommendation: Dict[str, Any]) -> Dict[str, Any]:
+        """Petición para enriquecer una recomendación."""
+        prompt = f"""
+            Analiza esta recomendación y sugiere mejoras basadas en el contexto:
+            
+            Recomendación actual:
+            - Opción A: {recommendation.get('option_a', {}).get('action')}
+            - Opción B: {recommendation.get('option_b', {}).get('action')}
+            - Recomendada: {recommendation.get('recommended_option')}
+            
+            Contexto:
+            - Fase circadiana: {recommendation.get('factors', {}).get('circadian_phase')}
+            - Energía: {recommendation.get('factors', {}).get('user_energy')}
+            
+            Proporciona:
+            1. ¿Por qué esta opción es mejor para este momento?
+            2. Un insight único sobre el timing
+            3. Una micro-acción para maximizar el resultado
+            
+            Responde en formato JSON.
+            """
+        return {
+            "prompt": prompt,
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": 300,
+            "temperature": 0.6,
+            "system": "Eres un coach de productividad consciente especializado en ritmos naturales y toma de decisiones intuitivas.",
+            "kind": "enriquecimiento",
+        }
+    
+    def _apply_enhancement(self, recommendation: Dict[str, Any], content: str) -> Dict[str, Any]:
+        """Añade la respuesta de Claude a la recomendación."""
+        # Intentar parsear como JSON
+        try:
+            enhancement = json.loads(content)
+            recommendation['ai_insights'] = enhancement
+        except:
+            # Si no es JSON, agregar como texto
+            recommendation['ai_insights'] = {
+                'raw_insight': content,
+                'enhanced': True
+            }
+        
+        logger.info("Recomendación enriquecida con Claude")
+        return recommendation
+    
+    def _weekly_request(self, week_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Petición de análisis semanal. Las decisiones de la semana se resumen
+        con pattern_analytics y el resto de listas de registros con
+        summarize_records; las filas crudas solo entran si sobra presupuesto.
+        """
+        system = "Eres un analista de datos conductuales experto en optimización de rendimiento humano basado en ritmos naturales y patrones de energía."
+        instructions = """Identifica:
+1. PATRÓN PRINCIPAL: ¿Cuál es el pattern más significativo?
+2. MOMENTO ÓPTIMO: ¿Cuándo la persona tiene mejor rendimiento?
+3. PUNTO DE MEJORA: ¿Qué ajuste tendría mayor impacto?
+4. PREDICCIÓN: Basado en patterns, ¿qué esperar la próxima semana?
+5. EXPERIMENTO: Sugiere un experimento para la próxima semana
+
+Formato: JSON estructurado con estas 5 secciones."""
+        header = "Analiza estos datos semanales y proporciona insights accionables:"
+        budget = PromptBudget(settings.CLAUDE_WEEKLY_TOKEN_BUDGET, system + header + instructions)
+        
+        decisions = week_data.get("decisions")
+        rows = decisions if isinstance(decisions, list) and decisions and isinstance(decisions[0], dict) else []
+        if rows:
+            budget.add("Estadísticas de decisiones de la semana", self.stats_summary(analyze_decisions(rows)))
+        rest = {key: value for key, value in week_data.items() if not (rows and key == "decisions")}
+        if rest:
+            budget.add("Datos de la semana", summarize_value(rest), required=True)
+        if rows:
+            budget.add_rows("Últimas decisiones", self.decision_rows(rows), DECISION_COLUMNS)
+        if budget.dropped:
+            logger.debug(f"Prompt semanal recortado al presupuesto: {', '.join(budget.dropped)}")
+        
+        prompt = f"{header}\n\n{budget.render()}\n\n{instructions}"
+        return {
+            "prompt": prompt,
+            "model": "claude-3-haiku-20240307",  # Usar Haiku para consistencia
+            "max_tokens": 1000,
+            "temperature": 0.7,
+            "system": system,
+            "kind": "semanal",
+        }
+    
+    def parse_weekly_response(self, content: str) -> Dict[str, Any]:
+        """Parsea el análisis semanal (JSON o texto libre)."""
+        try:
+            return json.loads(content)
+        except:
+            return {
+                "analysis": content,
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    def guidance_request(self, prayer_time: str, current_state: Dict[str, Any]) -> Dict[str, Any]:
+        """Petición de guía para un momento de oración."""
+        prompt = f"""
+        Genera una breve guía contemplativa para el rezo de {prayer_time}.
+        
+        Contexto:
+        - Energía actual: {current_state.get('energy', 'media')}
+        - Fase del día: {current_state.get('phase', 'desconocida')}
+        - Estado emocional: {current_state.get('emotional', 'neutro')}
+        
+        La guía debe:
+        1. Ser breve (2-3 líneas)
+        2. Conectar el momento presente con la intención del rezo
+        3. Ofrecer una pregunta o reflexión para la pausa
+        4. Respetar la naturaleza sagrada del momento
+        
+        Tono: Contemplativo, respetuoso, no prescriptivo.
+        """
+        return {
+            "prompt": prompt,
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": 150,
+            "temperature": 0.8,
+            "kind": "guia",
+            "system": "Eres un guía espiritual respetuoso, conocedor de tradiciones contemplativas islámicas y universales. Ofreces reflexiones suaves sin imponer creencias.",
+        }
+    
+    def _cached(self, request: Dict[str, Any], fresh: bool) -> Tuple[Optional[str], Optional[str]]:
+        """(clave, texto en caché) de una petición; con fresh=True no se consulta."""
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(
+            request["model"], request["system"], request["prompt"],
+            request["temperature"], request["max_tokens"]
+        )
+        if fresh:
+            self.cache.note_bypass()
+            return key, None
+        return key, self.cache.get(key)
+    
+    @staticmethod
+    def _response_text(response: Any) -> str:
+        """Texto de una respuesta de messages.create."""
+        return response.content[0].text if isinstance(response.content, list) else str(response.content)
+    
+    def _load_decision_history(self) -> List[Dict[str, Any]]:
+        """
+        Últimas PATTERN_PROMPT_DECISIONS decisiones con resultado de los
+        últimos PATTERN_HISTORY_DAYS días (el resto llega como agregados).
+        """
+        from src.adapters.history_store import history_store
+        
+        since = datetime.now() - timedelta(days=settings.PATTERN_HISTORY_DAYS)
+        try:
+            return history_store.decisions(since=since, last=settings.PATTERN_PROMPT_DECISIONS)
+        except Exception as e:
+            logger.error(f"Error leyendo historial de decisiones: {e}")
+            return []
+    
+    def _load_reflections(self) -> List[Dict[str, Any]]:
+        """
+        Últimas PATTERN_PROMPT_REFLECTIONS reflexiones que el usuario ha
+        escrito en sus notas diarias de Obsidian (índice del vault) en los
+        últimos PATTERN_HISTORY_DAYS días.
+        """
+        if settings.PATTERN_PROMPT_REFLECTIONS <= 0:
+            return []
+        from src.services.vault_index import vault_index
+        
+        since = (datetime.now() - timedelta(days=settings.PATTERN_HISTORY_DAYS)).date()
+        try:
+            items = vault_index.reflections(since=since)[-settings.PATTERN_PROMPT_REFLECTIONS:]
+        except Exception as e:
+            logger.error(f"Error leyendo reflexiones del vault: {e}")
+            return []
+        return [
+            {
+                "date": item["date"],
+                "time": item["time"],
+                "option": item["option"],
+                "reflection": item["reflection"][:REFLECTION_MAX_CHARS],
+            }
+            for item in items
+        ]
+    
+    def _pattern_stats(self, decisions: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Estadísticas de patrones: los agregados incrementales del historial
+        (coste constante) o, si se pasan decisiones, su análisis vectorizado.
+        """
+        if decisions is not None:
+            return analyze_decisions(decisions)
+        
+        from src.adapters.history_store import history_store
+        
+        try:
+            return history_store.pattern_stats()
+        except Exception as e:
+            logger.error(f"Error leyendo estadísticas de patrones: {e}")
+            return {"sample_size": 0}
+    
+    def _build_pattern_prompt(
+        self, 
+        decisions: List[Dict[str, Any]], 
+        context: Optional[Dict[str, Any]],
+        stats: Optional[Dict[str, Any]] = None,
+        system: str = "",
+        reflections: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """
+        Construye prompt para análisis de patrones dentro del presupuesto
+        CLAUDE_PATTERN_TOKEN_BUDGET: primero las estadísticas de todo el
+        historial (tamaño fijo), luego tantas decisiones recientes como
+        quepan y, si sobra, las reflexiones del usuario y el contexto.
+        """
+        instructions = """Identifica:
+1. Patrón principal en las decisiones
+2. Correlación entre energía y satisfacción
+3. Momentos óptimos para diferentes tipos de decisiones
+4. Recomendaciones específicas para mejorar
+
+Responde en formato JSON con estructura:
+{"pattern_type": "tipo de patrón identificado", "confidence": 0.0-1.0, "insight": "insight principal", "recommendations": ["rec1", "rec2", "rec3"], "energy_correlation": -1.0-1.0}"""
+        header = "Analiza estos patrones de decisión:"
+        budget = PromptBudget(settings.CLAUDE_PATTERN_TOKEN_BUDGET, system + header + instructions)
+        
+        if stats and stats.get("sample_size"):
+            budget.add("Estadísticas de todo el historial", self.stats_summary(stats))
+        recent = decisions[-settings.PATTERN_PROMPT_DECISIONS:]
+        budget.add_rows("Decisiones más recientes", self.decision_rows(recent), DECISION_COLUMNS)
+        if reflections:
+            budget.add_rows("Reflexiones del usuario en Obsidian", reflections, REFLECTION_COLUMNS)
+        if context:
+            budget.add("Contexto adicional", context)
+        if budget.dropped:
+            logger.debug(f"Prompt de patrones recortado al presupuesto: {', '.join(budget.dropped)}")
+        
+        return f"{header}\n\n{budget.render()}\n\n{instructions}"
+    
+    @staticmethod
+    def decision_rows(decisions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Decisiones con solo las columnas del prompt (timestamp a minutos)."""
+        return [
+            {
+                "timestamp": str(d.get("timestamp", ""))[:16],
+                "recommended": d.get("recommended"),
+                "chosen": d.get("chosen"),
+                "satisfaction": d.get("satisfaction"),
+                "energy_before": d.get("energy_before"),
+                "energy_after": d.get("energy_after"),
+            }
+            for d in decisions
+        ]
+    
+    @staticmethod
+    def stats_summary(stats: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Estadísticas de pattern_analytics/pattern_stats en forma compacta:
+        las franjas como {clave: [n, satisfacción media]}.
+        """
+        summary = {
+            key: stats.get(key)
+            for key in ("sample_size", "satisfaction_mean", "satisfaction_std", "correlations", "options", "trend")
+        }
+        for key in ("by_phase", "by_hour"):
+            summary[f"{key}[n,satisfaccion]"] = {
+                bucket_key: [bucket["count"], bucket["satisfaction"]]
+                for bucket_key, bucket in (stats.get(key) or {}).items()
+            }
+        return summary
+    
+    def _parse_pattern_response(self, response_content: Any) -> PatternAnalysis:
+        """Parsea respuesta de Claude a PatternAnalysis."""
+        try:
+            # Extraer texto del contenido de la respuesta
+            if isinstance(response_content, list):
+                # Claude a veces devuelve una lista de content blocks
+                text_content = response_content[0].text if response_content else "{}"
+            else:
+                text_content = str(response_content)
+            
+            # Intentar parsear como JSON
+            data = json.loads(text_content)
+            return PatternAnalysis(**data)
+            
+        except Exception as e:
+            logger.warning(f"No se pudo parsear respuesta como JSON: {e}")
+            
+            # Crear respuesta por defecto
+            return PatternAnalysis(
+                pattern_type="analysis_parcial",
+                confidence=0.5,
+                insight=str(response_content)[:200],
+                recommendations=["Continuar observando patrones", "Mantener registro consistente"],
+                energy_correlation=None
+            )
+    
+    def _offline_analysis(self, stats: Dict[str, Any]) -> PatternAnalysis:
+        """Análisis local (a partir de _pattern_stats) cuando no hay conexión a Claude."""
+        
+        if not stats["sample_size"]:
+            return PatternAnalysis(
+                pattern_type="sin_datos",
+                confidence=0.0,
+                insight="No hay suficientes datos para análisis",
+                recommendations=["Registrar más decisiones"],
+                energy_correlation=None
+            )
+        
+        sample_size = stats["sample_size"]
+        avg_satisfaction = stats["satisfaction_mean"]
+        correlation = stats["correlations"]["energy_before"]
+        followed = stats["options"]["followed"]
+        insight = [f"Satisfacción promedio: {avg_satisfaction:.1f}/10 en {sample_size} decisiones"]
+        recommendations = []
+        
+        best_phase = best_bucket(stats["by_phase"])
+        if best_phase:
+            phase_satisfaction = stats["by_phase"][best_phase]["satisfaction"]
+            insight.append(f"mejor fase: {best_phase} ({phase_satisfaction:.1f})")
+            recommendations.append(f"Reserva las decisiones importantes para la fase {best_phase}")
+        
+        best_hour = best_bucket(stats["by_hour"])
+        if best_hour is not None:
+            recommendations.append(f"Tu mejor franja horaria es alrededor de las {best_hour:02d}:00")
+        
+        if followed["satisfaction"] is not None and followed["satisfaction_overridden"] is not None:
+            gap = followed["satisfaction"] - followed["satisfaction_overridden"]
+            if abs(gap) >= 0.5:
+                insight.append(
+                    f"siguiendo la recomendación {followed['satisfaction']:.1f} "
+                    f"frente a {followed['satisfaction_overridden']:.1f}"
+                )
+                recommendations.append(
+                    "Confía en la opción recomendada" if gap > 0
+                    else "Tu intuición supera a la recomendación: revisa los pesos del motor"
+                )
+        
+        if correlation is not None and abs(correlation) >= 0.3:
+            recommendations.append(
+                "Decide con la energía alta: tu satisfacción sube con ella" if correlation > 0
+                else "Con energía alta tiendes a quedar menos satisfecho: baja el ritmo antes de decidir"
+            )
+        
+        trend = stats["trend"]
+        if trend and trend["direction"] != "estable":
+            insight.append(f"tendencia {trend['direction'].replace('_', ' ')} ({trend['change']:+.1f})")
+        
+        recommendations.append(
+            "Continuar registrando decisiones" if recommendations
+            else f"Tu satisfacción promedio es {'buena' if avg_satisfaction > 7 else 'mejorable'}"
+        )
+        
+        return PatternAnalysis(
+            pattern_type="análisis_local",
+            # La confianza crece con la muestra (0.3 con pocas decisiones, máx. 0.9)
+            confidence=round(min(0.9, 0.3 + sample_size / 500), 2),
+            insight="; ".join(insight),
+            recommendations=recommendations,
+            energy_correlation=correlation,
+            sample_size=sample_size,
+            satisfaction_mean=avg_satisfaction,
+            correlations=stats["correlations"],
+            by_hour=stats["by_hour"],
+            by_phase=stats["by_phase"],
+            options=stats["options"],
+            trend=trend
+        )
+    
+    @staticmethod
+    def _prefetched_guidance(prayer_time: str, fresh: bool) -> Optional[str]:
+        """Guía ya pre-generada para el rezo de hoy (ver guidance_prefetch), si procede."""
+        if fresh:
+            return None
+        from src.services.guidance_prefetch import prefetched_guidance
+        
+        return prefetched_guidance(prayer_time)
+    
+    def default_prayer_guidance(self, prayer_time: str) -> str:
+        """Guía por defecto para momentos de oración."""
+        
+        guides = {
+            "Fajr": "Momento de nuevos comienzos. ¿Qué intención estableces para este día?",
+            "Dhuhr": "El sol en su cenit. Pausa para recentrarte en lo esencial.",
+            "Asr": "La tarde avanza. ¿Qué requiere completion antes del anochecer?",
+            "Maghrib": "Transición del día a la noche. Momento de gratitud y liberación.",
+            "Isha": "La quietud nocturna. ¿Qué dejas ir para descansar en paz?"
+        }
+        
+        return guides.get(prayer_time, "Momento de conexión y recalibración interior.")
 
 
-class ClaudeService:
+class ClaudeService(ClaudeServiceBase):
     """
     Servicio para integración con Claude API.
     Analiza patrones y genera insights profundos.
@@ -32,60 +479,97 @@ class ClaudeService:
     
     def __init__(self):
         """Inicializa el servicio con API key desde configuración."""
+        super().__init__()
         if not settings.ANTHROPIC_API_KEY:
             logger.warning("Claude API key no configurada - modo offline")
             self.client = None
         else:
-            self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+            from anthropic import Anthropic  # el SDK solo se importa si hay API key
+            
+            self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY, base_url=settings.ANTHROPIC_BASE_URL)
             logger.info("Claude API conectada exitosamente")
     
+    def create_message(
+        self,
+        prompt: str,
+        system: str,
+        max_tokens: int,
+        temperature: float,
+        model: str = "claude-3-haiku-20240307",
+        fresh: bool = False,
+        kind: str = "mensaje"
+    ) -> str:
+        """
+        Llama a messages.create y devuelve el texto de la respuesta.
+        
+        Todas las llamadas a Claude pasan por aquí. Con fresh=True se ignora
+        la caché (la respuesta nueva sí se guarda). Los tokens de cada
+        llamada quedan en self.token_usage bajo `kind`.
+        """
+        request = {"prompt": prompt, "system": system, "max_tokens": max_tokens,
+                   "temperature": temperature, "model": model}
+        estimated = request_tokens(request)
+        key, cached = self._cached(request, fresh)
+        if cached is not None:
+            self.token_usage.record(kind, estimated, cached=True)
+            return cached
+        
+        with metrics.stage("claude_call"), metrics.upstream("claude"):
+            response = self.client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system,
+                messages=[{"role": "user", "content": prompt}]
+            )
+        self.token_usage.record(kind, estimated, getattr(response, "usage", None))
+        text = self._response_text(response)
+        
+        if key is not None:
+            self.cache.put(key, text, model=model)
+        return text
+    
     def analyze_decision_patterns(
         self, 
-        decisions: List[Dict[str, Any]],
-        context: Optional[Dict[str, Any]] = None
+        decisions: Optional[List[Dict[str, Any]]] = None,
+        context: Optional[Dict[str, Any]] = None,
+        fresh: bool = False
     ) -> PatternAnalysis:
         """
         Analiza patrones en decisiones recientes.
         
         Args:
-            decisions: Lista de decisiones con resultados
+            decisions: Lista de decisiones con resultados (por defecto, los
+                agregados de todo el historial local y sus últimas decisiones)
             context: Contexto adicional del usuario
+            fresh: Ignorar la caché de respuestas
             
         Returns:
             Análisis de patrones con insights
         """
+        stats = self._pattern_stats(decisions)
         if not self.client:
-            return self._offline_analysis(decisions)
+            return self._offline_analysis(stats)
         
-        # Preparar el prompt
-        prompt = self._build_pattern_prompt(decisions, context)
+        if decisions is None:
+            decisions = self._load_decision_history()
+        reflections = self._load_reflections()
         
         try:
-            # Llamar a Claude
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",  # Modelo rápido para análisis frecuentes
-                max_tokens=500,
-                temperature=0.7,
-                system="Eres un experto en análisis de patrones de comportamiento y toma de decisiones. Tu objetivo es identificar patrones que ayuden a la persona a tomar mejores decisiones alineadas con su autoridad sacral y ritmos naturales.",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
-            
-            # Parsear respuesta
-            return self._parse_pattern_response(response.content)
+            # Llamar a Claude y parsear respuesta
+            request = self._pattern_request(decisions, context, stats, reflections)
+            content = self.create_message(**request, fresh=fresh)
+            return self._parse_pattern_response(content)
             
         except Exception as e:
             logger.error(f"Error en análisis con Claude: {e}")
-            return self._offline_analysis(decisions)
+            return self._offline_analysis(stats)
     
     def enhance_recommendation(
         self,
         recommendation: Dict[str, Any],
-        user_profile: Optional[Dict[str, Any]] = None
+        user_profile: Optional[Dict[str, Any]] = None,
+        fresh: bool = False
     ) -> Dict[str, Any]:
         """
         Enriquece una recomendación con insights de Claude.
@@ -93,6 +577,7 @@ class ClaudeService:
         Args:
             recommendation: Recomendación base del algoritmo
             user_profile: Perfil del usuario con historial
+            fresh: Ignorar la caché de respuestas
             
         Returns:
             Recomendación enriquecida con insights
@@ -101,47 +586,8 @@ class ClaudeService:
             return recommendation
         
         try:
-            prompt = f"""
-            Analiza esta recomendación y sugiere mejoras basadas en el contexto:
-            
-            Recomendación actual:
-            - Opción A: {recommendation.get('option_a', {}).get('action')}
-            - Opción B: {recommendation.get('option_b', {}).get('action')}
-            - Recomendada: {recommendation.get('recommended_option')}
-            
-            Contexto:
-            - Fase circadiana: {recommendation.get('factors', {}).get('circadian_phase')}
-            - Energía: {recommendation.get('factors', {}).get('user_energy')}
-            
-            Proporciona:
-            1. ¿Por qué esta opción es mejor para este momento?
-            2. Un insight único sobre el timing
-            3. Una micro-acción para maximizar el resultado
-            
-            Responde en formato JSON.
-            """
-            
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=300,
-                temperature=0.6,
-                system="Eres un coach de productividad consciente especializado en ritmos naturales y toma de decisiones intuitivas.",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            # Intentar parsear como JSON
-            try:
-                enhancement = json.loads(response.content[0].text if isinstance(response.content, list) else response.content)
-                recommendation['ai_insights'] = enhancement
-            except:
-                # Si no es JSON, agregar como texto
-                recommendation['ai_insights'] = {
-                    'raw_insight': response.content[0].text if isinstance(response.content, list) else response.content,
-                    'enhanced': True
-                }
-            
-            logger.info("Recomendación enriquecida con Claude")
-            return recommendation
+            content = self.create_message(**self._enhance_request(recommendation), fresh=fresh)
+            return self._apply_enhancement(recommendation, content)
             
         except Exception as e:
             logger.error(f"Error enriqueciendo recomendación: {e}")
@@ -149,13 +595,15 @@ class ClaudeService:
     
     def analyze_weekly_patterns(
         self,
-        week_data: Dict[str, Any]
+        week_data: Dict[str, Any],
+        fresh: bool = False
     ) -> Dict[str, Any]:
         """
         Análisis semanal profundo de patrones.
         
         Args:
             week_data: Datos de la semana completa
+            fresh: Ignorar la caché de respuestas
             
         Returns:
             Análisis comprehensivo con tendencias
@@ -163,38 +611,9 @@ class ClaudeService:
         if not self.client:
             return {"status": "offline", "message": "Análisis offline no disponible"}
         
-        prompt = f"""
-        Analiza estos datos semanales y proporciona insights accionables:
-        
-        {json.dumps(week_data, indent=2)}
-        
-        Identifica:
-        1. PATRÓN PRINCIPAL: ¿Cuál es el pattern más significativo?
-        2. MOMENTO ÓPTIMO: ¿Cuándo la persona tiene mejor rendimiento?
-        3. PUNTO DE MEJORA: ¿Qué ajuste tendría mayor impacto?
-        4. PREDICCIÓN: Basado en patterns, ¿qué esperar la próxima semana?
-        5. EXPERIMENTO: Sugiere un experimento para la próxima semana
-        
-        Formato: JSON estructurado con estas 5 secciones.
-        """
-        
         try:
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",  # Usar Haiku para consistencia
-                max_tokens=1000,
-                temperature=0.7,
-                system="Eres un analista de datos conductuales experto en optimización de rendimiento humano basado en ritmos naturales y patrones de energía.",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            try:
-                content = response.content[0].text if isinstance(response.content, list) else response.content
-                return json.loads(content)
-            except:
-                return {
-                    "analysis": content,
-                    "timestamp": datetime.now().isoformat()
-                }
+            content = self.create_message(**self._weekly_request(week_data), fresh=fresh)
+            return self.parse_weekly_response(content)
                 
         except Exception as e:
             logger.error(f"Error en análisis semanal: {e}")
@@ -203,162 +622,281 @@ class ClaudeService:
     def generate_sacred_guidance(
         self,
         prayer_time: str,
-        current_state: Dict[str, Any]
+        current_state: Dict[str, Any],
+        fresh: bool = False
     ) -> str:
         """
         Genera guía específica para momentos de oración.
         
+        Si el prefetcher de guías está en marcha y ya generó la de este rezo
+        hoy, se devuelve esa sin llamar a Claude (salvo con fresh).
+        
         Args:
             prayer_time: Nombre del rezo (Fajr, Dhuhr, etc.)
             current_state: Estado actual del usuario
+            fresh: Ignorar la caché de respuestas y la guía pre-generada
             
         Returns:
             Guía personalizada para el momento
         """
+        prefetched = self._prefetched_guidance(prayer_time, fresh)
+        if prefetched is not None:
+            return prefetched
         if not self.client:
-            return self._default_prayer_guidance(prayer_time)
+            return self.default_prayer_guidance(prayer_time)
         
-        prompt = f"""
-        Genera una breve guía contemplativa para el rezo de {prayer_time}.
+        try:
+            return self.create_message(**self.guidance_request(prayer_time, current_state), fresh=fresh)
+            
+        except Exception as e:
+            logger.error(f"Error generando guía: {e}")
+            return self.default_prayer_guidance(prayer_time)
+
+
+class AsyncClaudeService(ClaudeServiceBase):
+    """
+    Variante asíncrona de ClaudeService para usar desde FastAPI sin
+    bloquear el event loop.
+    
+    - Como mucho CLAUDE_MAX_CONCURRENCY llamadas simultáneas a la API.
+    - Reintentos con backoff exponencial y jitter ante 429, 5xx y errores
+      de conexión (respetando Retry-After).
+    - Plazo máximo por llamada, esperas y reintentos incluidos.
+    - Las peticiones idénticas en vuelo comparten una sola llamada.
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        deadline: Optional[float] = None
+    ):
+        """Inicializa el servicio con API key desde configuración."""
+        super().__init__()
+        if not settings.ANTHROPIC_API_KEY:
+            logger.warning("Claude API key no configurada - modo offline")
+            self.client = None
+        else:
+            from anthropic import AsyncAnthropic
+            
+            # Los reintentos los gestiona este servicio, no el SDK
+            self.client = AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                base_url=settings.ANTHROPIC_BASE_URL,
+                max_retries=0
+            )
         
-        Contexto:
-        - Energía actual: {current_state.get('energy', 'media')}
-        - Fase del día: {current_state.get('phase', 'desconocida')}
-        - Estado emocional: {current_state.get('emotional', 'neutro')}
+        self.max_retries = settings.CLAUDE_MAX_RETRIES if max_retries is None else max_retries
+        self.deadline = deadline or settings.CLAUDE_CALL_DEADLINE_S
+        self._semaphore = asyncio.Semaphore(max_concurrency or settings.CLAUDE_MAX_CONCURRENCY)
+        self._in_flight: Dict[tuple, asyncio.Task] = {}
         
-        La guía debe:
-        1. Ser breve (2-3 líneas)
-        2. Conectar el momento presente con la intención del rezo
-        3. Ofrecer una pregunta o reflexión para la pausa
-        4. Respetar la naturaleza sagrada del momento
+        self.upstream_calls = 0
+        self.retries = 0
+        self.coalesced = 0
+    
+    async def create_message(
+        self,
+        prompt: str,
+        system: str,
+        max_tokens: int,
+        temperature: float,
+        model: str = "claude-3-haiku-20240307",
+        fresh: bool = False,
+        deadline: Optional[float] = None,
+        kind: str = "mensaje"
+    ) -> str:
+        """
+        Versión asíncrona de ClaudeService.create_message.
         
-        Tono: Contemplativo, respetuoso, no prescriptivo.
+        Lanza asyncio.TimeoutError si no hay respuesta en `deadline`
+        segundos (por defecto CLAUDE_CALL_DEADLINE_S).
         """
+        request = {"prompt": prompt, "system": system, "max_tokens": max_tokens,
+                   "temperature": temperature, "model": model}
+        estimated = request_tokens(request)
+        key, cached = await run_blocking(self._cached, request, fresh)
+        if cached is not None:
+            self.token_usage.record(kind, estimated, cached=True)
+            return cached
         
-        try:
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=150,
-                temperature=0.8,
-                system="Eres un guía espiritual respetuoso, conocedor de tradiciones contemplativas islámicas y universales. Ofreces reflexiones suaves sin imponer creencias.",
-                messages=[{"role": "user", "content": prompt}]
+        deadline = deadline or self.deadline
+        # Una llamada fresh nunca se une a una normal en vuelo (ni al revés)
+        flight_key = (model, system, prompt, max_tokens, temperature, fresh)
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            task = asyncio.create_task(
+                asyncio.wait_for(self._call_with_retries(request, key, kind, estimated), timeout=deadline)
             )
-            
-            content = response.content[0].text if isinstance(response.content, list) else response.content
-            return content
-            
-        except Exception as e:
-            logger.error(f"Error generando guía: {e}")
-            return self._default_prayer_guidance(prayer_time)
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda done: self._finish_flight(flight_key, done))
+        else:
+            self.coalesced += 1
+        
+        # shield: si un llamador se cancela o agota su plazo, los demás siguen esperando
+        return await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
     
-    def _build_pattern_prompt(
-        self, 
-        decisions: List[Dict[str, Any]], 
-        context: Optional[Dict[str, Any]]
+    def _finish_flight(self, flight_key: tuple, task: asyncio.Task) -> None:
+        """Retira la llamada compartida y recoge su excepción si nadie la esperaba."""
+        self._in_flight.pop(flight_key, None)
+        if not task.cancelled():
+            task.exception()
+    
+    async def _call_with_retries(
+        self,
+        request: Dict[str, Any],
+        key: Optional[str],
+        kind: str = "mensaje",
+        estimated: int = 0
     ) -> str:
-        """Construye prompt para análisis de patrones."""
-        
-        decisions_summary = []
-        for d in decisions[-10:]:  # Últimas 10 decisiones
-            decisions_summary.append({
-                "timestamp": d.get("timestamp", ""),
-                "choice": d.get("chosen", ""),
-                "satisfaction": d.get("satisfaction", 0),
-                "energy_before": d.get("energy_before", 0),
-                "energy_after": d.get("energy_after", 0)
-            })
+        """Llamada a la API con reintentos; guarda la respuesta en caché y anota sus tokens."""
+        attempt = 0
+        # claude_call incluye esperas y reintentos; upstream mide cada intento
+        with metrics.stage("claude_call"):
+            while True:
+                try:
+                    async with self._semaphore:
+                        self.upstream_calls += 1
+                        with metrics.upstream("claude"):
+                            response = await self.client.messages.create(
+                                model=request["model"],
+                                max_tokens=request["max_tokens"],
+                                temperature=request["temperature"],
+                                system=request["system"],
+                                messages=[{"role": "user", "content": request["prompt"]}]
+                            )
+                    break
+                except Exception as e:
+                    if attempt >= self.max_retries or not self._is_retryable(e):
+                        raise
+                    delay = self._backoff_delay(attempt, e)
+                    attempt += 1
+                    self.retries += 1
+                    logger.warning(f"Claude no disponible ({e.__class__.__name__}), "
+                                   f"reintento {attempt}/{self.max_retries} en {delay:.2f}s")
+                    await asyncio.sleep(delay)
         
-        prompt = f"""
-        Analiza estos patrones de decisión:
-        
-        {json.dumps(decisions_summary, indent=2)}
-        
-        Contexto adicional:
-        {json.dumps(context or {}, indent=2)}
-        
-        Identifica:
-        1. Patrón principal en las decisiones
-        2. Correlación entre energía y satisfacción
-        3. Momentos óptimos para diferentes tipos de decisiones
-        4. Recomendaciones específicas para mejorar
-        
-        Responde en formato JSON con estructura:
-        {{
-            "pattern_type": "tipo de patrón identificado",
-            "confidence": 0.0-1.0,
-            "insight": "insight principal",
-            "recommendations": ["rec1", "rec2", "rec3"],
-            "energy_correlation": 0.0-1.0
-        }}
-        """
+        self.token_usage.record(kind, estimated, getattr(response, "usage", None))
+        text = self._response_text(response)
+        if key is not None:
+            await run_blocking(self.cache.put, key, text, model=request["model"])
+        return text
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """429, 5xx y errores de conexión/timeout se reintentan; el resto no."""
+        from anthropic import APIConnectionError, APIStatusError
         
-        return prompt
+        if isinstance(error, APIConnectionError):
+            return True
+        return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
     
-    def _parse_pattern_response(self, response_content: Any) -> PatternAnalysis:
-        """Parsea respuesta de Claude a PatternAnalysis."""
+    @staticmethod
+    def _backoff_delay(attempt: int, error: Exception) -> float:
+        """Backoff exponencial con jitter completo; Retry-After manda si viene."""
+        cap = settings.CLAUDE_BACKOFF_MAX_S
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), cap)
+            except ValueError:
+                pass
+        return random.uniform(0, min(cap, settings.CLAUDE_BACKOFF_BASE_S * 2 ** attempt))
+    
+    async def analyze_decision_patterns(
+        self,
+        decisions: Optional[List[Dict[str, Any]]] = None,
+        context: Optional[Dict[str, Any]] = None,
+        fresh: bool = False
+    ) -> PatternAnalysis:
+        """Versión asíncrona de ClaudeService.analyze_decision_patterns."""
+        stats = await run_blocking(self._pattern_stats, decisions)
+        if not self.client:
+            return self._offline_analysis(stats)
+        
+        if decisions is None:
+            decisions = await run_blocking(self._load_decision_history)
+        reflections = await run_blocking(self._load_reflections)
+        
         try:
-            # Extraer texto del contenido de la respuesta
-            if isinstance(response_content, list):
-                # Claude a veces devuelve una lista de content blocks
-                text_content = response_content[0].text if response_content else "{}"
-            else:
-                text_content = str(response_content)
-            
-            # Intentar parsear como JSON
-            data = json.loads(text_content)
-            return PatternAnalysis(**data)
-            
+            request = self._pattern_request(decisions, context, stats, reflections)
+            content = await self.create_message(**request, fresh=fresh)
+            return self._parse_pattern_response(content)
         except Exception as e:
-            logger.warning(f"No se pudo parsear respuesta como JSON: {e}")
-            
-            # Crear respuesta por defecto
-            return PatternAnalysis(
-                pattern_type="analysis_parcial",
-                confidence=0.5,
-                insight=str(response_content)[:200],
-                recommendations=["Continuar observando patrones", "Mantener registro consistente"],
-                energy_correlation=None
-            )
+            logger.error(f"Error en análisis con Claude: {e!r}")
+            return self._offline_analysis(stats)
+    
+    async def enhance_recommendation(
+        self,
+        recommendation: Dict[str, Any],
+        user_profile: Optional[Dict[str, Any]] = None,
+        fresh: bool = False
+    ) -> Dict[str, Any]:
+        """Versión asíncrona de ClaudeService.enhance_recommendation."""
+        if not self.client:
+            return recommendation
+        
+        try:
+            content = await self.create_message(**self._enhance_request(recommendation), fresh=fresh)
+            return self._apply_enhancement(recommendation, content)
+        except Exception as e:
+            logger.error(f"Error enriqueciendo recomendación: {e!r}")
+            return recommendation
     
-    def _offline_analysis(self, decisions: List[Dict[str, Any]]) -> PatternAnalysis:
-        """Análisis básico cuando no hay conexión a Claude."""
+    async def analyze_weekly_patterns(
+        self,
+        week_data: Dict[str, Any],
+        fresh: bool = False,
+        map_reduce: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Versión asíncrona de ClaudeService.analyze_weekly_patterns.
         
-        if not decisions:
-            return PatternAnalysis(
-                pattern_type="sin_datos",
-                confidence=0.0,
-                insight="No hay suficientes datos para análisis",
-                recommendations=["Registrar más decisiones"],
-                energy_correlation=None
+        Con map_reduce, las decisiones se analizan por tramos de días en
+        paralelo y se fusionan en una última llamada (ver PeriodAnalyzer).
+        """
+        if map_reduce:
+            from src.services.period_analysis import PeriodAnalyzer
+            
+            extra = {key: value for key, value in week_data.items() if key != "decisions"}
+            return await PeriodAnalyzer(self).analyze(
+                week_data.get("decisions", []), extra=summarize_value(extra), fresh=fresh
             )
         
-        # Análisis simple local
-        avg_satisfaction = sum(d.get("satisfaction", 5) for d in decisions) / len(decisions)
+        if not self.client:
+            return {"status": "offline", "message": "Análisis offline no disponible"}
         
-        return PatternAnalysis(
-            pattern_type="análisis_local",
-            confidence=0.3,
-            insight=f"Satisfacción promedio: {avg_satisfaction:.1f}/10",
-            recommendations=[
-                "Activar Claude API para análisis profundo",
-                "Continuar registrando decisiones",
-                f"Tu satisfacción promedio es {'buena' if avg_satisfaction > 7 else 'mejorable'}"
-            ],
-            energy_correlation=0.5
-        )
+        try:
+            content = await self.create_message(**self._weekly_request(week_data), fresh=fresh)
+            return self.parse_weekly_response(content)
+        except Exception as e:
+            logger.error(f"Error en análisis semanal: {e!r}")
+            return {"error": str(e) or e.__class__.__name__}
     
-    def _default_prayer_guidance(self, prayer_time: str) -> str:
-        """Guía por defecto para momentos de oración."""
-        
-        guides = {
-            "Fajr": "Momento de nuevos comienzos. ¿Qué intención estableces para este día?",
-            "Dhuhr": "El sol en su cenit. Pausa para recentrarte en lo esencial.",
-            "Asr": "La tarde avanza. ¿Qué requiere completion antes del anochecer?",
-            "Maghrib": "Transición del día a la noche. Momento de gratitud y liberación.",
-            "Isha": "La quietud nocturna. ¿Qué dejas ir para descansar en paz?"
-        }
+    async def generate_sacred_guidance(
+        self,
+        prayer_time: str,
+        current_state: Dict[str, Any],
+        fresh: bool = False
+    ) -> str:
+        """Versión asíncrona de ClaudeService.generate_sacred_guidance."""
+        prefetched = self._prefetched_guidance(prayer_time, fresh)
+        if prefetched is not None:
+            return prefetched
+        if not self.client:
+            return self.default_prayer_guidance(prayer_time)
         
-        return guides.get(prayer_time, "Momento de conexión y recalibración interior.")
+        try:
+            return await self.create_message(**self.guidance_request(prayer_time, current_state), fresh=fresh)
+        except Exception as e:
+            logger.error(f"Error generando guía: {e!r}")
+            return self.default_prayer_guidance(prayer_time)
+    
+    async def aclose(self) -> None:
+        """Cierra el cliente HTTP asíncrono."""
+        if self.client is not None:
+            await self.client.close()
 
 
 # Función de utilidad para test rápido
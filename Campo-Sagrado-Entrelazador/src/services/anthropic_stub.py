@@ -0,0 +1,186 @@
+"""
+Campo Sagrado - Servidor local que imita la API de mensajes de Anthropic
+Para probar ClaudeService / AsyncClaudeService sin red ni coste
+
+Uso:
+    poetry run python -m src.services.anthropic_stub --port 8787 --latency-ms 200 --fail 429 529
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8787 ANTHROPIC_API_KEY=stub poetry run uvicorn src.api.main:app
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_ERROR_TYPES = {
+    400: "invalid_request_error",
+    401: "authentication_error",
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error",
+}
+
+
+def _default_reply(body: Dict[str, Any]) -> str:
+    """Respuesta por defecto: un JSON pequeño con datos de la petición."""
+    prompt = "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for message in body.get("messages", [])
+        for block in ([message["content"]] if isinstance(message["content"], str) else message["content"])
+    )
+    return json.dumps({"stub": True, "model": body.get("model"), "prompt_chars": len(prompt)})
+
+
+class AnthropicStub:
+    """
+    Servidor HTTP (stdlib) con POST /v1/messages en el formato de la API.
+
+    - latency_ms: espera antes de cada respuesta (los hilos la solapan).
+    - failures: códigos de estado que se devuelven, en orden, a las primeras
+      peticiones (p. ej. [429, 529] para probar reintentos).
+    - retry_after: valor de la cabecera Retry-After en las respuestas 429.
+    - reply: función (cuerpo de la petición) -> texto de la respuesta.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0,
+        failures: Iterable[int] = (),
+        retry_after: Optional[float] = None,
+        reply: Optional[Callable[[Dict[str, Any]], str]] = None,
+    ):
+        """Prepara el servidor; port=0 elige un puerto libre."""
+        self.latency = latency_ms / 1000
+        self.failures: List[int] = list(failures)
+        self.retry_after = retry_after
+        self.reply = reply or _default_reply
+        self.requests: List[Dict[str, Any]] = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL base para ANTHROPIC_BASE_URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "AnthropicStub":
+        """Arranca el servidor en un hilo de fondo."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="anthropic-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Detiene el servidor."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "AnthropicStub":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _handle(self, body: Dict[str, Any]) -> tuple:
+        """(estado, cabeceras, cuerpo JSON) para una petición."""
+        with self._lock:
+            self.requests.append(body)
+            number = len(self.requests)
+            status = self.failures.pop(0) if self.failures else 200
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if status != 200:
+                headers = {}
+                if status == 429 and self.retry_after is not None:
+                    headers["retry-after"] = str(self.retry_after)
+                error_type = _ERROR_TYPES.get(status, "api_error")
+                return status, headers, {"type": "error", "error": {"type": error_type, "message": f"stub {status}"}}
+            text = self.reply(body)
+            return 200, {}, {
+                "id": f"msg_stub_{number}",
+                "type": "message",
+                "role": "assistant",
+                "model": body.get("model", "stub"),
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": len(text) // 4},
+            }
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _handler_class(self):
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Cabeceras y cuerpo van en escrituras separadas: sin esto, Nagle y
+            # el ACK diferido añaden ~40 ms a cada respuesta en keep-alive
+            disable_nagle_algorithm = True
+
+            def do_POST(self) -> None:
+                if self.path.split("?")[0] != "/v1/messages":
+                    self._send(404, {}, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                    return
+                length = int(self.headers.get("content-length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, {}, {"type": "error", "error": {"type": "invalid_request_error", "message": "JSON inválido"}})
+                    return
+                self._send(*stub._handle(body))
+
+            def _send(self, status: int, headers: Dict[str, str], payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente abandonó la petición (p. ej. agotó su plazo)
+                    pass
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return _Handler
+
+
+def main() -> None:
+    """Arranca el stub en primer plano."""
+    parser = argparse.ArgumentParser(description="Stub local de la API de mensajes de Anthropic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fail", type=int, nargs="*", default=[], help="códigos de error para las primeras peticiones")
+    parser.add_argument("--retry-after", type=float, help="cabecera Retry-After de las respuestas 429")
+    args = parser.parse_args()
+
+    stub = AnthropicStub(args.host, args.port, args.latency_ms, args.fail, args.retry_after)
+    print(f"🧪 Stub de Anthropic escuchando en {stub.url} (Ctrl+C para salir)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Campo Sagrado - Caché en memoria de la recomendación actual
+Respuesta pre-serializada con ETag fuerte para GET /recommendation/current
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from loguru import logger
+
+from src.models.recommendation import Recommendation
+
+_MESSAGE = "Recomendación actual recuperada"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Cuerpo JSON ya codificado y su ETag."""
+    body: bytes
+    etag: str
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True si la cabecera If-None-Match incluye este ETag (o es '*')."""
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or self.etag in candidates
+
+
+class CurrentRecommendationCache:
+    """
+    Mantiene en memoria la respuesta de la recomendación actual.
+
+    set() se llama al generar una recomendación nueva; la mayoría de los
+    sondeos se sirven sin tocar disco ni codificar JSON. Tras un reinicio,
+    la primera lectura se carga con `loader` (historial o JSON actual).
+    """
+
+    def __init__(self, loader: Callable[[], Optional[Recommendation]]):
+        """Inicializa la caché vacía."""
+        self.loader = loader
+        self._entry: Optional[CachedResponse] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def set(self, recommendation: Recommendation) -> CachedResponse:
+        """Sustituye la recomendación actual y pre-serializa su respuesta."""
+        entry = _serialize(recommendation)
+        with self._lock:
+            self._set_locked(entry)
+        return entry
+
+    def invalidate(self) -> None:
+        """Olvida la entrada; la siguiente lectura vuelve a cargar."""
+        with self._lock:
+            self._entry = None
+            self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        """True si get() puede responder sin E/S."""
+        return self._loaded
+
+    def get(self) -> Optional[CachedResponse]:
+        """Entrada actual; carga desde el loader solo si aún no se ha cargado."""
+        if self._loaded:
+            return self._entry
+        try:
+            recommendation = self.loader()
+        except Exception as e:
+            logger.error(f"Error cargando la recomendación actual: {e}")
+            return None
+        if recommendation is None:
+            return None
+        entry = _serialize(recommendation)
+        # Comprobar y asignar bajo el mismo lock: un set() llegado durante la
+        # carga es más reciente y no se sobrescribe
+        with self._lock:
+            if self._loaded:
+                return self._entry
+            self._set_locked(entry)
+        return entry
+
+    def _set_locked(self, entry: CachedResponse) -> None:
+        """Instala la entrada (llamar con el lock tomado)."""
+        self._entry = entry
+        self._loaded = True
+
+
+def _serialize(recommendation: Recommendation) -> CachedResponse:
+    """Cuerpo de la respuesta y su ETag."""
+    body = (
+        f'{{"recommendation":{recommendation.model_dump_json()},'
+        f'"message":"{_MESSAGE}"}}'
+    ).encode("utf-8")
+    return CachedResponse(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def load_current_recommendation(json_path: Path, history_store) -> Optional[Recommendation]:
+    """Recomendación actual: última del historial o, si no hay, el JSON derivado."""
+    latest = history_store.latest()
+    if latest is not None:
+        return latest
+    if json_path.exists():
+        return Recommendation.model_validate_json(json_path.read_bytes())
+    return None
@@ -0,0 +1,207 @@
+"""
+Campo Sagrado - Pre-generación de guías antes de cada rezo
+Unos minutos antes de Fajr/Dhuhr/Asr/Maghrib/Isha se generan la guía y la
+recomendación enriquecida del momento; al llegar el rezo se sirven desde memoria
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.utils.config import settings
+from src.utils.executors import run_blocking
+
+PRAYERS = ("Fajr", "Dhuhr", "Asr", "Maghrib", "Isha")
+
+# Espera máxima de una vez: el horario se vuelve a consultar al despertar
+_MAX_SLEEP_S = 900
+
+# Reintentos de un prefetch fallido (espera inicial y máxima, se duplica)
+_RETRY_BASE_S = 30
+_RETRY_MAX_S = 300
+
+# Energía supuesta si no hay ninguna recomendación registrada
+_DEFAULT_ENERGY = 7
+
+
+@dataclass(frozen=True)
+class PrefetchedGuidance:
+    """Guía y recomendación enriquecida generadas para un rezo concreto."""
+    prayer: str
+    day: date
+    at: datetime
+    guidance: str
+    recommendation: Optional[Dict[str, Any]]
+    generated_at: datetime
+
+
+class GuidancePrefetcher:
+    """
+    Tarea de fondo que pre-genera, GUIDANCE_PREFETCH_LEAD_MINUTES antes de
+    cada rezo del día (según engine.get_prayer_times), la guía sagrada y la
+    recomendación enriquecida, y las guarda en memoria.
+
+    guidance() responde sin E/S: la entrada del rezo si se generó para hoy
+    o, si no (prefetch fallido o aún no hecho), default_prayer_guidance.
+    """
+
+    def __init__(self, engine, service=None, lead_minutes: Optional[float] = None):
+        """Usa el motor dado y el servicio indicado (o un AsyncClaudeService)."""
+        if service is None:
+            from src.services.ai_service import AsyncClaudeService
+            service = AsyncClaudeService()
+        self.engine = engine
+        self.service = service
+        self.lead = timedelta(minutes=settings.GUIDANCE_PREFETCH_LEAD_MINUTES if lead_minutes is None else lead_minutes)
+        self._entries: Dict[str, PrefetchedGuidance] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.prefetched = 0
+        self.failed = 0
+
+    # --- Lectura ---------------------------------------------------------
+
+    def get(self, prayer: str) -> Optional[PrefetchedGuidance]:
+        """Entrada pre-generada para el rezo de hoy, si la hay."""
+        entry = self._entries.get(prayer)
+        if entry is None or entry.day != datetime.now(self.engine.tz).date():
+            return None
+        return entry
+
+    def guidance(self, prayer: str) -> str:
+        """Guía del rezo: la pre-generada o la guía por defecto."""
+        entry = self.get(prayer)
+        return entry.guidance if entry is not None else self.service.default_prayer_guidance(prayer)
+
+    # --- Ciclo de fondo --------------------------------------------------
+
+    def start(self) -> None:
+        """Lanza la tarea de fondo en el event loop actual."""
+        global _active
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="guidance-prefetch")
+        _active = self
+
+    async def stop(self) -> None:
+        """Cancela la tarea de fondo y cierra el cliente."""
+        global _active
+        if _active is self:
+            _active = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.service.aclose()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                upcoming = await run_blocking(self.next_prayer)
+            except Exception as e:
+                logger.warning(f"No se pudo calcular el próximo rezo: {e!r}")
+                upcoming = None
+            if upcoming is None:
+                await asyncio.sleep(_MAX_SLEEP_S)
+                continue
+
+            prayer, at = upcoming
+            wait = (at - self.lead - datetime.now(self.engine.tz)).total_seconds()
+            if wait > 0:
+                await asyncio.sleep(min(wait, _MAX_SLEEP_S))
+                continue
+
+            entry = self._entries.get(prayer)
+            if entry is None or entry.at != at:
+                await self._prefetch_until(prayer, at)
+            # Hasta que empiece el rezo: después, el siguiente pasa a ser el próximo
+            await asyncio.sleep(max((at - datetime.now(self.engine.tz)).total_seconds(), 0) + 1)
+
+    async def _prefetch_until(self, prayer: str, at: datetime) -> Optional[PrefetchedGuidance]:
+        """Pre-genera la guía; si falla, reintenta con espera creciente mientras no empiece el rezo."""
+        delay = _RETRY_BASE_S
+        while True:
+            entry = await self.prefetch(prayer, at)
+            if entry is not None or not self.service.client:
+                return entry
+            if (at - datetime.now(self.engine.tz)).total_seconds() <= delay:
+                return None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RETRY_MAX_S)
+
+    def next_prayer(self, now: Optional[datetime] = None) -> Optional[Tuple[str, datetime]]:
+        """Próximo rezo (nombre, hora local): de hoy o, si ya pasaron todos, Fajr de mañana."""
+        now = now or datetime.now(self.engine.tz)
+        for day in (now.date(), now.date() + timedelta(days=1)):
+            timings = self.engine.get_prayer_times(day)
+            if not timings:
+                return None
+            for prayer in PRAYERS:
+                if prayer not in timings:
+                    continue
+                hour, minute = map(int, timings[prayer][:5].split(":"))
+                at = self.engine.tz.localize(datetime.combine(day, time(hour, minute)))
+                if at > now:
+                    return prayer, at
+        return None
+
+    # --- Pre-generación --------------------------------------------------
+
+    async def prefetch(self, prayer: str, at: datetime) -> Optional[PrefetchedGuidance]:
+        """Genera y guarda la guía y la recomendación enriquecida de un rezo."""
+        if not self.service.client:
+            return None
+        try:
+            recommendation, state = await run_blocking(self._moment, at)
+            guidance, enhanced = await asyncio.gather(
+                self.service.create_message(**self.service.guidance_request(prayer, state)),
+                self.service.enhance_recommendation(recommendation),
+            )
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"No se pudo pre-generar la guía de {prayer}: {e!r}")
+            return None
+
+        entry = PrefetchedGuidance(
+            prayer=prayer,
+            day=at.date(),
+            at=at,
+            guidance=guidance,
+            recommendation=enhanced,
+            generated_at=datetime.now(self.engine.tz),
+        )
+        self._entries[prayer] = entry
+        self.prefetched += 1
+        logger.info(f"Guía de {prayer} ({at:%H:%M}) pre-generada")
+        return entry
+
+    def _moment(self, at: datetime) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Recomendación para la hora del rezo y estado para la guía (energía de la última recomendación)."""
+        from src.core.circadian import circadian_curve
+
+        energy = _DEFAULT_ENERGY
+        latest = self.engine.history_store.latest()
+        if latest is not None:
+            try:
+                energy = int(str(latest.factors.get("user_energy", "")).split("/")[0])
+            except ValueError:
+                pass
+        recommendation = self.engine.generate_batch([energy], [at]).recommendation(0)
+        phase = circadian_curve().phase_at(at.hour * 60 + at.minute)
+        state = {"energy": f"{energy}/10", "phase": phase.phase}
+        return recommendation.model_dump(mode="json"), state
+
+
+# Prefetcher en marcha (el de la API): generate_sacred_guidance sirve su guía
+_active: Optional[GuidancePrefetcher] = None
+
+
+def prefetched_guidance(prayer: str) -> Optional[str]:
+    """Guía pre-generada hoy para un rezo por el prefetcher en marcha, si la hay."""
+    prefetcher = _active
+    entry = prefetcher.get(prayer.capitalize()) if prefetcher is not None else None
+    return entry.guidance if entry is not None else None
@@ -0,0 +1,239 @@
+"""
+Plantillas Markdown de Obsidian precompiladas
+Se compilan una vez al importar y renderizan directamente a bytes
+"""
+
+import hashlib
+import re
+from typing import Dict, Mapping, Optional, Tuple
+
+from src.models.recommendation import Recommendation
+
+_FIELD = re.compile(r"\{(\w+)\}")
+
+
+class MarkdownTemplate:
+    """
+    Plantilla con huecos {campo}.
+
+    Al compilar, el texto estático se codifica a UTF-8 una sola vez y se
+    convierte en una cadena de formato de bytes; render() es una única
+    operación % en C con los valores ya codificados.
+    """
+
+    def __init__(self, source: str):
+        """Compila la plantilla."""
+        parts = _FIELD.split(source)
+        self.fields: Tuple[str, ...] = tuple(parts[1::2])
+        static = [p.encode("utf-8").replace(b"%", b"%%") for p in parts[0::2]]
+        self._format = b"%s".join(static)
+
+    def render(self, values: Mapping[str, bytes]) -> bytes:
+        """Renderiza con valores ya codificados en bytes."""
+        return self._format % tuple(values[name] for name in self.fields)
+
+
+def recommendation_fields(recommendation: Recommendation) -> Dict[str, bytes]:
+    """Valores de una recomendación para las plantillas, formateados y codificados una vez."""
+    factors = recommendation.factors
+    option_a, option_b = recommendation.option_a, recommendation.option_b
+    timestamp = recommendation.timestamp
+    values = {
+        "section_id": section_id(recommendation),
+        "template_version": SECTION_TEMPLATE_VERSION,
+        "timestamp": timestamp.strftime("%Y-%m-%d %H:%M"),
+        "date": timestamp.strftime("%Y-%m-%d"),
+        "time": timestamp.strftime("%H:%M"),
+        "circadian_phase": factors['circadian_phase'],
+        "cognitive_capacity": factors['cognitive_capacity'],
+        "user_energy": factors['user_energy'],
+        "optimal_activity": factors['optimal_activity'],
+        "recommended_option": recommendation.recommended_option,
+        "confidence": f"{recommendation.confidence:.0%}",
+        "a_action": option_a.action,
+        "a_description": option_a.description,
+        "a_duration": option_a.duration,
+        "a_alignment": f"{option_a.alignment_score:.0%}",
+        "b_action": option_b.action,
+        "b_description": option_b.description,
+        "b_duration": option_b.duration,
+        "b_alignment": f"{option_b.alignment_score:.0%}",
+    }
+    return {name: str(value).encode("utf-8") for name, value in values.items()}
+
+
+DASHBOARD_SOURCE = """# 🕌 Recomendación Actual - Campo Sagrado
+
+> **Última actualización:** {timestamp}  
+> **Fase Circadiana:** {circadian_phase}  
+> **Capacidad Cognitiva:** {cognitive_capacity}  
+> **Tu Energía:** {user_energy}  
+> **Actividad Óptima:** {optimal_activity}
+
+---
+
+## ✨ Recomendación del Momento
+
+**Opción Recomendada:** **{recommended_option}**  
+**Confianza:** {confidence}
+
+---
+
+## 📋 Opciones Disponibles
+
+### [A] {a_action}
+- **Descripción:** {a_description}
+- **Duración:** {a_duration}
+- **Alineación:** {a_alignment}
+
+### [B] {b_action}
+- **Descripción:** {b_description}
+- **Duración:** {b_duration}
+- **Alineación:** {b_alignment}
+
+---
+
+## 🎯 Factores de Decisión
+
+| Factor | Valor |
+|--------|-------|
+| **Fase Circadiana** | {circadian_phase} |
+| **Capacidad Cognitiva** | {cognitive_capacity} |
+| **Tu Energía** | {user_energy} |
+| **Actividad Óptima** | {optimal_activity} |
+
+---
+
+## 🔄 Actualización Automática
+
+Este dashboard se actualiza automáticamente cada vez que se genera una nueva recomendación.
+
+> **Recuerda:** Tu autoridad sacral tiene la última palabra 🙏
+
+---
+*Generado por Campo Sagrado - Sistema de Recomendaciones Sacrales*
+"""
+
+# Nota diaria: cabecera estable (se escribe una vez al crear el archivo) y
+# una sección por recomendación que se añade al final. Cada sección empieza
+# con un marcador <!-- rec:<id> v<versión> --> para no duplicarla y poder
+# volver a renderizarla si cambia la plantilla.
+DAILY_HEADER_SOURCE = """---
+date: {date}
+type: recomendacion-diaria
+---
+# 📅 Recomendaciones del {date}
+
+- [[Current-Recommendation]]
+- [[00-DASHBOARDS/Current-Recommendation]]
+
+*Campo Sagrado - {date}*
+"""
+
+DAILY_SECTION_SOURCE = """
+---
+
+<!-- rec:{section_id} v{template_version} -->
+## 🕐 {time} · Opción {recommended_option}
+
+> **Fase Circadiana:** {circadian_phase}  
+> **Tu Energía:** {user_energy}
+
+**Opción Elegida:** **{recommended_option}**  
+**Confianza:** {confidence}
+
+### Opción A: {a_action}
+- **Descripción:** {a_description}
+- **Duración:** {a_duration}
+- **Alineación:** {a_alignment}
+
+### Opción B: {b_action}
+- **Descripción:** {b_description}
+- **Duración:** {b_duration}
+- **Alineación:** {b_alignment}
+
+### 🧠 Contexto Cognitivo
+
+- **Fase Circadiana:** {circadian_phase}
+- **Capacidad Cognitiva:** {cognitive_capacity}
+- **Actividad Óptima:** {optimal_activity}
+
+### 💭 Reflexiones
+
+> Espacio para notas personales sobre la implementación de esta recomendación...
+"""
+
+# Versión de la plantilla de sección: cambia con su texto
+SECTION_TEMPLATE_VERSION = hashlib.sha256(DAILY_SECTION_SOURCE.encode("utf-8")).hexdigest()[:8]
+
+# Compiladas una sola vez al importar el módulo
+DASHBOARD_TEMPLATE = MarkdownTemplate(DASHBOARD_SOURCE)
+DAILY_HEADER_TEMPLATE = MarkdownTemplate(DAILY_HEADER_SOURCE)
+DAILY_SECTION_TEMPLATE = MarkdownTemplate(DAILY_SECTION_SOURCE)
+
+# Marcadores de sección ya presentes en una nota diaria: identificador y
+# versión de la plantilla (ausente en notas anteriores a las versiones)
+SECTION_MARKER = re.compile(rb"<!-- rec:([0-9a-f]+)(?: v([0-9a-f]+))? -->")
+# Separador que precede a cada marcador y encabezado del espacio del usuario
+_SECTION_SEPARATOR = b"\n---\n\n"
+_REFLECTIONS_HEADING = re.compile("^#{2,3} 💭 Reflexiones[ \t]*$".encode("utf-8"), re.MULTILINE)
+
+
+def section_id(recommendation: Recommendation) -> str:
+    """Identificador estable de la sección de una recomendación (hash de su contenido)."""
+    return hashlib.sha256(recommendation.model_dump_json().encode("utf-8")).hexdigest()[:12]
+
+
+def render_daily_section(recommendation: Recommendation) -> Tuple[str, bytes]:
+    """Sección de la nota diaria para una recomendación, con su identificador."""
+    fields = recommendation_fields(recommendation)
+    return fields["section_id"].decode("ascii"), DAILY_SECTION_TEMPLATE.render(fields)
+
+
+def section_version(content: bytes) -> Optional[str]:
+    """Versión de plantilla del primer marcador de una sección renderizada."""
+    match = SECTION_MARKER.search(content)
+    return match.group(2).decode("ascii") if match and match.group(2) else None
+
+
+def rerender_sections(content: bytes, sections: Mapping[str, bytes], version: str) -> Tuple[bytes, int, bool]:
+    """
+    Sustituye en una nota las secciones renderizadas con otra versión de plantilla.
+    
+    Cada sección va de su marcador al separador de la siguiente (o al final
+    de la nota). Lo generado se reemplaza por el nuevo render y, desde el
+    encabezado de Reflexiones, se conserva tal cual lo que había: ahí
+    escribe el usuario. Una sección sin ese encabezado, o sin render nuevo
+    en `sections`, se deja como está.
+    
+    Returns:
+        Contenido resultante, secciones re-renderizadas y si quedan
+        secciones con otra versión
+    """
+    markers = list(SECTION_MARKER.finditer(content))
+    parts = []
+    position = 0
+    rerendered = 0
+    stale = False
+    for index, marker in enumerate(markers):
+        if marker.group(2) and marker.group(2).decode("ascii") == version:
+            continue
+        end = markers[index + 1].start() if index + 1 < len(markers) else len(content)
+        if content.endswith(_SECTION_SEPARATOR, marker.start(), end):
+            end -= len(_SECTION_SEPARATOR)
+        fresh = sections.get(marker.group(1).decode("ascii"))
+        old_reflections = _REFLECTIONS_HEADING.search(content, marker.start(), end)
+        new_reflections = _REFLECTIONS_HEADING.search(fresh) if fresh else None
+        if old_reflections is None or new_reflections is None:
+            stale = True
+            continue
+        fresh_marker = SECTION_MARKER.search(fresh)
+        parts += [
+            content[position:marker.start()],
+            fresh[fresh_marker.start():new_reflections.start()],
+            content[old_reflections.start():end],
+        ]
+        position = end
+        rerendered += 1
+    parts.append(content[position:])
+    return b"".join(parts), rerendered, stale
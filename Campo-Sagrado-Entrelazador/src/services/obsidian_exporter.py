@@ -3,13 +3,35 @@ Servicio de exportación a Obsidian para Campo Sagrado
 Convierte recomendaciones JSON a archivos Markdown formateados
 """
 
+import hashlib
 import json
+import os
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from loguru import logger
 
 from src.models.recommendation import Recommendation
+from src.services.markdown_templates import (
+    DAILY_HEADER_TEMPLATE,
+    DAILY_SECTION_TEMPLATE,
+    DASHBOARD_TEMPLATE,
+    SECTION_MARKER,
+    recommendation_fields,
+    render_daily_section,
+    rerender_sections,
+    section_version,
+)
+from src.utils import metrics
 from src.utils.config import settings
+from src.utils.fs import atomic_write_bytes
+
+
+# Notas diarias cuyos identificadores de sección se recuerdan en memoria
+SECTION_IDS_CACHE_SIZE = 64
 
 
 class ObsidianExporter:
@@ -20,151 +42,336 @@ class ObsidianExporter:
         self.obsidian_path = Path(settings.OBSIDIAN_VAULT_PATH)
         self.dashboards_path = self.obsidian_path / "00-DASHBOARDS"
         self.daily_path = self.obsidian_path / "01-DAILY"
+        # Los directorios se crean al escribir (atomic_write_bytes), no al importar
         
-        # Crear directorios si no existen
-        self.dashboards_path.mkdir(parents=True, exist_ok=True)
-        self.daily_path.mkdir(parents=True, exist_ok=True)
+        # Manifiesto: hash de lo último escrito en cada archivo del vault y,
+        # para las notas diarias, un resumen {"count", "last", "v"} de sus
+        # secciones (no la lista entera: guardarlo no crece con el historial)
+        self.manifest_path = Path(settings.CACHE_PATH) / "obsidian_manifest.json"
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_lock = threading.Lock()
+        # Un lock por nota diaria: leer lo ya añadido, escribir y anotarlo
+        # es una sola operación aunque escriban varios hilos el mismo día
+        self._note_locks: Dict[str, threading.Lock] = {}
+        # Identificadores de sección de las últimas notas tocadas
+        self._section_ids: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self.written = 0
+        self.skipped = 0
     
     def export_current_recommendation(self, recommendation: Recommendation) -> Path:
         """Exporta la recomendación actual al dashboard principal."""
-        markdown_content = self._generate_dashboard_markdown(recommendation)
-        
-        file_path = self.dashboards_path / "Current-Recommendation.md"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-        
-        print(f"📝 Dashboard exportado a: {file_path}")
-        return file_path
+        return self.export_dashboard(recommendation)[0]
     
     def export_daily_recommendation(self, recommendation: Recommendation) -> Path:
         """Exporta la recomendación a un archivo diario."""
+        return self._export_daily(recommendation)[0]
+    
+    def export_dashboard(self, recommendation: Recommendation, **write_options) -> Tuple[Path, bool]:
+        """
+        Renderiza y escribe el dashboard; indica si hubo escritura.
+        
+        Acepta las opciones de _write_if_changed (exists, save_manifest).
+        """
+        with metrics.stage("obsidian_render"):
+            content = DASHBOARD_TEMPLATE.render(recommendation_fields(recommendation))
+        
+        file_path = self.dashboards_path / "Current-Recommendation.md"
+        written = self._write_if_changed(file_path, content, **write_options)
+        if written:
+            print(f"📝 Dashboard exportado a: {file_path}")
+        return file_path, written
+    
+    def _export_daily(self, recommendation: Recommendation, **append_options) -> Tuple[Path, bool]:
+        """Añade la sección de la recomendación a su nota diaria; indica si hubo escritura."""
         date_str = recommendation.timestamp.strftime("%Y-%m-%d")
-        time_str = recommendation.timestamp.strftime("%H:%M")
+        with metrics.stage("obsidian_render"):
+            section = render_daily_section(recommendation)
+        file_path, appended = self.append_daily_sections(date_str, [section], **append_options)
+        if appended:
+            print(f"📅 Recomendación diaria exportada a: {file_path}")
+        return file_path, bool(appended)
+    
+    def daily_note_path(self, date_str: str) -> Path:
+        """Ruta de la nota diaria de una fecha (YYYY-MM-DD)."""
+        return self.daily_path / f"{date_str}-Recommendation.md"
+    
+    def existing_daily_notes(self) -> Set[str]:
+        """Nombres de las notas diarias existentes (un solo listado; vacío si el vault aún no existe)."""
+        try:
+            with os.scandir(self.daily_path) as entries:
+                return {entry.name for entry in entries}
+        except FileNotFoundError:
+            return set()
+    
+    def append_daily_sections(
+        self,
+        date_str: str,
+        sections: List[Tuple[str, bytes]],
+        exists: Optional[bool] = None,
+        save_manifest: bool = True,
+    ) -> Tuple[Path, int]:
+        """
+        Añade a la nota diaria las secciones que aún no tiene.
+        
+        Si la nota no existe se crea con la cabecera; si existe, solo se
+        escriben al final las secciones nuevas (modo 'ab'), sin volver a
+        renderizar las anteriores ni tocar lo que el usuario haya editado.
+        Los identificadores ya presentes se leen una vez de los marcadores
+        <!-- rec:… --> de la nota y se recuerdan en memoria; volver a
+        exportar la última sección (el caso habitual) se resuelve con el
+        resumen del manifiesto sin leer el archivo. Se puede llamar desde
+        varios hilos: las llamadas para el mismo día se serializan.
         
-        markdown_content = self._generate_daily_markdown(recommendation, date_str, time_str)
+        Si la nota tiene secciones de otra versión de la plantilla (el
+        resumen guarda la versión, "v"), las que llegan en `sections` se
+        vuelven a renderizar en su sitio conservando las Reflexiones.
         
-        file_path = self.daily_path / f"{date_str}-Recommendation.md"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+        `exists=True` evita el stat cuando el llamador ya listó el
+        directorio; con False se vuelve a comprobar con el lock tomado, por
+        si otro hilo acaba de crear la nota.
         
-        print(f"📅 Recomendación diaria exportada a: {file_path}")
-        return file_path
+        Returns:
+            Ruta de la nota y número de secciones añadidas o re-renderizadas
+        """
+        file_path = self.daily_note_path(date_str)
+        key = file_path.relative_to(self.obsidian_path).as_posix()
+        version = section_version(sections[0][1]) if sections else None
+        
+        with self._note_lock(key):
+            if not exists:
+                exists = file_path.exists()
+            
+            with self._manifest_lock:
+                summary = self._load_manifest().get(key)
+            if isinstance(summary, list):
+                # Manifiesto antiguo: lista completa de identificadores
+                summary = {"count": len(summary), "last": summary[-1]} if summary else None
+            current = isinstance(summary, dict) and summary.get("v") == version
+            
+            if exists and current and all(
+                section_id == summary.get("last") for section_id, _ in sections
+            ):
+                with self._manifest_lock:
+                    self.skipped += 1
+                return file_path, 0
+            
+            content: Optional[bytes] = None
+            if exists and not current:
+                # Plantilla cambiada (o nota anterior a las versiones): hay que
+                # mirar la versión de cada marcador
+                content = file_path.read_bytes()
+                seen = {m.group(1).decode('ascii') for m in SECTION_MARKER.finditer(content)}
+            else:
+                # Copia: si la escritura falla, lo recordado no cambia
+                seen = set(self._known_section_ids(key, file_path)) if exists else set()
+            new_ids: List[str] = []
+            payload: List[bytes] = []
+            for section_id, section in sections:
+                if section_id not in seen:
+                    seen.add(section_id)
+                    new_ids.append(section_id)
+                    payload.append(section)
+            
+            rerendered, stale = 0, False
+            if content is not None:
+                with metrics.stage("obsidian_render"):
+                    content, rerendered, stale = rerender_sections(content, dict(sections), version)
+            last = new_ids[-1] if new_ids else (summary or {}).get("last")
+            entry = {"count": len(seen), "last": last, "v": None if stale else version}
+            
+            if not payload and not rerendered:
+                with self._manifest_lock:
+                    self.skipped += 1
+                    if content is not None:
+                        # Nada que escribir, pero la próxima vez no hace falta leerla
+                        self._remember_section_ids(key, seen)
+                        self._manifest[key] = entry
+                        if save_manifest:
+                            self._save_manifest()
+                return file_path, 0
+            
+            with metrics.stage("obsidian_write"):
+                if rerendered:
+                    atomic_write_bytes(file_path, content + b"".join(payload))
+                elif exists:
+                    with open(file_path, 'ab') as f:
+                        f.write(b"".join(payload))
+                else:
+                    header = DAILY_HEADER_TEMPLATE.render({"date": date_str.encode('utf-8')})
+                    atomic_write_bytes(file_path, header + b"".join(payload))
+            
+            with self._manifest_lock:
+                self._remember_section_ids(key, seen)
+                self._manifest[key] = entry
+                self.written += 1
+                if save_manifest:
+                    self._save_manifest()
+        return file_path, len(new_ids) + rerendered
     
-    def _generate_dashboard_markdown(self, recommendation: Recommendation) -> str:
-        """Genera el contenido Markdown para el dashboard principal."""
-        timestamp = recommendation.timestamp.strftime("%Y-%m-%d %H:%M")
+    def _known_section_ids(self, key: str, file_path: Path) -> Set[str]:
+        """Identificadores de sección de una nota existente (memoria o marcadores del archivo)."""
+        with self._manifest_lock:
+            ids = self._section_ids.get(key)
+            if ids is not None:
+                self._section_ids.move_to_end(key)
+                return ids
+        return {m.group(1).decode('ascii') for m in SECTION_MARKER.finditer(file_path.read_bytes())}
+    
+    def _remember_section_ids(self, key: str, ids: Set[str]) -> None:
+        """Recuerda los identificadores de una nota (llamar con el lock del manifiesto)."""
+        self._section_ids[key] = ids
+        self._section_ids.move_to_end(key)
+        while len(self._section_ids) > SECTION_IDS_CACHE_SIZE:
+            self._section_ids.popitem(last=False)
+    
+    def _note_lock(self, key: str) -> threading.Lock:
+        """Lock de una nota diaria (se crea la primera vez)."""
+        with self._manifest_lock:
+            lock = self._note_locks.get(key)
+            if lock is None:
+                lock = self._note_locks[key] = threading.Lock()
+        return lock
+    
+    def export_many(
+        self,
+        recommendations: List[Recommendation],
+        current: Optional[Recommendation] = None,
+    ) -> Dict[str, Any]:
+        """
+        Exporta un lote de recomendaciones en una sola pasada.
         
-        content = f"""# 🕌 Recomendación Actual - Campo Sagrado
-
-> **Última actualización:** {timestamp}  
-> **Fase Circadiana:** {recommendation.factors['circadian_phase']}  
-> **Capacidad Cognitiva:** {recommendation.factors['cognitive_capacity']}  
-> **Tu Energía:** {recommendation.factors['user_energy']}  
-> **Actividad Óptima:** {recommendation.factors['optimal_activity']}
-
----
-
-## ✨ Recomendación del Momento
-
-**Opción Recomendada:** **{recommendation.recommended_option}**  
-**Confianza:** {recommendation.confidence:.0%}
-
----
-
-## 📋 Opciones Disponibles
-
-### [A] {recommendation.option_a.action}
-- **Descripción:** {recommendation.option_a.description}
-- **Duración:** {recommendation.option_a.duration}
-- **Alineación:** {recommendation.option_a.alignment_score:.0%}
-
-### [B] {recommendation.option_b.action}
-- **Descripción:** {recommendation.option_b.description}
-- **Duración:** {recommendation.option_b.duration}
-- **Alineación:** {recommendation.option_b.alignment_score:.0%}
-
----
-
-## 🎯 Factores de Decisión
-
-| Factor | Valor |
-|--------|-------|
-| **Fase Circadiana** | {recommendation.factors['circadian_phase']} |
-| **Capacidad Cognitiva** | {recommendation.factors['cognitive_capacity']} |
-| **Tu Energía** | {recommendation.factors['user_energy']} |
-| **Actividad Óptima** | {recommendation.factors['optimal_activity']} |
-
----
-
-## 🔄 Actualización Automática
-
-Este dashboard se actualiza automáticamente cada vez que se genera una nueva recomendación.
-
-> **Recuerda:** Tu autoridad sacral tiene la última palabra 🙏
-
----
-*Generado por Campo Sagrado - Sistema de Recomendaciones Sacrales*
-"""
+        El dashboard refleja `current` (por defecto la más reciente) y cada
+        nota diaria recibe, en una sola escritura, las secciones que le falten.
+        El directorio diario se lista una vez (sin un stat por archivo) y el
+        manifiesto se guarda una sola vez al final.
+        
+        Returns:
+            Rutas escritas o sin cambios ("paths") y los contadores
+            "written" / "skipped" del lote
+        """
+        if not recommendations:
+            return {"paths": [], "written": 0, "skipped": 0}
+        
+        by_day: Dict[str, List[Recommendation]] = {}
+        for recommendation in sorted(recommendations, key=lambda r: r.timestamp):
+            by_day.setdefault(recommendation.timestamp.strftime("%Y-%m-%d"), []).append(recommendation)
         
-        return content
+        existing = self.existing_daily_notes()
+        
+        paths: List[Path] = []
+        written = 0
+        if current is None:
+            current = max(recommendations, key=lambda r: r.timestamp)
+        path, was_written = self.export_dashboard(current, save_manifest=False)
+        paths.append(path)
+        written += was_written
+        for date_str, day_recommendations in by_day.items():
+            with metrics.stage("obsidian_render"):
+                sections = [render_daily_section(r) for r in day_recommendations]
+            path, appended = self.append_daily_sections(
+                date_str,
+                sections,
+                exists=self.daily_note_path(date_str).name in existing,
+                save_manifest=False,
+            )
+            paths.append(path)
+            written += bool(appended)
+        
+        if written:
+            self.flush_manifest()
+        return {"paths": paths, "written": written, "skipped": len(paths) - written}
+    
+    def _write_if_changed(
+        self,
+        file_path: Path,
+        content: bytes,
+        exists: Optional[bool] = None,
+        save_manifest: bool = True,
+    ) -> bool:
+        """
+        Escribe el archivo (temporal + rename) solo si su contenido cambió
+        respecto a la última exportación. Devuelve True si se escribió.
+        
+        `exists` evita el stat cuando el llamador ya listó el directorio;
+        con save_manifest=False el llamador guarda el manifiesto al final.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        key = file_path.relative_to(self.obsidian_path).as_posix()
+        
+        with self._manifest_lock:
+            manifest = self._load_manifest()
+            if manifest.get(key) == digest and (file_path.exists() if exists is None else exists):
+                self.skipped += 1
+                return False
+        
+        with metrics.stage("obsidian_write"):
+            atomic_write_bytes(file_path, content)
+        
+        with self._manifest_lock:
+            manifest[key] = digest
+            self.written += 1
+            if save_manifest:
+                self._save_manifest()
+        return True
+    
+    def flush_manifest(self) -> None:
+        """Guarda el manifiesto (tras escrituras con save_manifest=False)."""
+        with self._manifest_lock:
+            self._save_manifest()
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Carga el manifiesto la primera vez (llamar con el lock tomado)."""
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+            except FileNotFoundError:
+                self._manifest = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Manifiesto de Obsidian ilegible, se reconstruye: {e}")
+                self._manifest = {}
+        return self._manifest
+    
+    def _save_manifest(self) -> None:
+        """Persiste el manifiesto (llamar con el lock tomado)."""
+        if self._manifest is None:
+            # Sin cargar no hay cambios que guardar
+            return
+        try:
+            atomic_write_bytes(self.manifest_path, json.dumps(self._manifest).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el manifiesto de Obsidian: {e}")
+    
+    def _generate_dashboard_markdown(self, recommendation: Recommendation) -> str:
+        """Genera el contenido Markdown para el dashboard principal."""
+        return DASHBOARD_TEMPLATE.render(recommendation_fields(recommendation)).decode('utf-8')
     
     def _generate_daily_markdown(self, recommendation: Recommendation, date_str: str, time_str: str) -> str:
-        """Genera el contenido Markdown para el archivo diario."""
-        content = f"""# 📅 Recomendación del {date_str}
-
-> **Hora:** {time_str}  
-> **Fase Circadiana:** {recommendation.factors['circadian_phase']}  
-> **Tu Energía:** {recommendation.factors['user_energy']}
-
----
-
-## 🎯 Recomendación
-
-**Opción Elegida:** **{recommendation.recommended_option}**  
-**Confianza:** {recommendation.confidence:.0%}
-
----
-
-## 📋 Opciones Evaluadas
-
-### Opción A: {recommendation.option_a.action}
-- **Descripción:** {recommendation.option_a.description}
-- **Duración:** {recommendation.option_a.duration}
-- **Alineación:** {recommendation.option_a.alignment_score:.0%}
-
-### Opción B: {recommendation.option_b.action}
-- **Descripción:** {recommendation.option_b.description}
-- **Duración:** {recommendation.option_b.duration}
-- **Alineación:** {recommendation.option_b.alignment_score:.0%}
-
----
-
-## 🧠 Contexto Cognitivo
-
-- **Fase Circadiana:** {recommendation.factors['circadian_phase']}
-- **Capacidad Cognitiva:** {recommendation.factors['cognitive_capacity']}
-- **Actividad Óptima:** {recommendation.factors['optimal_activity']}
-
----
-
-## 💭 Reflexiones
-
-> Espacio para notas personales sobre la implementación de esta recomendación...
-
----
-
-## 🔗 Enlaces Relacionados
-
-- [[Current-Recommendation]]
-- [[00-DASHBOARDS/Current-Recommendation]]
-
----
-*Campo Sagrado - {date_str}*
-"""
+        """Genera una nota diaria nueva (cabecera + sección) para una recomendación."""
+        fields = recommendation_fields(recommendation)
+        fields["date"], fields["time"] = date_str.encode('utf-8'), time_str.encode('utf-8')
+        return (DAILY_HEADER_TEMPLATE.render(fields) + DAILY_SECTION_TEMPLATE.render(fields)).decode('utf-8')
+    
+    def export_recommendation(self, recommendation: Recommendation) -> Dict[str, Any]:
+        """
+        Exporta al dashboard y al archivo diario.
+
+        Returns:
+            Rutas ("dashboard", "daily") y cuántos archivos se escribieron
+            ("written") o se omitieron por no haber cambiado ("skipped")
+        """
+        dashboard_path, dashboard_written = self.export_dashboard(recommendation)
+        daily_path, daily_written = self._export_daily(recommendation)
+        written = int(dashboard_written) + int(daily_written)
         
-        return content
+        return {
+            "dashboard": dashboard_path,
+            "daily": daily_path,
+            "written": written,
+            "skipped": 2 - written
+        }
     
-    def export_from_json_file(self, json_path: Optional[Path] = None) -> Dict[str, Path]:
+    def export_from_json_file(self, json_path: Optional[Path] = None) -> Dict[str, Any]:
         """Exporta desde un archivo JSON existente."""
         if json_path is None:
             json_path = Path(settings.ANYTYPE_EXPORT_PATH) / "daily" / "current_recommendation.json"
@@ -180,13 +387,7 @@ Este dashboard se actualiza automáticamente cada vez que se genera una nueva re
         recommendation = Recommendation(**data)
         
         # Exportar a ambos formatos
-        dashboard_path = self.export_current_recommendation(recommendation)
-        daily_path = self.export_daily_recommendation(recommendation)
-        
-        return {
-            "dashboard": dashboard_path,
-            "daily": daily_path
-        }
+        return self.export_recommendation(recommendation)
 
 
 # Instancia global
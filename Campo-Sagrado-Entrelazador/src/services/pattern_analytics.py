@@ -0,0 +1,217 @@
+"""
+Campo Sagrado - Analítica local de decisiones
+Estadísticas vectorizadas (NumPy/pandas) sobre el historial de decisiones y
+sus resultados, para el análisis de patrones sin conexión
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.core.circadian import HOUR_TO_PHASE, PHASE_NAMES
+from src.utils.config import settings
+
+OPTIONS = ("A", "B")
+
+# Días de la ventana móvil de tendencia
+TREND_WINDOW_DAYS = 30
+
+# Cambio mínimo (puntos de satisfacción) entre ventanas para hablar de tendencia
+TREND_THRESHOLD = 0.25
+
+# Columnas que usa el análisis (las de HistoryStore.decision_columns)
+COLUMNS = ("timestamp_ms", "recommended", "phase", "chosen", "satisfaction", "energy_before", "energy_after")
+
+
+def decision_columns(decisions: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Pasa una lista de decisiones (formato de HistoryStore.decisions) a las
+    columnas de HistoryStore.decision_columns. Usa timestamp_ms si está y,
+    si no, interpreta el timestamp ISO.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(decisions, columns=COLUMNS + ("timestamp",))
+    timestamp_ms = pd.to_numeric(frame["timestamp_ms"], errors="coerce").to_numpy(dtype=float, copy=True)
+    missing = np.isnan(timestamp_ms)
+    if missing.any():
+        parsed = pd.to_datetime(frame["timestamp"][missing], utc=True, format="ISO8601")
+        elapsed = (parsed - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(milliseconds=1)
+        timestamp_ms[missing] = elapsed.to_numpy(dtype=float)
+
+    columns = {"timestamp_ms": timestamp_ms}
+    for name in ("recommended", "phase", "chosen"):
+        columns[name] = frame[name].to_numpy(dtype=object)
+    for name in ("satisfaction", "energy_before", "energy_after"):
+        columns[name] = pd.to_numeric(frame[name], errors="coerce").to_numpy(dtype=float)
+    return columns
+
+
+def _local_hours(timestamp_ms: np.ndarray) -> np.ndarray:
+    """Hora local (0-23) de cada timestamp; -1 si no hay timestamp."""
+    import pandas as pd
+
+    has_time = np.isfinite(timestamp_ms)
+    hours = np.full(timestamp_ms.shape, -1, dtype=np.int64)
+    if has_time.any():
+        local = pd.to_datetime(timestamp_ms[has_time].astype(np.int64), unit="ms", utc=True)
+        hours[has_time] = local.tz_convert(settings.TIMEZONE).hour
+    return hours
+
+
+def pearson(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Correlación de Pearson sobre los pares completos; None si no hay variación."""
+    mask = np.isfinite(x) & np.isfinite(y)
+    if mask.sum() < 3:
+        return None
+    x = x[mask] - x[mask].mean()
+    y = y[mask] - y[mask].mean()
+    # Varianza despreciable (p. ej. diferencias de energía constantes salvo redondeo)
+    if (x * x).mean() <= 1e-12 or (y * y).mean() <= 1e-12:
+        return None
+    return float((x * y).sum() / np.sqrt((x * x).sum() * (y * y).sum()))
+
+
+def _breakdown(codes: np.ndarray, values: np.ndarray, size: int) -> Dict[int, Dict[str, Any]]:
+    """Número de decisiones y satisfacción media por código (se omiten los vacíos)."""
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], minlength=size)
+    sums = np.bincount(codes[valid], weights=values[valid], minlength=size)
+    return {
+        int(code): {"count": int(counts[code]), "satisfaction": round(float(sums[code] / counts[code]), 2)}
+        for code in np.flatnonzero(counts)
+    }
+
+
+def _phase_codes(names: np.ndarray) -> np.ndarray:
+    """Índice de cada nombre de fase en PHASE_NAMES; -1 si falta o no se reconoce."""
+    import pandas as pd
+
+    return pd.Categorical(names, categories=PHASE_NAMES).codes.astype(np.int64)
+
+
+def _mean(values: np.ndarray) -> Optional[float]:
+    return round(float(values.mean()), 2) if values.size else None
+
+
+def _trend(timestamp_ms: np.ndarray, satisfaction: np.ndarray, window_days: int) -> Optional[Dict[str, Any]]:
+    """
+    Media móvil de la satisfacción en ventanas de window_days días: la
+    ventana más reciente frente a la inmediatamente anterior.
+    """
+    import pandas as pd
+
+    has_time = np.isfinite(timestamp_ms)
+    if not has_time.any():
+        return None
+    index = pd.to_datetime(timestamp_ms[has_time].astype(np.int64), unit="ms")
+    series = pd.Series(satisfaction[has_time], index=index).sort_index()
+    rolling = series.rolling(f"{window_days}D").mean()
+    end = series.index[-1]
+    current = float(rolling.iloc[-1])
+    earlier = rolling[rolling.index <= end - pd.Timedelta(days=window_days)]
+    previous = float(earlier.iloc[-1]) if len(earlier) else None
+
+    change = current - previous if previous is not None else 0.0
+    if previous is None or abs(change) < TREND_THRESHOLD:
+        direction = "estable"
+    else:
+        direction = "al_alza" if change > 0 else "a_la_baja"
+    return {
+        "window_days": window_days,
+        "current": round(current, 2),
+        "previous": round(previous, 2) if previous is not None else None,
+        "change": round(change, 2),
+        "direction": direction,
+    }
+
+
+def analyze_decisions(
+    decisions: List[Dict[str, Any]],
+    window_days: int = TREND_WINDOW_DAYS,
+) -> Dict[str, Any]:
+    """Como analyze_columns, partiendo de una lista de decisiones."""
+    if not decisions:
+        return {"sample_size": 0}
+    return analyze_columns(decision_columns(decisions), window_days)
+
+
+def analyze_columns(
+    columns: Dict[str, np.ndarray],
+    window_days: int = TREND_WINDOW_DAYS,
+) -> Dict[str, Any]:
+    """
+    Estadísticas de las decisiones con satisfacción registrada.
+
+    Returns:
+        sample_size, satisfaction_mean/std, correlaciones de la energía
+        (antes, después y su diferencia) con la satisfacción, desglose por
+        hora local y por fase circadiana, resultados por opción elegida y
+        por seguir o no la recomendación, y tendencia móvil
+    """
+    rated = np.isfinite(columns["satisfaction"])
+    if not rated.any():
+        return {"sample_size": 0}
+    columns = {name: values[rated] for name, values in columns.items()}
+
+    satisfaction = columns["satisfaction"]
+    energy_before = columns["energy_before"]
+    energy_after = columns["energy_after"]
+    chosen = columns["chosen"]
+
+    # Fase registrada en el contexto; si falta, la que corresponde a la hora local
+    hours = _local_hours(columns["timestamp_ms"])
+    phases = _phase_codes(columns["phase"])
+    from_hour = (phases < 0) & (hours >= 0)
+    phases[from_hour] = HOUR_TO_PHASE[hours[from_hour]]
+    by_phase = _breakdown(phases, satisfaction, len(PHASE_NAMES))
+
+    options = {}
+    for option in OPTIONS:
+        outcomes = satisfaction[chosen == option]
+        options[option] = {
+            "count": int(outcomes.size),
+            "share": round(outcomes.size / satisfaction.size, 3),
+            "satisfaction": _mean(outcomes),
+        }
+    decided = np.isin(chosen, OPTIONS)
+    followed = decided & (chosen == columns["recommended"])
+    overridden = decided & ~followed
+    options["followed"] = {
+        "rate": round(float(followed.sum() / decided.sum()), 3) if decided.any() else None,
+        "satisfaction": _mean(satisfaction[followed]),
+        "satisfaction_overridden": _mean(satisfaction[overridden]),
+    }
+
+    return {
+        "sample_size": int(satisfaction.size),
+        "satisfaction_mean": round(float(satisfaction.mean()), 2),
+        "satisfaction_std": round(float(satisfaction.std()), 2),
+        "correlations": {
+            "energy_before": pearson(energy_before, satisfaction),
+            "energy_after": pearson(energy_after, satisfaction),
+            "energy_delta": pearson(energy_after - energy_before, satisfaction),
+        },
+        "by_hour": _breakdown(hours, satisfaction, 24),
+        "by_phase": {str(PHASE_NAMES[code]): stats for code, stats in by_phase.items()},
+        "options": options,
+        "trend": _trend(columns["timestamp_ms"], satisfaction, window_days),
+    }
+
+
+def best_bucket(
+    breakdown: Dict[Any, Dict[str, Any]],
+    min_count: int = 5,
+    margin: float = 0.3,
+) -> Optional[Any]:
+    """
+    Clave con mayor satisfacción media entre las que tienen al menos
+    min_count decisiones, si supera a la media del resto en margin puntos.
+    """
+    candidates = {key: stats for key, stats in breakdown.items() if stats["count"] >= min_count}
+    if len(candidates) < 2:
+        return None
+    best = max(candidates, key=lambda key: candidates[key]["satisfaction"])
+    rest = [stats for key, stats in candidates.items() if key != best]
+    rest_mean = sum(s["count"] * s["satisfaction"] for s in rest) / sum(s["count"] for s in rest)
+    return best if candidates[best]["satisfaction"] - rest_mean >= margin else None
@@ -0,0 +1,315 @@
+"""
+Campo Sagrado - Análisis map-reduce de periodos largos
+Divide el periodo en tramos de días, los analiza en paralelo con Claude y
+fusiona los resultados parciales en un único análisis
+
+Uso:
+    poetry run python -m src.services.period_analysis --since 2024-01-01 --until 2024-04-01
+    poetry run python -m src.services.period_analysis --stub --days 90   # contra el stub local
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pytz
+from loguru import logger
+
+from src.services.pattern_analytics import analyze_decisions
+from src.services.prompt_budget import PromptBudget, compact_json, estimate_tokens
+from src.utils.config import settings
+from src.utils.executors import run_blocking
+
+CHUNK_SYSTEM = "Eres un analista de datos conductuales. Resumes tramos cortos de decisiones en JSON breve y preciso."
+
+CHUNK_INSTRUCTIONS = """Resume este tramo en JSON con estructura:
+{"periodo": "fechas", "patron": "patrón principal", "mejor_momento": "franja con mejor resultado", "energia": "relación energía-satisfacción", "hallazgos": ["h1", "h2"]}"""
+
+REDUCE_SYSTEM = "Eres un analista de datos conductuales experto en optimización de rendimiento humano basado en ritmos naturales y patrones de energía."
+
+REDUCE_INSTRUCTIONS = """Fusiona los análisis parciales en uno solo e identifica:
+1. PATRÓN PRINCIPAL: ¿Cuál es el pattern más significativo del periodo?
+2. MOMENTO ÓPTIMO: ¿Cuándo la persona tiene mejor rendimiento?
+3. PUNTO DE MEJORA: ¿Qué ajuste tendría mayor impacto?
+4. PREDICCIÓN: Basado en patterns, ¿qué esperar a continuación?
+5. EXPERIMENTO: Sugiere un experimento para el siguiente periodo
+
+Formato: JSON estructurado con estas 5 secciones."""
+
+Chunk = Tuple[date, date, List[Dict[str, Any]]]
+
+
+def chunk_by_days(decisions: Iterable[Dict[str, Any]], chunk_days: int = 1) -> List[Chunk]:
+    """
+    Agrupa las decisiones en tramos de chunk_days días locales consecutivos
+    (primer y último día del tramo, decisiones). Los tramos sin decisiones
+    no aparecen.
+    """
+    tz = pytz.timezone(settings.TIMEZONE)
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    first: Optional[date] = None
+    dated = []
+    for decision in decisions:
+        moment = datetime.fromisoformat(decision["timestamp"])
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        day = moment.astimezone(tz).date()
+        first = day if first is None or day < first else first
+        dated.append((day, decision))
+    for day, decision in dated:
+        groups.setdefault((day - first).days // chunk_days, []).append(decision)
+    return [
+        (first + timedelta(days=index * chunk_days), first + timedelta(days=index * chunk_days + chunk_days - 1), rows)
+        for index, rows in sorted(groups.items())
+    ]
+
+
+class PeriodAnalyzer:
+    """
+    Análisis map-reduce sobre un AsyncClaudeService.
+
+    - Map: un análisis breve por tramo, en paralelo (como mucho
+      CLAUDE_CHUNK_CONCURRENCY a la vez, además del límite del servicio).
+      Cada tramo se reintenta por su cuenta si falla la llamada o la
+      respuesta no es JSON; los que fallan del todo se omiten y se informan.
+    - Reduce: una llamada con los resultados parciales y las estadísticas
+      del periodo completo. Si no caben en CLAUDE_REDUCE_TOKEN_BUDGET se
+      fusionan por grupos en varios niveles.
+    """
+
+    def __init__(
+        self,
+        service=None,
+        chunk_days: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        retries: Optional[int] = None,
+    ):
+        """Usa el servicio dado o crea un AsyncClaudeService."""
+        if service is None:
+            from src.services.ai_service import AsyncClaudeService
+            service = AsyncClaudeService()
+        self.service = service
+        self.chunk_days = chunk_days or settings.CLAUDE_CHUNK_DAYS
+        self.concurrency = concurrency or settings.CLAUDE_CHUNK_CONCURRENCY
+        self.retries = settings.CLAUDE_CHUNK_RETRIES if retries is None else retries
+
+    async def analyze(
+        self,
+        decisions: Optional[List[Dict[str, Any]]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        extra: Optional[Dict[str, Any]] = None,
+        fresh: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Analiza un periodo.
+
+        Args:
+            decisions: Decisiones con resultado (por defecto, las del
+                historial local en [since, until))
+            extra: Otros datos del periodo para el paso de fusión
+            fresh: Ignorar la caché de respuestas
+
+        Returns:
+            Análisis fusionado, con "chunks" (total, ok, failed) y "stats"
+        """
+        if decisions is None:
+            from src.adapters.history_store import history_store
+            decisions = await run_blocking(history_store.decisions, since, until)
+
+        chunks = await run_blocking(chunk_by_days, decisions, self.chunk_days)
+        stats = await run_blocking(analyze_decisions, decisions)
+        summary = {"total": len(chunks), "ok": 0, "failed": []}
+        if not chunks:
+            return {"status": "sin_datos", "chunks": summary, "stats": stats}
+        if not self.service.client:
+            return {"status": "offline", "message": "Análisis con Claude no disponible", "chunks": summary, "stats": stats}
+
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def run(chunk: Chunk) -> Optional[Dict[str, Any]]:
+            async with limit:
+                return await self._map_chunk(chunk, fresh)
+
+        partials = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        for (start, end, _), partial in zip(chunks, partials):
+            if partial is None:
+                summary["failed"].append(_period_label(start, end))
+        ok = [partial for partial in partials if partial is not None]
+        summary["ok"] = len(ok)
+        if not ok:
+            return {"error": "Ningún tramo pudo analizarse", "chunks": summary, "stats": stats}
+
+        try:
+            result = await self._reduce(ok, self.service.stats_summary(stats) if stats["sample_size"] else {}, extra, fresh)
+        except Exception as e:
+            logger.error(f"Error fusionando el análisis del periodo: {e!r}")
+            return {"error": str(e) or e.__class__.__name__, "partials": ok, "chunks": summary, "stats": stats}
+        result["chunks"] = summary
+        result["stats"] = stats
+        return result
+
+    # --- Map -------------------------------------------------------------
+
+    def _chunk_request(self, chunk: Chunk) -> Dict[str, Any]:
+        """Petición de análisis de un tramo: estadísticas + filas que quepan."""
+        start, end, rows = chunk
+        label = _period_label(start, end)
+        budget = PromptBudget(settings.CLAUDE_CHUNK_TOKEN_BUDGET, CHUNK_SYSTEM + CHUNK_INSTRUCTIONS + label)
+        budget.add("Estadísticas", self.service.stats_summary(analyze_decisions(rows)))
+        budget.add_rows("Decisiones", self.service.decision_rows(rows), _decision_columns())
+        return {
+            "prompt": f"Tramo {label}:\n\n{budget.render()}\n\n{CHUNK_INSTRUCTIONS}",
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": 300,
+            "temperature": 0.3,
+            "system": CHUNK_SYSTEM,
+            "kind": "tramo",
+        }
+
+    async def _map_chunk(self, chunk: Chunk, fresh: bool) -> Optional[Dict[str, Any]]:
+        """Analiza un tramo con reintentos propios; None si no lo consigue."""
+        label = _period_label(chunk[0], chunk[1])
+        request = await run_blocking(self._chunk_request, chunk)
+        for attempt in range(self.retries + 1):
+            try:
+                # Tras un fallo se ignora la caché: podría tener la respuesta inválida
+                content = await self.service.create_message(**request, fresh=fresh or attempt > 0)
+                partial = json.loads(content)
+                if not isinstance(partial, dict):
+                    raise ValueError("la respuesta no es un objeto JSON")
+                partial.setdefault("periodo", label)
+                return partial
+            except Exception as e:
+                logger.warning(f"Tramo {label}: intento {attempt + 1}/{self.retries + 1} fallido ({e!r})")
+        return None
+
+    # --- Reduce ----------------------------------------------------------
+
+    async def _reduce(
+        self,
+        partials: List[Dict[str, Any]],
+        stats: Dict[str, Any],
+        extra: Optional[Dict[str, Any]],
+        fresh: bool,
+    ) -> Dict[str, Any]:
+        """Fusiona los parciales; si no caben en el presupuesto, primero por grupos."""
+        fixed = REDUCE_SYSTEM + REDUCE_INSTRUCTIONS + compact_json(stats) + compact_json(extra or {})
+        room = settings.CLAUDE_REDUCE_TOKEN_BUDGET - estimate_tokens(fixed)
+        while len(partials) > 1 and estimate_tokens(compact_json(partials)) > room:
+            groups = _split_to_fit(partials, room)
+            logger.info(f"Fusión intermedia: {len(partials)} parciales en {len(groups)} grupos")
+            merged = await asyncio.gather(*(self._reduce_call(group, {}, None, fresh) for group in groups))
+            partials = [self.service.parse_weekly_response(content) for content in merged]
+        content = await self._reduce_call(partials, stats, extra, fresh)
+        return self.service.parse_weekly_response(content)
+
+    async def _reduce_call(
+        self,
+        partials: List[Dict[str, Any]],
+        stats: Dict[str, Any],
+        extra: Optional[Dict[str, Any]],
+        fresh: bool,
+    ) -> str:
+        budget = PromptBudget(settings.CLAUDE_REDUCE_TOKEN_BUDGET, REDUCE_SYSTEM + REDUCE_INSTRUCTIONS)
+        if stats:
+            budget.add("Estadísticas del periodo", stats)
+        if extra:
+            budget.add("Otros datos del periodo", extra)
+        budget.add("Análisis parciales", partials, required=True)
+        return await self.service.create_message(
+            prompt=f"{budget.render()}\n\n{REDUCE_INSTRUCTIONS}",
+            system=REDUCE_SYSTEM,
+            max_tokens=1000,
+            temperature=0.5,
+            model="claude-3-haiku-20240307",
+            fresh=fresh,
+            kind="fusion",
+        )
+
+
+def _decision_columns() -> Tuple[str, ...]:
+    from src.services.ai_service import DECISION_COLUMNS
+    return DECISION_COLUMNS
+
+
+def _period_label(start: date, end: date) -> str:
+    return start.isoformat() if start == end else f"{start.isoformat()}/{end.isoformat()}"
+
+
+def _split_to_fit(partials: List[Dict[str, Any]], room: int) -> List[List[Dict[str, Any]]]:
+    """Grupos consecutivos de parciales que caben cada uno en `room` tokens (al menos 2 por grupo)."""
+    groups: List[List[Dict[str, Any]]] = [[]]
+    for partial in partials:
+        group = groups[-1]
+        if len(group) >= 2 and estimate_tokens(compact_json(group + [partial])) > room:
+            groups.append([partial])
+        else:
+            group.append(partial)
+    return groups
+
+
+def _synthetic_decisions(days: int, per_day: int = 12) -> List[Dict[str, Any]]:
+    """Decisiones de ejemplo para probar contra el stub."""
+    import random
+
+    rng = random.Random(0)
+    start = datetime.now(timezone.utc).replace(hour=6, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    decisions = []
+    for day in range(days):
+        for i in range(per_day):
+            energy = rng.uniform(1, 10)
+            decisions.append({
+                "timestamp": (start + timedelta(days=day, minutes=75 * i)).isoformat(),
+                "recommended": rng.choice("AB"),
+                "chosen": rng.choice("AB"),
+                "satisfaction": min(10.0, max(1.0, energy * 0.5 + rng.gauss(4, 1))),
+                "energy_before": energy,
+                "energy_after": min(10.0, energy + rng.gauss(0.5, 1)),
+            })
+    return decisions
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Análisis map-reduce de un periodo con Claude")
+    parser.add_argument("--since", type=_parse_date, help="desde esta fecha (ISO, incluida)")
+    parser.add_argument("--until", type=_parse_date, help="hasta esta fecha (ISO, excluida)")
+    parser.add_argument("--chunk-days", type=int, help="días por tramo (por defecto, CLAUDE_CHUNK_DAYS)")
+    parser.add_argument("--stub", action="store_true", help="usar el stub local de Anthropic y datos sintéticos")
+    parser.add_argument("--days", type=int, default=30, help="días de datos sintéticos con --stub")
+    parser.add_argument("--fail", type=int, nargs="*", default=[], help="códigos de error del stub para las primeras peticiones")
+    args = parser.parse_args(argv)
+
+    stub = None
+    decisions = None
+    if args.stub:
+        from src.services.anthropic_stub import AnthropicStub
+
+        stub = AnthropicStub(latency_ms=50, failures=args.fail).start()
+        settings.ANTHROPIC_BASE_URL = stub.url
+        settings.ANTHROPIC_API_KEY = settings.ANTHROPIC_API_KEY or "stub"
+        decisions = _synthetic_decisions(args.days)
+
+    try:
+        analyzer = PeriodAnalyzer(chunk_days=args.chunk_days)
+        result = asyncio.run(analyzer.analyze(decisions, since=args.since, until=args.until, fresh=True))
+        chunks = result["chunks"]
+        print(f"📊 Tramos: {chunks['ok']}/{chunks['total']} analizados"
+              + (f", fallidos: {', '.join(chunks['failed'])}" if chunks["failed"] else ""))
+        print(f"🔢 Tokens: {json.dumps(analyzer.service.token_usage.stats(), ensure_ascii=False)}")
+        print(json.dumps({key: value for key, value in result.items() if key not in ("chunks", "stats")},
+                         ensure_ascii=False, indent=2))
+    finally:
+        if stub is not None:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
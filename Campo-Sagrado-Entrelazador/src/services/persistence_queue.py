@@ -0,0 +1,211 @@
+"""
+Campo Sagrado - Persistencia write-behind de recomendaciones
+Saca la escritura a disco del camino de la petición y agrupa ráfagas
+"""
+
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+from src.models.recommendation import Recommendation
+from src.utils.config import settings
+
+# Reintentos de un lote fallido: espera inicial (se duplica), máxima e intentos
+_RETRY_BASE_S = 0.5
+_RETRY_MAX_S = 30.0
+_MAX_ATTEMPTS = 8
+
+
+class RecommendationWriteBehind:
+    """
+    Cola write-behind para save_recommendation.
+
+    submit() solo encola y vuelve. Un hilo de fondo agrupa las ráfagas: del
+    dashboard (JSON actual + Current-Recommendation.md) solo escribe el
+    último estado, pero conserva todas las entradas de historial (almacén
+    append-only y notas diarias). Las escrituras son atómicas y stop()
+    vacía la cola antes de salir.
+
+    Un lote que falla vuelve a la cola y se reintenta con espera creciente
+    (solo la exportación, si el historial ya se guardó). Tras _MAX_ATTEMPTS
+    fallos seguidos, o si falla al detenerse, se descarta y cuenta en `lost`.
+    """
+
+    def __init__(self, engine, exporter=None, coalesce_ms: Optional[float] = None):
+        """Inicializa la cola; el hilo arranca con el primer submit()."""
+        self.engine = engine
+        self._exporter = exporter
+        self.coalesce_seconds = (
+            settings.WRITE_BEHIND_COALESCE_MS if coalesce_ms is None else coalesce_ms
+        ) / 1000
+
+        self._cond = threading.Condition()
+        self._latest: Optional[Recommendation] = None
+        self._history: List[Recommendation] = []
+        # Ya en el historial, pendientes de exportar a Obsidian (tras un fallo)
+        self._unexported: List[Recommendation] = []
+        self._attempts = 0
+        self._retry_at = 0.0
+        self._stopping = False
+        self._flushing = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.submitted = 0
+        self.flushes = 0
+        self.failed_writes = 0
+        self.lost = 0
+
+    @property
+    def exporter(self):
+        """Exportador de Obsidian (se importa al primer uso)."""
+        if self._exporter is None:
+            from src.services.obsidian_exporter import obsidian_exporter
+            self._exporter = obsidian_exporter
+        return self._exporter
+
+    @property
+    def pending(self) -> int:
+        """Entradas de historial pendientes de escribir (incluidas las que esperan reintento)."""
+        with self._cond:
+            return len(self._history) + len(self._unexported)
+
+    def submit(self, recommendation: Recommendation) -> None:
+        """Encola una recomendación para persistirla en segundo plano."""
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("La cola de persistencia está detenida")
+            self._latest = recommendation
+            self._history.append(recommendation)
+            self.submitted += 1
+            self._ensure_started()
+            self._cond.notify()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que todo lo encolado esté en disco (reintentos incluidos).
+
+        Returns:
+            False si se agotó el plazo o si mientras tanto se descartó algún lote
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            lost = self.lost
+            while self._history or self._unexported or self._flushing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self.lost == lost
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Vacía la cola y detiene el hilo (llamar al apagar la aplicación)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.warning("La cola de persistencia no terminó de vaciarse a tiempo")
+        if self.lost:
+            logger.error(f"{self.lost} recomendaciones no se pudieron persistir")
+
+    def _ensure_started(self) -> None:
+        """Arranca el hilo de escritura (llamar con el lock tomado)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="recommendation-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Bucle del hilo: espera trabajo (o el próximo reintento), agrupa la ráfaga y escribe."""
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if not self._history and not self._unexported:
+                        self._cond.wait()
+                        continue
+                    backoff = self._retry_at - time.monotonic()
+                    if backoff <= 0:
+                        break
+                    self._cond.wait(backoff)
+                if self._stopping and not self._history and not self._unexported:
+                    return
+                stopping = self._stopping
+
+            # Ventana corta para que las peticiones en ráfaga compartan escritura
+            if self.coalesce_seconds and not stopping:
+                time.sleep(self.coalesce_seconds)
+
+            with self._cond:
+                latest, history, unexported = self._latest, self._history, self._unexported
+                self._latest, self._history, self._unexported = None, [], []
+                self._flushing = True
+
+            leftovers = (history, unexported)
+            try:
+                leftovers = self._write(latest, history, unexported)
+            finally:
+                with self._cond:
+                    if any(leftovers):
+                        self._requeue(latest, *leftovers, stopping=stopping)
+                    else:
+                        self._attempts = 0
+                    self._flushing = False
+                    self.flushes += 1
+                    self._cond.notify_all()
+
+    def _write(
+        self,
+        latest: Optional[Recommendation],
+        history: List[Recommendation],
+        unexported: List[Recommendation],
+    ) -> Tuple[List[Recommendation], List[Recommendation]]:
+        """
+        Escribe el último estado del dashboard y todas las entradas de historial.
+
+        Returns:
+            Lo que queda sin guardar en el historial y lo que queda sin exportar
+        """
+        if history:
+            try:
+                self.engine.record_history(history)
+            except Exception as e:
+                logger.error(f"Error guardando {len(history)} recomendaciones en el historial: {e}")
+                return history, unexported
+        batch = unexported + history
+        current = latest or batch[-1]
+        try:
+            self.exporter.export_many(batch, current=current)
+        except Exception as e:
+            logger.error(f"Error exportando {len(batch)} recomendaciones a Obsidian: {e}")
+            return [], batch
+        return [], []
+
+    def _requeue(
+        self,
+        latest: Optional[Recommendation],
+        unrecorded: List[Recommendation],
+        unexported: List[Recommendation],
+        stopping: bool,
+    ) -> None:
+        """
+        Devuelve un lote fallido a la cabeza de la cola o, agotados los
+        intentos, lo descarta (llamar con el lock tomado).
+        """
+        self.failed_writes += 1
+        self._attempts += 1
+        if stopping or self._attempts >= _MAX_ATTEMPTS:
+            lost = len(unrecorded) + len(unexported)
+            logger.error(f"Se descartan {lost} recomendaciones tras {self._attempts} intentos fallidos")
+            self.lost += lost
+            self._attempts = 0
+            return
+        self._history[:0] = unrecorded
+        self._unexported[:0] = unexported
+        if self._latest is None:
+            self._latest = latest
+        self._retry_at = time.monotonic() + min(_RETRY_BASE_S * 2 ** (self._attempts - 1), _RETRY_MAX_S)
@@ -0,0 +1,197 @@
+"""
+Campo Sagrado - Prompts con presupuesto de tokens
+Codificación compacta de datos, resúmenes precalculados en lugar de filas
+crudas y registro de los tokens enviados en cada llamada
+"""
+
+import json
+import math
+import threading
+from collections import Counter, deque
+from typing import Any, Dict, List, Sequence
+
+from loguru import logger
+
+# Caracteres por token (estimación conservadora para texto en español y JSON)
+CHARS_PER_TOKEN = 3.5
+
+# Valores distintos que se listan por campo de texto en summarize_records
+TOP_VALUES = 5
+
+# Campos de fecha: se resumen como primero/último
+TIME_KEYS = ("timestamp", "date", "fecha")
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens aproximados de un texto (sin llamar a la API)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact(value: Any, digits: int = 2) -> Any:
+    """Redondea floats y quita claves vacías (None, {} o []) recursivamente."""
+    if isinstance(value, float):
+        return round(value, digits)
+    if isinstance(value, dict):
+        items = ((str(key), compact(item, digits)) for key, item in value.items())
+        return {key: item for key, item in items if item is not None and item != {} and item != []}
+    if isinstance(value, (list, tuple)):
+        return [compact(item, digits) for item in value]
+    return value
+
+
+def compact_json(value: Any, digits: int = 2) -> str:
+    """JSON sin espacios ni escapes ASCII, con floats redondeados."""
+    return json.dumps(compact(value, digits), ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def table(records: Sequence[Dict[str, Any]], columns: Sequence[str]) -> Dict[str, Any]:
+    """Filas como tabla {"cols": [...], "rows": [[...]]}: las claves no se repiten por fila."""
+    return {"cols": list(columns), "rows": [[record.get(column) for column in columns] for record in records]}
+
+
+def summarize_records(records: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Resumen de una lista de registros: número, media/mín/máx de los campos
+    numéricos y los valores más frecuentes de los de texto.
+    """
+    numeric: Dict[str, List[float]] = {}
+    text: Dict[str, Counter] = {}
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, bool) or value is None:
+                continue
+            if isinstance(value, (int, float)):
+                numeric.setdefault(key, []).append(float(value))
+            elif isinstance(value, str):
+                text.setdefault(key, Counter())[value] += 1
+
+    summary: Dict[str, Any] = {"n": len(records)}
+    for key, values in numeric.items():
+        summary[key] = {"mean": sum(values) / len(values), "min": min(values), "max": max(values)}
+    for key, counts in text.items():
+        if key in TIME_KEYS:
+            ordered = sorted(counts)
+            summary[key] = {"first": ordered[0], "last": ordered[-1]}
+        elif len(counts) < len(records) or len(records) == 1:
+            # Los identificadores (todos distintos) no aportan nada resumidos
+            summary[key] = dict(counts.most_common(TOP_VALUES))
+    return summary
+
+
+def summarize_value(value: Any) -> Any:
+    """Sustituye las listas de registros (dicts) por su resumen, recursivamente."""
+    if isinstance(value, dict):
+        return {key: summarize_value(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return summarize_records(value)
+    return value
+
+
+class PromptBudget:
+    """
+    Construye la parte de datos de un prompt sin pasar de un presupuesto de
+    tokens. Las secciones se añaden por orden de prioridad: la que no cabe
+    se descarta (o, si es una tabla, se recorta a las filas más recientes).
+
+    El presupuesto cuenta también el texto fijo (instrucciones y system).
+    """
+
+    def __init__(self, budget_tokens: int, fixed_text: str = ""):
+        """Empieza con los tokens del texto fijo ya consumidos."""
+        self.budget_tokens = budget_tokens
+        # Margen para los separadores entre el texto fijo y las secciones
+        self.used_tokens = estimate_tokens(fixed_text) + 4
+        self.sections: List[str] = []
+        self.dropped: List[str] = []
+
+    @property
+    def remaining(self) -> int:
+        return self.budget_tokens - self.used_tokens
+
+    def add(self, title: str, value: Any, required: bool = False) -> bool:
+        """Añade una sección si cabe (o siempre, si es obligatoria)."""
+        section = f"{title}:\n{value if isinstance(value, str) else compact_json(value)}"
+        tokens = estimate_tokens(section) + 1
+        if tokens > self.remaining and not required:
+            self.dropped.append(title)
+            return False
+        self.sections.append(section)
+        self.used_tokens += tokens
+        return True
+
+    def add_rows(self, title: str, records: Sequence[Dict[str, Any]], columns: Sequence[str]) -> int:
+        """
+        Añade una tabla con tantas filas finales de `records` como quepan.
+
+        Returns:
+            Filas incluidas
+        """
+        low, high = 0, len(records)
+        while low < high:
+            middle = (low + high + 1) // 2
+            section = f"{title}:\n{compact_json(table(records[-middle:], columns))}"
+            if estimate_tokens(section) + 1 <= self.remaining:
+                low = middle
+            else:
+                high = middle - 1
+        if low:
+            self.add(title, table(records[-low:], columns), required=True)
+        if low < len(records):
+            self.dropped.append(f"{title} ({len(records) - low} filas)")
+        return low
+
+    def render(self) -> str:
+        return "\n\n".join(self.sections)
+
+
+class TokenLedger:
+    """Tokens por tipo de petición: estimados al enviar y los que informa la API."""
+
+    def __init__(self, keep: int = 256):
+        """Guarda los totales y las últimas `keep` llamadas."""
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self.recent: deque = deque(maxlen=keep)
+
+    def record(
+        self,
+        kind: str,
+        estimated_tokens: int,
+        usage: Any = None,
+        cached: bool = False,
+    ) -> None:
+        """Registra una llamada (usage: el de la respuesta de la API, si la hubo)."""
+        input_tokens = getattr(usage, "input_tokens", None)
+        output_tokens = getattr(usage, "output_tokens", None)
+        entry = {
+            "kind": kind,
+            "estimated_tokens": estimated_tokens,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached": cached,
+        }
+        with self._lock:
+            totals = self._totals.setdefault(kind, {
+                "calls": 0, "cached": 0, "estimated_tokens": 0, "input_tokens": 0, "output_tokens": 0,
+            })
+            totals["calls"] += 1
+            if cached:
+                totals["cached"] += 1
+            else:
+                totals["estimated_tokens"] += estimated_tokens
+                totals["input_tokens"] += input_tokens or 0
+                totals["output_tokens"] += output_tokens or 0
+            self.recent.append(entry)
+        if not cached:
+            logger.debug(f"Claude {kind}: ~{estimated_tokens} tokens estimados, "
+                         f"{input_tokens} de entrada, {output_tokens} de salida")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Totales por tipo de petición."""
+        with self._lock:
+            return {kind: dict(totals) for kind, totals in self._totals.items()}
+
+
+def request_tokens(request: Dict[str, Any]) -> int:
+    """Tokens estimados de una petición (system + prompt)."""
+    return estimate_tokens(request["system"]) + estimate_tokens(request["prompt"])
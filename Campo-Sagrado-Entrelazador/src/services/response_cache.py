@@ -0,0 +1,171 @@
+"""
+Campo Sagrado - Caché de respuestas de Claude
+LRU en memoria con respaldo en disco (CACHE_PATH/claude/), con límite de
+tamaño y caducidad
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.utils.config import settings
+from src.utils.fs import atomic_write_bytes
+
+
+class ResponseCache:
+    """
+    Caché de textos de respuesta indexada por (modelo, system, prompt,
+    max_tokens, tramo de temperatura).
+
+    Las entradas viven en memoria (LRU de max_entries) y en disco, un JSON
+    por clave, de modo que sobreviven a reinicios. Ambas capas respetan el
+    TTL; en disco se conservan como mucho max_entries archivos (se borran
+    los más antiguos).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_entries: Optional[int] = None,
+        ttl_hours: Optional[float] = None,
+        temperature_step: Optional[float] = None,
+    ):
+        """Inicializa la caché; el directorio se crea en la primera escritura."""
+        self.cache_dir = cache_dir or Path(settings.CACHE_PATH) / "claude"
+        self.max_entries = max_entries or settings.CLAUDE_CACHE_MAX_ENTRIES
+        self.ttl_seconds = (ttl_hours if ttl_hours is not None else settings.CLAUDE_CACHE_TTL_HOURS) * 3600
+        self.temperature_step = temperature_step or settings.CLAUDE_CACHE_TEMPERATURE_STEP
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_count: Optional[int] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def key(self, model: str, system: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Clave estable de una petición; temperaturas del mismo tramo comparten clave."""
+        bucket = round(round(temperature / self.temperature_step) * self.temperature_step, 4)
+        raw = json.dumps([model, system, prompt, max_tokens, bucket], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Texto cacheado para la clave, o None si no está o ha caducado."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, text = entry
+                if now - created < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return text
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._remember(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, text: str, model: str = "") -> None:
+        """Guarda una respuesta en memoria y en disco."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, (created, text))
+        payload = {"created": created, "model": model, "text": text}
+        try:
+            path = self._path(key)
+            is_new = not path.exists()
+            atomic_write_bytes(path, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la respuesta en caché: {e}")
+            return
+        if is_new:
+            self._after_disk_insert()
+
+    def note_bypass(self) -> None:
+        """Cuenta una llamada que ignoró la caché a propósito (fresh=True)."""
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self) -> None:
+        """Vacía la caché en memoria y en disco."""
+        with self._lock:
+            self._memory.clear()
+            self._disk_count = 0
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos y fallos."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, entry: Tuple[float, str]) -> None:
+        """Inserta en el LRU en memoria (llamar con el lock tomado)."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            data = json.loads(self._path(key).read_bytes())
+            return float(data["created"]), data["text"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Entrada de caché ilegible, se ignora: {e}")
+            return None
+
+    def _after_disk_insert(self) -> None:
+        """Lleva la cuenta de archivos y poda los más antiguos si se supera el límite."""
+        with self._lock:
+            if self._disk_count is None:
+                self._disk_count = sum(1 for _ in self.cache_dir.glob("*.json"))
+            else:
+                self._disk_count += 1
+            if self._disk_count <= self.max_entries:
+                return
+            self._disk_count = self.max_entries
+
+        entries = []
+        with os.scandir(self.cache_dir) as listing:
+            for entry in listing:
+                if entry.name.endswith(".json"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,283 @@
+"""
+Campo Sagrado - Reconstrucción del vault de Obsidian desde el historial
+Regenera 00-DASHBOARDS y 01-DAILY a partir de todas las recomendaciones guardadas
+
+Uso:
+    poetry run python -m src.services.vault_backfill [--since 2024-01-01] [--restart]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from src.models.recommendation import Recommendation
+from src.services.markdown_templates import (
+    DAILY_HEADER_SOURCE,
+    DAILY_SECTION_SOURCE,
+    DASHBOARD_SOURCE,
+    render_daily_section,
+)
+from src.utils.config import settings
+from src.utils.fs import atomic_write_bytes
+
+# Cambia si cambian las plantillas: un checkpoint de otra versión no vale
+TEMPLATE_VERSION = hashlib.sha256(
+    (DASHBOARD_SOURCE + DAILY_HEADER_SOURCE + DAILY_SECTION_SOURCE).encode("utf-8")
+).hexdigest()[:16]
+
+# Días que se renderizan por tanda (acota la memoria con historiales largos)
+DAYS_PER_WINDOW = 256
+
+DayGroup = Tuple[str, int, List[Dict[str, Any]]]
+
+
+def render_day_sections(group: DayGroup) -> Tuple[str, int, List[Tuple[str, bytes]]]:
+    """
+    Renderiza las secciones de un día (función de nivel de módulo para que
+    el pool de procesos pueda serializarla). Recibe y devuelve tipos simples.
+    """
+    date_str, timestamp_ms, rows = group
+    sections = [render_daily_section(Recommendation.model_validate(data)) for data in rows]
+    return date_str, timestamp_ms, sections
+
+
+class BackfillCheckpoint:
+    """
+    Días ya procesados y el timestamp de su última recomendación. Un día se
+    vuelve a procesar si tiene recomendaciones posteriores o si cambian las
+    plantillas (las secciones ya presentes no se duplican: se re-renderizan
+    en su sitio).
+    """
+
+    def __init__(self, path: Path, fingerprint: str):
+        """Carga el checkpoint si corresponde al mismo vault y plantillas."""
+        self.path = path
+        self.fingerprint = fingerprint
+        self.days: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Checkpoint de backfill ilegible, se empieza de cero: {e}")
+            return
+        if data.get("fingerprint") == fingerprint:
+            self.days = data.get("days", {})
+
+    def is_done(self, date_str: str, timestamp_ms: int) -> bool:
+        """True si el día ya se procesó hasta esta misma recomendación."""
+        return self.days.get(date_str) == timestamp_ms
+
+    def mark(self, date_str: str, timestamp_ms: int, save_every: float = 2.0) -> None:
+        """Marca el día como procesado; persiste como mucho cada save_every segundos."""
+        with self._lock:
+            self.days[date_str] = timestamp_ms
+            if time.monotonic() - self._saved_at >= save_every:
+                self._save()
+
+    def save(self) -> None:
+        """Persiste el checkpoint."""
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        payload = {"fingerprint": self.fingerprint, "days": self.days}
+        atomic_write_bytes(self.path, json.dumps(payload).encode("utf-8"))
+        self._saved_at = time.monotonic()
+
+
+class VaultBackfill:
+    """
+    Reconstruye las notas del vault desde el historial.
+
+    Recorre el historial en streaming agrupándolo por día, renderiza las
+    secciones en un pool de procesos y las añade con concurrencia de E/S
+    acotada a través del exportador: las notas que faltan se crean y a las
+    existentes solo se les añaden las secciones que no tienen, sin tocar
+    lo que el usuario haya escrito.
+    """
+
+    def __init__(
+        self,
+        history_store=None,
+        exporter=None,
+        workers: Optional[int] = None,
+        io_workers: Optional[int] = None,
+        checkpoint_path: Optional[Path] = None,
+    ):
+        """Inicializa el backfill; las dependencias por defecto son las instancias globales."""
+        if history_store is None:
+            from src.adapters.history_store import history_store
+        if exporter is None:
+            from src.services.obsidian_exporter import obsidian_exporter as exporter
+        self.history_store = history_store
+        self.exporter = exporter
+        self.workers = workers or os.cpu_count() or 1
+        self.io_workers = io_workers or settings.IO_MAX_WORKERS
+        self.checkpoint_path = checkpoint_path or Path(settings.CACHE_PATH) / "backfill_checkpoint.json"
+        self.latest: Optional[Dict[str, Any]] = None
+
+    def day_groups(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Iterator[DayGroup]:
+        """
+        Recomendaciones agrupadas por día (fecha local del propio timestamp,
+        como las notas diarias), en orden y sin cargar todo el historial.
+        Deja en self.latest la última, para el dashboard.
+        """
+        date_str: Optional[str] = None
+        rows: List[Dict[str, Any]] = []
+        timestamp_ms = 0
+        for batch in self.history_store.stream(since, until):
+            for row in batch:
+                data = json.loads(row["recommendation"])
+                day = data["timestamp"][:10]
+                if day != date_str:
+                    if rows:
+                        yield date_str, timestamp_ms, rows
+                    date_str, rows = day, []
+                rows.append(data)
+                timestamp_ms = row["timestamp_ms"]
+                self.latest = data
+        if rows:
+            yield date_str, timestamp_ms, rows
+
+    def run(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        restart: bool = False,
+        progress: bool = True,
+    ) -> Dict[str, int]:
+        """
+        Ejecuta el backfill.
+
+        Returns:
+            Días recorridos y pendientes tras el checkpoint, secciones
+            añadidas y notas escritas u omitidas por estar completas
+        """
+        fingerprint = f"{TEMPLATE_VERSION}:{self.exporter.obsidian_path.resolve()}"
+        checkpoint = BackfillCheckpoint(self.checkpoint_path, fingerprint)
+        if restart:
+            checkpoint.days = {}
+
+        total = self.history_store.count(since, until)
+        stats = {"days": 0, "pending": 0, "sections": 0, "written": 0, "skipped": 0}
+        existing = self.exporter.existing_daily_notes()
+
+        stats_lock = threading.Lock()
+        # Limita las notas renderizadas a la espera de disco
+        in_flight = threading.BoundedSemaphore(self.io_workers * 4)
+        processed = 0
+        started = last_report = time.perf_counter()
+
+        def write(date_str: str, timestamp_ms: int, sections: List[Tuple[str, bytes]]) -> None:
+            nonlocal processed, last_report
+            try:
+                _, appended = self.exporter.append_daily_sections(
+                    date_str,
+                    sections,
+                    exists=self.exporter.daily_note_path(date_str).name in existing,
+                    save_manifest=False,
+                )
+                checkpoint.mark(date_str, timestamp_ms)
+                with stats_lock:
+                    stats["sections"] += appended
+                    stats["written" if appended else "skipped"] += 1
+                    processed += len(sections)
+                    now = time.perf_counter()
+                    if progress and now - last_report >= 0.2:
+                        last_report = now
+                        self._print_progress(processed, total, started)
+            except Exception as e:
+                logger.error(f"Error escribiendo la nota del {date_str}: {e}")
+            finally:
+                in_flight.release()
+
+        print(f"📚 Reconstruyendo notas diarias de {total} recomendaciones "
+              f"({self.workers} procesos, {self.io_workers} hilos de E/S)")
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as processes, \
+                    ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="backfill-io") as writers:
+                window: List[DayGroup] = []
+                for group in self.day_groups(since, until):
+                    stats["days"] += 1
+                    date_str, timestamp_ms, rows = group
+                    if checkpoint.is_done(date_str, timestamp_ms):
+                        with stats_lock:
+                            processed += len(rows)
+                        continue
+                    window.append(group)
+                    if len(window) >= DAYS_PER_WINDOW:
+                        self._render_window(processes, writers, window, write, in_flight)
+                        stats["pending"] += len(window)
+                        window = []
+                if window:
+                    self._render_window(processes, writers, window, write, in_flight)
+                    stats["pending"] += len(window)
+        finally:
+            checkpoint.save()
+            self.exporter.flush_manifest()
+            if progress:
+                self._print_progress(processed, total, started)
+                print()
+
+        if self.latest is not None:
+            _, dashboard_written = self.exporter.export_dashboard(Recommendation.model_validate(self.latest))
+            stats["written" if dashboard_written else "skipped"] += 1
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ Backfill completado en {elapsed:.1f}s: {stats['pending']} de {stats['days']} días procesados, "
+              f"{stats['sections']} secciones añadidas")
+        return stats
+
+    def _render_window(self, processes, writers, window: List[DayGroup], write, in_flight) -> None:
+        """Renderiza una tanda de días en el pool y encola su escritura."""
+        chunksize = max(1, len(window) // (self.workers * 4))
+        for date_str, timestamp_ms, sections in processes.map(render_day_sections, window, chunksize=chunksize):
+            in_flight.acquire()
+            writers.submit(write, date_str, timestamp_ms, sections)
+
+    @staticmethod
+    def _print_progress(done: int, total: int, started: float) -> None:
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        share = done / total if total else 1.0
+        sys.stdout.write(f"\r   {done}/{total} recomendaciones ({share:.0%}, {rate:,.0f}/s)")
+        sys.stdout.flush()
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    """Punto de entrada de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Reconstruye las notas de Obsidian desde el historial")
+    parser.add_argument("--since", type=_parse_date, help="desde esta fecha (ISO, incluida)")
+    parser.add_argument("--until", type=_parse_date, help="hasta esta fecha (ISO, excluida)")
+    parser.add_argument("--workers", type=int, help="procesos de renderizado (por defecto, nº de CPUs)")
+    parser.add_argument("--io-workers", type=int, help="hilos de escritura (por defecto, IO_MAX_WORKERS)")
+    parser.add_argument("--restart", action="store_true", help="ignora el checkpoint y empieza de cero")
+    args = parser.parse_args(argv)
+
+    VaultBackfill(workers=args.workers, io_workers=args.io_workers).run(
+        since=args.since, until=args.until, restart=args.restart
+    )
+
+
+if __name__ == "__main__":
+    main()
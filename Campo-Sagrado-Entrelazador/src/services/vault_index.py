@@ -0,0 +1,349 @@
+"""
+Campo Sagrado - Índice del vault de Obsidian
+Lee las notas (frontmatter y secciones conocidas) y mantiene un índice
+persistente que watchdog actualiza solo con los archivos que cambian
+"""
+
+import bisect
+import json
+import mmap
+import os
+import re
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from src.models.recommendation import Recommendation
+from src.services.markdown_templates import SECTION_MARKER, section_id
+from src.utils.config import settings
+from src.utils.fs import atomic_write_bytes
+
+# Cambiar si cambia lo que se extrae de cada nota: fuerza un reindexado completo
+INDEX_VERSION = 1
+
+_FRONTMATTER = re.compile(rb"\A---\r?\n(.*?)\r?\n---\r?\n", re.S)
+_SECTION_HEADING = re.compile(rb"^## \xf0\x9f\x95\x90 (\d{2}:\d{2}) \xc2\xb7 Opci\xc3\xb3n ([AB])", re.M)
+_REFLECTIONS = re.compile(rb"^#{2,3} \xf0\x9f\x92\xad Reflexiones[ \t]*\r?\n(.*?)(?=^---[ \t]*$|^#{1,3} |\Z)", re.S | re.M)
+_PLACEHOLDER = "> Espacio para notas personales sobre la implementación de esta recomendación..."
+_DATE_IN_NAME = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+
+def _read_note(path: Path) -> Dict[str, Any]:
+    """Contenido de la nota vía mmap (sin copiar el archivo al heap de Python)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return _parse_buffer(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _parse_buffer(mapped)
+
+
+def _reflection(block: bytes) -> Optional[str]:
+    """Texto de Reflexiones escrito por el usuario (None si solo queda el marcador de posición)."""
+    match = _REFLECTIONS.search(block)
+    if not match:
+        return None
+    text = match.group(1).decode("utf-8", errors="replace").replace(_PLACEHOLDER, "").strip()
+    return text or None
+
+
+def _parse_buffer(buffer) -> Dict[str, Any]:
+    """
+    Extrae el frontmatter y las secciones de recomendación de una nota.
+    Las expresiones regulares trabajan directamente sobre el mmap; solo se
+    copian los fragmentos que interesan.
+    """
+    frontmatter: Dict[str, Any] = {}
+    match = _FRONTMATTER.match(buffer)
+    if match:
+        import yaml
+
+        try:
+            loaded = yaml.load(match.group(1), Loader=yaml.BaseLoader)
+            if isinstance(loaded, dict):
+                frontmatter = loaded
+        except yaml.YAMLError as e:
+            logger.debug(f"Frontmatter no válido: {e}")
+
+    sections: List[Dict[str, Any]] = []
+    markers = list(SECTION_MARKER.finditer(buffer))
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(buffer)
+        block = buffer[marker.end():end]
+        heading = _SECTION_HEADING.search(block)
+        sections.append({
+            "id": marker.group(1).decode("ascii"),
+            "time": heading.group(1).decode("ascii") if heading else None,
+            "option": heading.group(2).decode("ascii") if heading else None,
+            "reflection": _reflection(block),
+        })
+    if not markers:
+        # Nota diaria anterior al formato por secciones: una sola reflexión
+        reflection = _reflection(buffer)
+        if reflection:
+            sections.append({"id": None, "time": None, "option": None, "reflection": reflection})
+
+    return {"frontmatter": frontmatter, "sections": sections}
+
+
+class VaultIndex:
+    """
+    Índice en memoria (persistido en CACHE_PATH/vault_index.json) de las
+    notas del vault: frontmatter, secciones de recomendación y reflexiones.
+
+    refresh() solo vuelve a leer las notas cuyo tamaño o mtime cambiaron;
+    con start_watching() watchdog mantiene el índice al día archivo a
+    archivo. Las consultas no tocan disco.
+    """
+
+    def __init__(self, vault_path: Optional[str] = None, index_path: Optional[Path] = None):
+        """Inicializa el índice; se carga y sincroniza en el primer uso."""
+        self.vault_path = Path(vault_path or settings.OBSIDIAN_VAULT_PATH)
+        self.index_path = index_path or Path(settings.CACHE_PATH) / "vault_index.json"
+        self._notes: Dict[str, Dict[str, Any]] = {}
+        self._sections: Dict[str, Dict[str, Any]] = {}
+        self._reflections: Optional[List[Dict[str, Any]]] = None
+        self._reflection_dates: List[str] = []
+        self._lock = threading.RLock()
+        self._ready = False
+        self._observer = None
+        self._save_timer: Optional[threading.Timer] = None
+        self.parsed = 0
+
+    # --- Sincronización --------------------------------------------------
+
+    def refresh(self) -> int:
+        """
+        Sincroniza el índice con el vault y lo persiste si hubo cambios.
+        Devuelve el número de notas que se volvieron a leer.
+        """
+        with self._lock:
+            if not self._ready:
+                self._load()
+            seen = set()
+            changed = 0
+            for relpath, stat in self._scan():
+                seen.add(relpath)
+                entry = self._notes.get(relpath)
+                if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                    changed += self._update(relpath, stat)
+            for relpath in set(self._notes) - seen:
+                self._remove(relpath)
+                changed += 1
+            if changed:
+                self._save()
+            return changed
+
+    def update_path(self, path: Path) -> None:
+        """Vuelve a indexar una nota (o la quita si ya no existe)."""
+        try:
+            relpath = path.relative_to(self.vault_path).as_posix()
+        except ValueError:
+            return
+        with self._lock:
+            if not self._ready:
+                self.refresh()
+                return
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                self._remove(relpath)
+            else:
+                self._update(relpath, stat)
+        self._schedule_save()
+
+    def _scan(self) -> Iterator[tuple]:
+        """Recorre el vault (os.scandir recursivo) devolviendo (ruta relativa, stat) de cada .md."""
+        if not self.vault_path.exists():
+            return
+        stack = [self.vault_path]
+        while stack:
+            directory = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.name.endswith(".md"):
+                        relpath = Path(entry.path).relative_to(self.vault_path).as_posix()
+                        yield relpath, entry.stat()
+
+    def _update(self, relpath: str, stat: os.stat_result) -> int:
+        """Lee y reindexa una nota (llamar con el lock tomado)."""
+        try:
+            parsed = _read_note(self.vault_path / relpath)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo indexar {relpath}: {e}")
+            return 0
+        self._remove(relpath)
+        name_date = _DATE_IN_NAME.search(relpath.rsplit("/", 1)[-1])
+        parsed.update({
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "date": parsed["frontmatter"].get("date") or (name_date.group(1) if name_date else None),
+        })
+        self._notes[relpath] = parsed
+        self._link(relpath, parsed)
+        self.parsed += 1
+        return 1
+
+    def _remove(self, relpath: str) -> None:
+        entry = self._notes.pop(relpath, None)
+        if entry is None:
+            return
+        for section in entry["sections"]:
+            if section["id"] is not None and self._sections.get(section["id"], {}).get("path") == relpath:
+                del self._sections[section["id"]]
+        self._reflections = None
+
+    def _link(self, relpath: str, entry: Dict[str, Any]) -> None:
+        """Añade las secciones de la nota a los índices derivados."""
+        for section in entry["sections"]:
+            if section["id"] is not None:
+                self._sections[section["id"]] = {**section, "path": relpath, "date": entry["date"]}
+        self._reflections = None
+
+    # --- Persistencia ----------------------------------------------------
+
+    def _load(self) -> None:
+        """Carga el índice persistido (llamar con el lock tomado)."""
+        self._ready = True
+        try:
+            data = json.loads(self.index_path.read_bytes())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Índice del vault ilegible, se reconstruye: {e}")
+            return
+        if data.get("version") != INDEX_VERSION or data.get("vault") != str(self.vault_path.resolve()):
+            return
+        self._notes = data.get("notes", {})
+        for relpath, entry in self._notes.items():
+            self._link(relpath, entry)
+
+    def _save(self) -> None:
+        """Persiste el índice (llamar con el lock tomado)."""
+        payload = {"version": INDEX_VERSION, "vault": str(self.vault_path.resolve()), "notes": self._notes}
+        try:
+            atomic_write_bytes(self.index_path, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el índice del vault: {e}")
+
+    def _schedule_save(self, delay: float = 1.0) -> None:
+        """Agrupa las actualizaciones de watchdog en una sola escritura del índice."""
+        with self._lock:
+            if self._save_timer is not None:
+                return
+
+            def save() -> None:
+                with self._lock:
+                    self._save_timer = None
+                    self._save()
+
+            self._save_timer = threading.Timer(delay, save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    # --- watchdog --------------------------------------------------------
+
+    def start_watching(self) -> bool:
+        """Sincroniza y empieza a vigilar el vault. Devuelve False si no se pudo."""
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        index = self
+
+        class _VaultEventHandler(FileSystemEventHandler):
+            def on_any_event(self, event) -> None:
+                if event.is_directory:
+                    return
+                for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                    if path and str(path).endswith(".md") and not Path(path).name.startswith("."):
+                        index.update_path(Path(path))
+
+        with self._lock:
+            if self._observer is not None:
+                return True
+            self.refresh()
+            if not self.vault_path.exists():
+                return False
+            observer = Observer()
+            observer.schedule(_VaultEventHandler(), str(self.vault_path), recursive=True)
+            observer.daemon = True
+            try:
+                observer.start()
+            except OSError as e:
+                logger.warning(f"No se pudo vigilar el vault: {e}")
+                return False
+            self._observer = observer
+        logger.info(f"Vigilando el vault: {self.vault_path}")
+        return True
+
+    def stop_watching(self) -> None:
+        """Detiene watchdog y guarda el índice."""
+        with self._lock:
+            observer, self._observer = self._observer, None
+            timer, self._save_timer = self._save_timer, None
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=5)
+        if timer is not None:
+            timer.cancel()
+        with self._lock:
+            if self._ready:
+                self._save()
+
+    # --- Consultas -------------------------------------------------------
+
+    def _ensure_ready(self) -> None:
+        if not self._ready:
+            self.refresh()
+
+    def note(self, relpath: str) -> Optional[Dict[str, Any]]:
+        """Entrada indexada de una nota (ruta relativa al vault)."""
+        self._ensure_ready()
+        return self._notes.get(relpath)
+
+    def section(self, section_key: str) -> Optional[Dict[str, Any]]:
+        """Sección de recomendación por su identificador (marcador <!-- rec:... -->)."""
+        self._ensure_ready()
+        return self._sections.get(section_key)
+
+    def feedback_for(self, recommendation: Recommendation) -> Optional[str]:
+        """Reflexión escrita por el usuario sobre una recomendación, si la hay."""
+        section = self.section(section_id(recommendation))
+        return section["reflection"] if section else None
+
+    def reflections(
+        self,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reflexiones del usuario en [since, until), ordenadas por fecha y hora."""
+        self._ensure_ready()
+        with self._lock:
+            if self._reflections is None:
+                items = []
+                for relpath, entry in self._notes.items():
+                    for section in entry["sections"]:
+                        if section["reflection"]:
+                            items.append({**section, "path": relpath, "date": entry["date"] or ""})
+                items.sort(key=lambda item: (item["date"], item["time"] or ""))
+                self._reflections = items
+                self._reflection_dates = [item["date"] for item in items]
+            items, dates = self._reflections, self._reflection_dates
+        start = bisect.bisect_left(dates, since.isoformat()) if since else 0
+        end = bisect.bisect_left(dates, until.isoformat()) if until else len(dates)
+        return items[start:end]
+
+    def __len__(self) -> int:
+        self._ensure_ready()
+        return len(self._notes)
+
+
+# Instancia global (se sincroniza en el primer uso)
+vault_index = VaultIndex()
@@ -1,6 +1,7 @@
 """Configuración central del sistema."""
 
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from pydantic import Field, validator
@@ -18,6 +19,7 @@ class Settings(BaseSettings):
     
     # API Keys
     ANTHROPIC_API_KEY: Optional[str] = None
+    ANTHROPIC_BASE_URL: Optional[str] = None  # p. ej. el stub local: python -m src.services.anthropic_stub
     OPENAI_API_KEY: Optional[str] = None
     
     # Location (Madrid)
@@ -29,6 +31,33 @@ class Settings(BaseSettings):
     # Prayer settings
     PRAYER_METHOD: int = 3
     PRAYER_SCHOOL: int = 0
+    PRAYER_TIMES_SOURCE: str = "local"  # "local" (cálculo astronómico) o "aladhan"
+    PRAYER_CACHE_TTL_HOURS: float = 12
+    PRAYER_CACHE_GRID_DEG: float = 0.01  # ~1 km; los horarios apenas varían dentro de la celda
+    
+    # Claude response cache
+    CLAUDE_CACHE_ENABLED: bool = True
+    CLAUDE_CACHE_MAX_ENTRIES: int = 512
+    CLAUDE_CACHE_TTL_HOURS: float = 24
+    CLAUDE_CACHE_TEMPERATURE_STEP: float = 0.1  # temperaturas del mismo tramo comparten entrada
+    
+    # Claude async client
+    CLAUDE_MAX_CONCURRENCY: int = 4
+    CLAUDE_MAX_RETRIES: int = 4  # ante 429/5xx/errores de conexión
+    CLAUDE_BACKOFF_BASE_S: float = 0.5
+    CLAUDE_BACKOFF_MAX_S: float = 8.0
+    CLAUDE_CALL_DEADLINE_S: float = 30.0  # plazo por llamada, reintentos incluidos
+    CLAUDE_PATTERN_TOKEN_BUDGET: int = 1200  # tokens máximos (system + prompt) del análisis de patrones
+    CLAUDE_WEEKLY_TOKEN_BUDGET: int = 2500  # tokens máximos del análisis semanal
+    CLAUDE_CHUNK_DAYS: int = 1  # días por tramo en el análisis map-reduce de periodos
+    CLAUDE_CHUNK_CONCURRENCY: int = 3  # tramos analizados a la vez
+    CLAUDE_CHUNK_RETRIES: int = 2  # reintentos propios de cada tramo (respuesta inválida o error)
+    CLAUDE_CHUNK_TOKEN_BUDGET: int = 900  # tokens máximos por tramo
+    CLAUDE_REDUCE_TOKEN_BUDGET: int = 3000  # tokens máximos de la fusión
+    
+    # Guidance prefetch
+    GUIDANCE_PREFETCH_ENABLED: bool = True  # pre-generar guía y recomendación antes de cada rezo
+    GUIDANCE_PREFETCH_LEAD_MINUTES: float = 5
     
     # Database
     DATABASE_URL: str = "sqlite:///./database/campo_sagrado.db"
@@ -40,20 +69,36 @@ class Settings(BaseSettings):
     ANYTYPE_EXPORT_PATH: str = "./data/anytype-exports"
     OBSIDIAN_VAULT_PATH: str = "./data/obsidian-vault"
     LOG_PATH: str = "./logs"
+    CACHE_PATH: str = "./data/cache"
+    VAULT_INDEX_WATCH: bool = True  # mantener al día con watchdog el índice del vault (reflexiones del prompt de patrones)
+    
+    # Concurrency
+    IO_MAX_WORKERS: int = 4  # hilos para E/S bloqueante fuera del event loop
+    WRITE_BEHIND_COALESCE_MS: float = 50  # ventana para agrupar ráfagas de guardado
     
     # Sync Settings
     SYNC_INTERVAL_MINUTES: int = 15
     BACKUP_INTERVAL_HOURS: int = 24
     PATTERN_ANALYSIS_INTERVAL_HOURS: int = 6
+    PATTERN_HISTORY_DAYS: int = 90
+    PATTERN_PROMPT_DECISIONS: int = 10  # decisiones recientes que acompañan a los agregados en el prompt
+    PATTERN_PROMPT_REFLECTIONS: int = 5  # reflexiones del vault en el prompt de patrones (0 = ninguna)
     
     # Algorithm settings
     ENTROPY_THRESHOLD: float = 0.7
     CONFIDENCE_THRESHOLD: float = 0.6
     MIN_SATISFACTION_SCORE: int = 7
+    CIRCADIAN_SMOOTHING: bool = True  # curva interpolada por minuto en vez de escalones por hora
     
     # Monitoring
     ENABLE_METRICS: bool = True
     METRICS_PORT: int = 9090
+    # Perfilado bajo demanda: con PROFILING_ENABLED, las peticiones con la
+    # cabecera X-Campo-Profile (o una fracción PROFILING_SAMPLE_RATE) se
+    # perfilan con cProfile y devuelven Server-Timing
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_PATH: str = "./metrics/profiles"
     HEALTH_CHECK_INTERVAL: int = 60
     
     # Notifications
@@ -76,5 +121,26 @@ class Settings(BaseSettings):
         env_file = ".env"
         extra = "allow"  # Permite campos extra del .env
 
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Configuración de la aplicación (el entorno y .env se leen en el primer uso)."""
+    return Settings()
+
+
+class _LazySettings:
+    """Delegado de get_settings(): importar este módulo no lee .env."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+    def __repr__(self) -> str:
+        return repr(get_settings())
+
+
 # Instancia global
-settings = Settings()
+settings = _LazySettings()
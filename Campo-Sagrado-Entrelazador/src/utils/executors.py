@@ -0,0 +1,53 @@
+"""Ejecutor acotado para trabajo bloqueante (disco) fuera del event loop."""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from src.utils.config import settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def io_executor() -> ThreadPoolExecutor:
+    """Pool de hilos compartido para E/S bloqueante (se crea en el primer uso)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IO_MAX_WORKERS, thread_name_prefix="campo-io"
+                )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Ejecuta func en el pool de E/S y espera su resultado sin bloquear el loop.
+    Como asyncio.to_thread, func ve las contextvars del llamador (p. ej. las
+    etapas que se anotan para Server-Timing).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_io_executor(wait: bool = True) -> None:
+    """Cierra el pool (al apagar la aplicación)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def pending_tasks() -> int:
+    """Tareas encoladas en el pool a la espera de un hilo libre."""
+    executor = _executor
+    return executor._work_queue.qsize() if executor is not None else 0
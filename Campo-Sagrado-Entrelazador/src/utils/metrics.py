@@ -0,0 +1,448 @@
+"""
+Campo Sagrado - Métricas en formato Prometheus
+Registro mínimo (contadores, histogramas y gauges) expuesto en texto de
+Prometheus por un servidor propio en METRICS_PORT.
+
+Con ENABLE_METRICS=false cada punto de medida se reduce a comprobar un
+booleano: no se toman tiempos ni se actualiza nada.
+
+Con varios workers de uvicorn solo el primero que abre METRICS_PORT sirve
+sus métricas (los demás lo registran como aviso).
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from src.utils.config import settings
+
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+_enabled: Optional[bool] = None
+
+# Etapas de la petición en curso (solo si alguien las está recogiendo,
+# p. ej. la cabecera Server-Timing de src.utils.profiling)
+REQUEST_STAGES: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("campo_request_stages", default=None)
+
+
+def enabled() -> bool:
+    """True si ENABLE_METRICS (se lee una vez, en el primer punto de medida)."""
+    global _enabled
+    if _enabled is None:
+        _enabled = bool(settings.ENABLE_METRICS)
+    return _enabled
+
+
+def set_enabled(value: bool) -> None:
+    """Activa o desactiva la medición sin tocar la configuración."""
+    global _enabled
+    _enabled = value
+
+
+# --- Tipos de métrica ------------------------------------------------------
+
+class _Value:
+    """Valor de un contador o gauge con unas etiquetas concretas."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _Buckets:
+    """Histograma con unas etiquetas concretas."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    """
+    Métrica con etiquetas. Además de los valores que se actualizan con
+    labels(...), admite colectores: funciones que se evalúan en cada scrape
+    y devuelven {valores de etiquetas: valor} (p. ej. contadores que ya
+    lleva una caché).
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: Dict[LabelValues, Any] = {}
+        self._collectors: Dict[str, Callable[[], Dict[LabelValues, float]]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def collect(self, key: str, collector: Callable[[], Dict[LabelValues, float]]) -> None:
+        """Registra (o sustituye, si ya existe `key`) un colector."""
+        with self._lock:
+            self._collectors[key] = collector
+
+    def _new_child(self) -> Any:
+        return _Value()
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """(nombre, etiquetas, valor) de cada serie."""
+        with self._lock:
+            children = list(self._children.items())
+            collectors = list(self._collectors.values())
+        for values, child in children:
+            yield self.name, dict(zip(self.labelnames, values)), child.value
+        for collector in collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                logger.debug(f"Colector de {self.name} fallido: {e!r}")
+                continue
+            for values, value in collected.items():
+                yield self.name, dict(zip(self.labelnames, values)), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            labels = dict(zip(self.labelnames, values))
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "campo_http_request_duration_seconds", "Latencia de las peticiones HTTP por endpoint",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "campo_stage_duration_seconds", "Duración de cada etapa interna (motor, guardado, Obsidian, Claude)",
+    ("stage",),
+)
+UPSTREAM_SECONDS = Histogram(
+    "campo_upstream_duration_seconds", "Latencia de cada llamada a un servicio externo", ("service",),
+)
+UPSTREAM_REQUESTS = Counter(
+    "campo_upstream_requests_total", "Llamadas a servicios externos por resultado (ok/error)",
+    ("service", "outcome"),
+)
+CACHE_REQUESTS = Counter(
+    "campo_cache_requests_total", "Consultas a cada caché por resultado", ("cache", "result"),
+)
+CACHE_HIT_RATIO = Gauge(
+    "campo_cache_hit_ratio", "Fracción de aciertos de cada caché desde el arranque", ("cache",),
+)
+QUEUE_DEPTH = Gauge(
+    "campo_queue_depth", "Elementos pendientes en cada cola", ("queue",),
+)
+QUEUE_FAILURES = Counter(
+    "campo_queue_failures_total",
+    "Escrituras fallidas de cada cola (failed) y elementos descartados tras agotar los reintentos (lost)",
+    ("queue", "result"),
+)
+
+
+# --- Puntos de medida ------------------------------------------------------
+
+class _Timer:
+    """
+    Context manager que observa la duración del bloque en el histograma de
+    etapas (si hay métricas) y la anota en REQUEST_STAGES (si se recogen).
+    """
+
+    __slots__ = ("name", "child", "start")
+
+    def __init__(self, name: str, child: Optional[_Buckets]):
+        self.name = name
+        self.child = child
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.start
+        if self.child is not None:
+            self.child.observe(elapsed)
+        stages = REQUEST_STAGES.get()
+        if stages is not None:
+            stages.append((self.name, elapsed))
+
+
+class _UpstreamTimer:
+    """Como _Timer, y además cuenta la llamada como ok o error."""
+
+    __slots__ = ("service", "start")
+
+    def __init__(self, service: str):
+        self.service = service
+
+    def __enter__(self) -> "_UpstreamTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        UPSTREAM_SECONDS.labels(self.service).observe(time.perf_counter() - self.start)
+        UPSTREAM_REQUESTS.labels(self.service, "ok" if exc_type is None else "error").inc()
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage(name: str):
+    """Cronometra un bloque como etapa `name` (with metrics.stage("json_save"): ...)."""
+    if enabled():
+        return _Timer(name, STAGE_SECONDS.labels(name))
+    if REQUEST_STAGES.get() is not None:
+        return _Timer(name, None)
+    return _NO_TIMER
+
+
+def upstream(service: str):
+    """Cronometra y cuenta una llamada a un servicio externo (aladhan, claude)."""
+    return _UpstreamTimer(service) if enabled() else _NO_TIMER
+
+
+def timed(name: str) -> Callable:
+    """Decorador: cada llamada a la función se mide como etapa `name`."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = stage(name)
+            if timer is _NO_TIMER:
+                return func(*args, **kwargs)
+            with timer:
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def watch_cache(name: str, counts: Callable[[], Dict[str, int]], hits: Tuple[str, ...] = ("hit",)) -> None:
+    """
+    Expone los contadores de una caché. `counts` devuelve {resultado: número};
+    el ratio es la suma de los resultados en `hits` frente a esos más "miss".
+    """
+    def requests() -> Dict[LabelValues, float]:
+        return {(name, result): value for result, value in counts().items()}
+
+    def ratio() -> Dict[LabelValues, float]:
+        values = counts()
+        served = sum(values.get(result, 0) for result in hits)
+        lookups = served + values.get("miss", 0)
+        return {(name,): served / lookups} if lookups else {}
+
+    CACHE_REQUESTS.collect(name, requests)
+    CACHE_HIT_RATIO.collect(name, ratio)
+
+
+def watch_queue(
+    name: str,
+    depth: Callable[[], int],
+    failures: Optional[Callable[[], Dict[str, int]]] = None,
+) -> None:
+    """Expone la profundidad actual de una cola y, si se pasan, sus fallos ({resultado: número})."""
+    QUEUE_DEPTH.collect(name, lambda: {(name,): depth()})
+    if failures is not None:
+        QUEUE_FAILURES.collect(name, lambda: {(name, result): value for result, value in failures().items()})
+
+
+# --- Middleware HTTP ---------------------------------------------------------
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia de cada petición por método, ruta (la
+    plantilla, p. ej. /guidance/{prayer}) y código de estado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "sin_ruta"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+# --- Exposición --------------------------------------------------------------
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render() -> bytes:
+    """Todas las métricas en el formato de texto de Prometheus (0.0.4)."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(item)}"' for key, item in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _handler_class() -> type:
+    """Manejador de /metrics (http.server se importa solo si hay servidor)."""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render()
+            self.send_response(200)
+            self.send_header("content-type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return MetricsHandler
+
+
+_server: Optional[Any] = None
+
+
+def start_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[int]:
+    """
+    Sirve /metrics en `port` (por defecto METRICS_PORT) en un hilo de fondo.
+
+    Returns:
+        Puerto en uso, o None si está desactivado o no se pudo abrir
+    """
+    global _server
+    if not enabled():
+        return None
+    if _server is None:
+        from http.server import ThreadingHTTPServer
+
+        try:
+            _server = ThreadingHTTPServer((host, settings.METRICS_PORT if port is None else port), _handler_class())
+        except OSError as e:
+            logger.warning(f"No se pudo abrir el puerto de métricas: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Métricas Prometheus en http://{host}:{_server.server_address[1]}/metrics")
+    return _server.server_address[1]
+
+
+def stop_server() -> None:
+    """Detiene el servidor de métricas."""
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
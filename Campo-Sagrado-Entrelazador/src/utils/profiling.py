@@ -0,0 +1,130 @@
+"""
+Campo Sagrado - Perfilado de peticiones bajo demanda
+Con PROFILING_ENABLED, una petición con la cabecera `X-Campo-Profile: 1`
+(o una fracción PROFILING_SAMPLE_RATE de todas) se ejecuta bajo cProfile:
+el perfil se guarda en PROFILING_PATH y la respuesta trae `Server-Timing`
+con la duración de cada etapa (engine_compute, json_save, claude_call...)
+y el nombre del archivo en `X-Campo-Profile-File`.
+
+Las peticiones no muestreadas no pagan nada más que mirar sus cabeceras.
+
+cProfile mide el hilo del event loop: si hay otras peticiones en curso,
+su código también aparece en el perfil. Solo se perfila una petición a la
+vez; las demás muestreadas mientras tanto reciben solo Server-Timing.
+
+Ver un perfil:
+    python -m pstats metrics/profiles/<archivo>.prof
+"""
+
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.utils import metrics
+from src.utils.config import settings
+from src.utils.executors import run_blocking
+
+PROFILE_HEADER = b"x-campo-profile"
+
+
+def server_timing(stages: List[Tuple[str, float]], total: float) -> str:
+    """
+    Valor de la cabecera Server-Timing: una entrada por etapa (las que se
+    repiten se suman; desc indica cuántas veces) más el total.
+    """
+    totals: Dict[str, List[float]] = {}
+    for name, elapsed in stages:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += 1
+
+    parts = []
+    for name, (elapsed, count) in totals.items():
+        part = f"{name};dur={elapsed * 1000:.2f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI de perfilado bajo demanda (ver el docstring del módulo)."""
+
+    def __init__(self, app):
+        """La configuración se lee al montar la app, no al importar."""
+        self.app = app
+        self.enabled = settings.PROFILING_ENABLED
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.profiles_path = Path(settings.PROFILING_PATH)
+        # Un solo cProfile activo a la vez en el hilo del event loop
+        self._profiler_lock = threading.Lock()
+
+    def _sampled(self, scope) -> bool:
+        """True si la petición pide perfil por cabecera o cae en el muestreo."""
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value.strip().lower() not in (b"", b"0", b"false", b"no")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _profile_name(self, scope) -> str:
+        """Nombre del archivo: fecha, método, ruta y un sufijo único."""
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        return f"{datetime.now():%Y%m%d-%H%M%S}-{scope['method']}-{slug}-{uuid.uuid4().hex[:6]}.prof"
+
+    def _dump(self, profiler, name: str) -> None:
+        """Guarda el perfil (en el pool de E/S)."""
+        try:
+            self.profiles_path.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(self.profiles_path / name)
+            logger.info(f"Perfil guardado en {self.profiles_path / name}")
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el perfil {name}: {e}")
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or not self._sampled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = None
+        name: Optional[str] = None
+        if self._profiler_lock.acquire(blocking=False):
+            import cProfile
+
+            profiler = cProfile.Profile()
+            name = self._profile_name(scope)
+
+        stages: List[Tuple[str, float]] = []
+        token = metrics.REQUEST_STAGES.set(stages)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (b"server-timing", server_timing(stages, time.perf_counter() - start).encode("latin-1"))
+                )
+                if name is not None:
+                    headers.append((b"x-campo-profile-file", name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            if profiler is not None:
+                profiler.enable()
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiler_lock.release()
+            metrics.REQUEST_STAGES.reset(token)
+
+        if profiler is not None:
+            await run_blocking(self._dump, profiler, name)
@@ -0,0 +1,102 @@
+"""
+Compara dos resultados de la suite de benchmarks y marca las regresiones.
+
+Uso:
+    python -m tests.benchmarks.compare .benchmarks/baseline.json .benchmarks/latest.json --threshold 0.2
+
+Sale con código 1 si algún benchmark empeora más de `threshold` (fracción)
+en la estadística elegida (mediana por defecto).
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def load(path: Path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 0.2,
+    stat: str = "median",
+) -> List[Dict[str, Any]]:
+    """
+    Una fila por benchmark: tiempos base y actual, cambio relativo y estado
+    ("regresion", "mejora", "igual", "nuevo" o "ausente").
+    """
+    rows = []
+    before_all, after_all = baseline["benchmarks"], current["benchmarks"]
+    for name in sorted(set(before_all) | set(after_all)):
+        before = before_all.get(name, {}).get(stat)
+        after = after_all.get(name, {}).get(stat)
+        change: Optional[float] = None
+        if before is None:
+            status = "nuevo"
+        elif after is None:
+            status = "ausente"
+        else:
+            change = after / before - 1
+            if change > threshold:
+                status = "regresion"
+            elif change < -threshold:
+                status = "mejora"
+            else:
+                status = "igual"
+        rows.append({"name": name, "before": before, "after": after, "change": change, "status": status})
+    return rows
+
+
+def _format_time(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+_ICONS = {"regresion": "❌", "mejora": "🚀", "igual": "✅", "nuevo": "🆕", "ausente": "⚠️ "}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path, help="JSON de la línea base")
+    parser.add_argument("current", type=Path, nargs="?", default=Path(".benchmarks/latest.json"),
+                        help="JSON de la medición actual")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="empeoramiento relativo tolerado (0.2 = 20%%)")
+    parser.add_argument("--stat", default="median", choices=("min", "median", "mean"))
+    args = parser.parse_args(argv)
+
+    baseline, current = load(args.baseline), load(args.current)
+    if baseline.get("traced") != current.get("traced"):
+        print("⚠️  Solo una de las mediciones se hizo con cobertura/tracer activo: no son comparables")
+    if baseline.get("machine") != current.get("machine"):
+        print(f"⚠️  Máquinas distintas: {baseline.get('machine')} / {current.get('machine')}")
+
+    rows = compare(baseline, current, args.threshold, args.stat)
+    width = max((len(row["name"]) for row in rows), default=10)
+    print(f"{'benchmark':<{width}} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        print(
+            f"{row['name']:<{width}} {_format_time(row['before']):>10} {_format_time(row['after']):>10} "
+            f"{change:>8}  {_ICONS[row['status']]} {row['status']}"
+        )
+
+    regressions = [row["name"] for row in rows if row["status"] == "regresion"]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresiones por encima del {args.threshold:.0%} ({args.stat})")
+        return 1
+    print(f"\n✅ Sin regresiones por encima del {args.threshold:.0%} ({args.stat})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
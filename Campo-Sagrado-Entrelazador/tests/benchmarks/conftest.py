@@ -0,0 +1,114 @@
+"""
+Suite de benchmarks (fixtures al estilo de pytest-benchmark).
+
+El fixture `benchmark(func, *args, **kwargs)` mide `func` en varias rondas
+y devuelve su resultado. Al terminar la sesión se escriben las
+estadísticas de cada benchmark en JSON; `python -m tests.benchmarks.compare`
+las contrasta con una línea base guardada.
+
+Variables de entorno:
+    BENCH_SAVE          JSON de resultados (por defecto .benchmarks/latest.json)
+    BENCH_ROUNDS        rondas por benchmark (por defecto 15)
+    BENCH_MIN_TIME_MS   duración mínima de una ronda: las funciones rápidas
+                        se repiten dentro de la ronda (por defecto 20)
+
+Uso:
+    make bench-baseline   # guarda la línea base
+    make bench-compare    # vuelve a medir y marca las regresiones
+"""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pytest
+
+# Las rutas temporales (vault, caché, base de datos) las fija tests/conftest.py
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_PATH = Path(os.environ.get("BENCH_SAVE", ".benchmarks/latest.json"))
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "15"))
+MIN_TIME_S = float(os.environ.get("BENCH_MIN_TIME_MS", "20")) / 1000
+
+_results: Dict[str, Dict[str, Any]] = {}
+
+
+class Benchmark:
+    """Mide una función: calibra las iteraciones por ronda y guarda las estadísticas por llamada."""
+
+    def __init__(self, name: str, rounds: int = ROUNDS, min_time: float = MIN_TIME_S):
+        self.name = name
+        self.rounds = rounds
+        self.min_time = min_time
+        self.stats: Dict[str, Any] = {}
+
+    def __call__(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Ejecuta func(*args, **kwargs) en todas las rondas y devuelve el último resultado."""
+        # Calentamiento (importaciones y construcciones perezosas) y calibración:
+        # iteraciones hasta llenar min_time
+        func(*args, **kwargs)
+        iterations = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.min_time or iterations >= 1 << 20:
+                break
+            iterations *= 2 if elapsed <= 0 else max(2, min(10, int(self.min_time / elapsed) + 1))
+
+        timings = []
+        for _ in range(self.rounds):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = func(*args, **kwargs)
+            timings.append((time.perf_counter() - start) / iterations)
+
+        self.stats = {
+            "min": min(timings),
+            "max": max(timings),
+            "mean": statistics.fmean(timings),
+            "median": statistics.median(timings),
+            "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "rounds": self.rounds,
+            "iterations": iterations,
+            "ops": 1 / statistics.fmean(timings),
+        }
+        _results[self.name] = self.stats
+        return result
+
+
+@pytest.fixture
+def benchmark(request) -> Benchmark:
+    """Fixture de medición; el nombre es el del test relativo a tests/benchmarks."""
+    return Benchmark(request.node.nodeid.split("benchmarks/", 1)[-1])
+
+
+def pytest_collection_modifyitems(config, items):
+    """Marca como `benchmark` todo lo que hay en este directorio."""
+    for item in items:
+        if BENCH_DIR in Path(str(item.fspath)).parents:
+            item.add_marker(pytest.mark.benchmark)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Guarda los resultados de la sesión (si se midió algo)."""
+    if not _results:
+        return
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        # Con cobertura (u otro tracer) activo los tiempos no son comparables
+        "traced": sys.gettrace() is not None,
+        "benchmarks": dict(sorted(_results.items())),
+    }
+    RESULTS_PATH.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n📊 {len(_results)} benchmarks guardados en {RESULTS_PATH}")
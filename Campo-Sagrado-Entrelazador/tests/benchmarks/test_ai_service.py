@@ -0,0 +1,67 @@
+"""Benchmarks de ClaudeService contra el stub local de Anthropic (sin red ni caché)."""
+
+import pytest
+
+from src.services.anthropic_stub import AnthropicStub
+from src.utils.config import settings
+
+
+@pytest.fixture(scope="module")
+def service():
+    from src.services.ai_service import ClaudeService
+
+    previous = {
+        name: getattr(settings, name)
+        for name in ("ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL", "CLAUDE_CACHE_ENABLED")
+    }
+    with AnthropicStub() as stub:
+        settings.ANTHROPIC_API_KEY = "stub"
+        settings.ANTHROPIC_BASE_URL = stub.url
+        settings.CLAUDE_CACHE_ENABLED = False
+        service = ClaudeService()
+        yield service
+        service.client.close()
+    for name, value in previous.items():
+        setattr(settings, name, value)
+
+
+@pytest.fixture(scope="module")
+def decisions():
+    return [
+        {
+            "timestamp": f"2024-03-{day:02d}T{hour:02d}:00:00+00:00",
+            "recommended": "A",
+            "chosen": "A" if (day + hour) % 3 else "B",
+            "satisfaction": 4 + (day * hour) % 6,
+            "energy_before": 3 + hour % 7,
+            "energy_after": 4 + hour % 6,
+        }
+        for day in range(1, 29)
+        for hour in range(8, 20, 2)
+    ]
+
+
+def test_enhance_recommendation(benchmark, service):
+    recommendation = {
+        "option_a": {"action": "TRABAJO INTENSO"},
+        "option_b": {"action": "PROYECTOS COMPLEJOS"},
+        "recommended_option": "A",
+        "factors": {"circadian_phase": "peak_focus", "user_energy": "8/10"},
+    }
+    enhanced = benchmark(lambda: service.enhance_recommendation(dict(recommendation)))
+    assert "ai_insights" in enhanced
+
+
+def test_generate_sacred_guidance(benchmark, service):
+    guidance = benchmark(service.generate_sacred_guidance, "Dhuhr", {"energy": "7/10", "phase": "peak_focus"})
+    assert guidance != service.default_prayer_guidance("Dhuhr")
+
+
+def test_analyze_decision_patterns(benchmark, service, decisions):
+    analysis = benchmark(service.analyze_decision_patterns, decisions)
+    assert analysis.pattern_type
+
+
+def test_weekly_request(benchmark, service, decisions):
+    request = benchmark(service._weekly_request, {"week": "2024-W10", "decisions": decisions})
+    assert request["kind"] == "semanal"
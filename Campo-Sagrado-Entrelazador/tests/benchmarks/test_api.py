@@ -0,0 +1,48 @@
+"""Benchmarks de los endpoints de la API con un cliente en proceso."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.dependencies import container
+
+
+@pytest.fixture(scope="module")
+def client():
+    from src.api.main import app
+
+    container.reset()
+    with TestClient(app) as client:
+        yield client
+    container.reset()
+
+
+def test_health(benchmark, client):
+    response = benchmark(client.get, "/health")
+    assert response.status_code == 200
+
+
+def test_post_recommendation(benchmark, client):
+    response = benchmark(client.post, "/recommendation", json={"current_energy": 6})
+    assert response.status_code == 200
+
+
+def test_current_recommendation(benchmark, client):
+    client.post("/recommendation", json={"current_energy": 6})
+    response = benchmark(client.get, "/recommendation/current")
+    assert response.status_code == 200
+
+
+def test_current_recommendation_not_modified(benchmark, client):
+    etag = client.get("/recommendation/current").headers["etag"]
+    response = benchmark(client.get, "/recommendation/current", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_list_recommendations(benchmark, client):
+    response = benchmark(client.get, "/recommendations", params={"limit": 100})
+    assert response.status_code == 200
+
+
+def test_pattern_stats(benchmark, client):
+    response = benchmark(client.get, "/patterns/stats")
+    assert response.status_code == 200
@@ -0,0 +1,35 @@
+"""Benchmarks del motor de recomendaciones."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core.recommendation_engine import SacralRecommendationEngine
+
+
+@pytest.fixture(scope="module")
+def engine() -> SacralRecommendationEngine:
+    return SacralRecommendationEngine()
+
+
+def test_get_circadian_phase(benchmark, engine):
+    phase = benchmark(engine.get_circadian_phase)
+    assert phase.phase
+
+
+def test_generate_binary_recommendation(benchmark, engine):
+    recommendation = benchmark(engine.generate_binary_recommendation, {"current_energy": 7})
+    assert recommendation.recommended_option in ("A", "B")
+
+
+def test_generate_batch_10k(benchmark, engine):
+    energies = np.random.default_rng(0).integers(1, 11, 10_000)
+    timestamps = pd.date_range("2024-01-01", periods=10_000, freq="5min", tz="UTC")
+    batch = benchmark(engine.generate_batch, energies, timestamps)
+    assert len(batch) == 10_000
+
+
+def test_save_recommendation(benchmark, engine):
+    recommendation = engine.generate_binary_recommendation({"current_energy": 7})
+    path = benchmark(engine.save_recommendation, recommendation)
+    assert path.exists()
@@ -0,0 +1,35 @@
+"""Benchmarks de los renderizadores de ObsidianExporter."""
+
+import pytest
+
+from src.core.recommendation_engine import SacralRecommendationEngine
+from src.models.recommendation import Recommendation
+from src.services.obsidian_exporter import ObsidianExporter
+
+
+@pytest.fixture(scope="module")
+def exporter() -> ObsidianExporter:
+    return ObsidianExporter()
+
+
+@pytest.fixture(scope="module")
+def recommendation() -> Recommendation:
+    return SacralRecommendationEngine().generate_binary_recommendation({"current_energy": 8})
+
+
+def test_dashboard_markdown(benchmark, exporter, recommendation):
+    markdown = benchmark(exporter._generate_dashboard_markdown, recommendation)
+    assert recommendation.option_a.action in markdown
+
+
+def test_daily_markdown(benchmark, exporter, recommendation):
+    date_str = recommendation.timestamp.strftime("%Y-%m-%d")
+    time_str = recommendation.timestamp.strftime("%H:%M")
+    markdown = benchmark(exporter._generate_daily_markdown, recommendation, date_str, time_str)
+    assert date_str in markdown
+
+
+def test_export_recommendation_unchanged(benchmark, exporter, recommendation):
+    # Tras la primera escritura, las siguientes se detectan sin cambios
+    result = benchmark(exporter.export_recommendation, recommendation)
+    assert result["skipped"] >= 1
@@ -0,0 +1,89 @@
+"""
+Configuración común de los tests.
+
+Las rutas del proyecto apuntan a un directorio temporal antes de importar
+nada de src (ningún test toca el vault ni la base de datos reales), y
+`isolated_settings` da a cada test su propio vault y caché.
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+
+_WORKDIR = Path(tempfile.mkdtemp(prefix="campo-tests-"))
+os.environ.update({
+    "PROJECT_ROOT": str(_WORKDIR),
+    "OBSIDIAN_VAULT_PATH": str(_WORKDIR / "vault"),
+    "CACHE_PATH": str(_WORKDIR / "cache"),
+    "DATABASE_URL": f"sqlite:///{_WORKDIR / 'db' / 'history.db'}",
+    "ANTHROPIC_API_KEY": "",
+    "VAULT_INDEX_WATCH": "false",
+    "GUIDANCE_PREFETCH_ENABLED": "false",
+    # Puerto efímero: no choca con una API en marcha
+    "METRICS_PORT": "0",
+})
+
+
+@pytest.fixture
+def isolated_settings(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Proyecto, vault y caché en tmp_path durante el test."""
+    from src.utils.config import settings
+
+    monkeypatch.setattr(settings, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(settings, "OBSIDIAN_VAULT_PATH", str(tmp_path / "vault"))
+    monkeypatch.setattr(settings, "CACHE_PATH", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'history.db'}")
+    return tmp_path
+
+
+@pytest.fixture
+def history(isolated_settings: Path):
+    """Historial SQLite vacío y propio del test."""
+    from src.adapters.history_store import RecommendationHistoryStore
+
+    return RecommendationHistoryStore(f"sqlite:///{isolated_settings / 'history.db'}")
+
+
+@pytest.fixture
+def make_recommendations(isolated_settings: Path) -> Callable[..., List]:
+    """
+    Fábrica de recomendaciones reales del motor: make_recommendations(n,
+    start=..., step=timedelta(hours=3), energy=7).
+    """
+    from src.core.recommendation_engine import SacralRecommendationEngine
+
+    engine = SacralRecommendationEngine()
+
+    def make(
+        n: int,
+        start: datetime = datetime(2024, 3, 1, 8, 0),
+        step: timedelta = timedelta(hours=3),
+        energy: int = 7,
+    ) -> List:
+        base = engine.generate_binary_recommendation({"current_energy": energy})
+        return [base.model_copy(update={"timestamp": start + i * step}) for i in range(n)]
+
+    return make
+
+
+@pytest.fixture
+def claude_stub(isolated_settings: Path, monkeypatch: pytest.MonkeyPatch):
+    """
+    AnthropicStub local con los servicios de Claude apuntando a él: sin
+    caché de respuestas y con backoff de milisegundos. Los tests ajustan
+    stub.failures, stub.latency y stub.reply antes de llamar.
+    """
+    from src.services.anthropic_stub import AnthropicStub
+    from src.utils.config import settings
+
+    with AnthropicStub() as stub:
+        monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", "stub")
+        monkeypatch.setattr(settings, "ANTHROPIC_BASE_URL", stub.url)
+        monkeypatch.setattr(settings, "CLAUDE_CACHE_ENABLED", False)
+        monkeypatch.setattr(settings, "CLAUDE_BACKOFF_BASE_S", 0.001)
+        monkeypatch.setattr(settings, "CLAUDE_BACKOFF_MAX_S", 0.01)
+        yield stub
@@ -0,0 +1,150 @@
+"""AsyncClaudeService contra el stub local: reintentos, plazos y llamadas compartidas."""
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from anthropic import APIStatusError
+
+from src.services.ai_service import AsyncClaudeService
+
+REQUEST = {"prompt": "¿Qué toca ahora?", "system": "Eres un guía", "max_tokens": 50, "temperature": 0.5}
+
+
+@pytest_asyncio.fixture
+async def service(claude_stub):
+    service = AsyncClaudeService(max_retries=3, deadline=5)
+    yield service
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retries_on_rate_limit_and_server_errors(claude_stub, service):
+    claude_stub.failures = [429, 529, 500]
+
+    text = await service.create_message(**REQUEST)
+
+    assert '"stub": true' in text
+    assert len(claude_stub.requests) == 4
+    assert (service.upstream_calls, service.retries) == (4, 3)
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(claude_stub, service):
+    claude_stub.failures = [529] * 5
+
+    with pytest.raises(APIStatusError) as error:
+        await service.create_message(**REQUEST)
+
+    assert error.value.status_code == 529
+    assert len(claude_stub.requests) == service.max_retries + 1
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(claude_stub, service):
+    claude_stub.failures = [400]
+
+    with pytest.raises(APIStatusError):
+        await service.create_message(**REQUEST)
+
+    assert len(claude_stub.requests) == 1 and service.retries == 0
+
+
+@pytest.mark.asyncio
+async def test_deadline_overrun_raises(claude_stub, service):
+    claude_stub.latency = 0.5
+
+    with pytest.raises(asyncio.TimeoutError):
+        await service.create_message(**REQUEST, deadline=0.1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_call(claude_stub, service):
+    claude_stub.latency = 0.1
+
+    texts = await asyncio.gather(*(service.create_message(**REQUEST) for _ in range(10)))
+
+    assert len(set(texts)) == 1
+    assert len(claude_stub.requests) == 1
+    assert service.coalesced == 9
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call(claude_stub, service):
+    claude_stub.latency = 0.2
+    first = asyncio.create_task(service.create_message(**REQUEST))
+    second = asyncio.create_task(service.create_message(**REQUEST))
+    await asyncio.sleep(0.05)
+
+    first.cancel()
+    text = await second
+
+    assert first.cancelled()
+    assert '"stub": true' in text
+    assert len(claude_stub.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(claude_stub):
+    claude_stub.latency = 0.05
+    service = AsyncClaudeService(max_concurrency=2)
+    try:
+        await asyncio.gather(*(service.create_message(**{**REQUEST, "prompt": f"p{i}"}) for i in range(6)))
+    finally:
+        await service.aclose()
+
+    assert len(claude_stub.requests) == 6
+    assert claude_stub.max_active == 2
+
+
+def test_retry_after_header_sets_the_delay(monkeypatch):
+    from src.utils.config import settings
+
+    monkeypatch.setattr(settings, "CLAUDE_BACKOFF_MAX_S", 8.0)
+
+    class Error(Exception):
+        response = type("Response", (), {"headers": {"retry-after": "3"}})()
+
+    assert AsyncClaudeService._backoff_delay(0, Error()) == 3.0
+    assert 0 <= AsyncClaudeService._backoff_delay(5, Exception()) <= 8.0
+
+
+@pytest.mark.asyncio
+async def test_fresh_call_does_not_join_a_normal_call_in_flight(claude_stub, service):
+    claude_stub.latency = 0.1
+    answers = iter(["primera", "segunda"])
+    claude_stub.reply = lambda body: next(answers)
+
+    normal, fresh = await asyncio.gather(
+        service.create_message(**REQUEST),
+        service.create_message(**REQUEST, fresh=True),
+    )
+
+    assert len(claude_stub.requests) == 2
+    assert {normal, fresh} == {"primera", "segunda"}
+    assert service.coalesced == 0
+
+
+@pytest.mark.asyncio
+async def test_pattern_prompt_includes_vault_reflections(
+    claude_stub, service, isolated_settings, make_recommendations, monkeypatch
+):
+    import src.services.vault_index as vault_index_module
+    from src.services.obsidian_exporter import ObsidianExporter
+    from src.services.vault_index import VaultIndex
+    from src.utils.config import settings
+
+    exporter = ObsidianExporter()
+    exporter.export_many(make_recommendations(2, step=timedelta(days=1)))
+    note = exporter.daily_note_path("2024-03-02")
+    note.write_text(note.read_text(encoding="utf-8") + "Me costó arrancar.\n", encoding="utf-8")
+    index = VaultIndex(index_path=isolated_settings / "cache" / "index.json")
+    monkeypatch.setattr(vault_index_module, "vault_index", index)
+    monkeypatch.setattr(settings, "PATTERN_HISTORY_DAYS", 100000)
+
+    await service.analyze_decision_patterns(decisions=[])
+
+    prompt = claude_stub.requests[-1]["messages"][0]["content"]
+    assert "Reflexiones del usuario en Obsidian" in prompt and "Me costó arrancar." in prompt
+    assert prompt.count("2024-03-0") == 1
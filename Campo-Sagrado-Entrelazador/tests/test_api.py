@@ -0,0 +1,53 @@
+"""Endpoints de la API (src/api/main.py) con un cliente en proceso."""
+
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.dependencies import container
+
+
+@pytest.fixture
+def client(history):
+    """Cliente de la API con el historial propio del test."""
+    from src.api.main import app
+    from src.core.recommendation_engine import SacralRecommendationEngine
+
+    container.reset()
+    engine = SacralRecommendationEngine()
+    engine.history_store = history
+    container.override("engine", engine)
+    with TestClient(app) as client:
+        yield client
+    container.reset()
+
+
+def test_record_outcome_updates_pattern_stats(client, history, make_recommendations):
+    first, second = history.append_many(make_recommendations(2, step=timedelta(hours=5)))
+
+    response = client.post(f"/recommendations/{first}/outcome", json={
+        "chosen": "A", "satisfaction": 8, "energy_before": 5, "energy_after": 7, "notes": "bien",
+    })
+    assert response.status_code == 201
+    assert response.json() == {"id": first, "recorded": True}
+    client.post(f"/recommendations/{second}/outcome", json={"chosen": "B", "satisfaction": 4})
+    # Corrección del primero: sustituye al resultado anterior
+    client.post(f"/recommendations/{first}/outcome", json={"chosen": "B", "satisfaction": 6})
+
+    stats = client.get("/patterns/stats").json()
+    assert stats["sample_size"] == 2
+    assert stats["satisfaction_mean"] == 5.0
+    assert stats["options"]["B"]["count"] == 2
+
+
+def test_record_outcome_of_unknown_decision(client):
+    response = client.post("/recommendations/no-existe/outcome", json={"satisfaction": 5})
+    assert response.status_code == 404
+    assert "no-existe" in response.json()["detail"]
+
+
+def test_record_outcome_validates_values(client, history, make_recommendations):
+    (decision_id,) = history.append_many(make_recommendations(1))
+    response = client.post(f"/recommendations/{decision_id}/outcome", json={"chosen": "C", "satisfaction": 11})
+    assert response.status_code == 422
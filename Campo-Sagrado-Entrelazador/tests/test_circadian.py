@@ -0,0 +1,67 @@
+"""Curva circadiana (src/core/circadian.py) y decisiones A/B del motor."""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core.circadian import HOUR_TO_PHASE, MINUTES_PER_DAY, PHASE_CENTERS, PHASE_SPECS, CircadianCurve
+
+# Decisión por hora (0-23) con energía media (4-7): B en MEDIODÍA (0.6) y NOCHE (0.4)
+MID_ENERGY_DECISIONS = "BBBBB" "AAAA" "AAAA" "BBB" "AAAA" "BBBB"
+
+
+def _day(engine) -> pd.DatetimeIndex:
+    return pd.date_range("2024-03-01", periods=MINUTES_PER_DAY, freq="min", tz=engine.tz.zone)
+
+
+@pytest.fixture
+def engine(isolated_settings):
+    from src.core.recommendation_engine import SacralRecommendationEngine
+
+    return SacralRecommendationEngine()
+
+
+@pytest.mark.parametrize("smoothing", [True, False])
+def test_smoothing_does_not_change_decisions(engine, monkeypatch, smoothing):
+    from src.utils.config import settings
+
+    monkeypatch.setattr(settings, "CIRCADIAN_SMOOTHING", smoothing)
+    timestamps = _day(engine)
+
+    for energy in range(1, 11):
+        batch = engine.generate_batch(np.full(MINUTES_PER_DAY, energy), timestamps)
+        if 4 <= energy < 8:
+            expected = np.repeat(list(MID_ENERGY_DECISIONS), 60)
+        else:
+            expected = np.full(MINUTES_PER_DAY, "A")
+        assert (batch.recommended == expected).all(), energy
+
+
+@pytest.mark.parametrize("hour, minute, expected", [(13, 0, "B"), (15, 30, "B"), (4, 30, "B"), (12, 59, "A")])
+def test_single_recommendation_uses_phase_energy(engine, monkeypatch, hour, minute, expected):
+    import src.core.recommendation_engine as module
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return tz.localize(datetime(2024, 3, 1, hour, minute))
+
+    monkeypatch.setattr(module, "datetime", Clock)
+    recommendation = engine.generate_binary_recommendation({"current_energy": 5})
+
+    assert recommendation.recommended_option == expected
+    assert recommendation.factors["circadian_phase"] == PHASE_SPECS[HOUR_TO_PHASE[hour]]["phase"]
+
+
+def test_smoothed_curve_hits_nominal_values_at_phase_centers():
+    curve = CircadianCurve(smoothing=True)
+    steps = CircadianCurve(smoothing=False)
+
+    for index, center in enumerate(PHASE_CENTERS):
+        assert curve.energy[center] == PHASE_SPECS[index]["energy"]
+    assert (steps.energy == np.repeat([PHASE_SPECS[i]["energy"] for i in HOUR_TO_PHASE], 60)).all()
+    # Sin saltos de un minuto a otro en la curva suavizada
+    assert np.abs(np.diff(curve.energy)).max() < 0.01
+    assert curve.phase_at(7 * 60) is curve.phase_at(7 * 60)
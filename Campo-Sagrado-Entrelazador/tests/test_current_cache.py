@@ -0,0 +1,60 @@
+"""Caché de la recomendación actual (src/services/current_cache.py)."""
+
+from datetime import timedelta
+
+from src.models.recommendation import Recommendation
+from src.services.current_cache import CurrentRecommendationCache
+
+
+def test_set_during_load_is_not_overwritten(make_recommendations):
+    older, newer = make_recommendations(2, step=timedelta(minutes=5))
+    cache = CurrentRecommendationCache(lambda: loaded)
+
+    class RacingRecommendation(Recommendation):
+        """Una recomendación nueva llega mientras se serializa la cargada."""
+
+        def model_dump_json(self, **kwargs):
+            cache.set(newer)
+            return super().model_dump_json(**kwargs)
+
+    loaded = RacingRecommendation.model_validate(older.model_dump())
+
+    entry = cache.get()
+
+    assert entry == cache.get() == cache.set(newer)
+    assert newer.model_dump_json().encode() in entry.body
+
+
+def test_loads_once_and_reloads_after_invalidate(make_recommendations):
+    calls = []
+    recommendation = make_recommendations(1)[0]
+
+    def loader():
+        calls.append(1)
+        return recommendation
+
+    cache = CurrentRecommendationCache(loader)
+    assert not cache.loaded
+    first = cache.get()
+    assert cache.get() is first and len(calls) == 1 and cache.loaded
+
+    cache.invalidate()
+    assert cache.get() == first and len(calls) == 2
+
+
+def test_etag_matching(make_recommendations):
+    entry = CurrentRecommendationCache(lambda: None).set(make_recommendations(1)[0])
+
+    assert entry.matches(entry.etag)
+    assert entry.matches(f'"otro", {entry.etag}')
+    assert entry.matches("*")
+    assert not entry.matches('"otro"') and not entry.matches(None)
+
+
+def test_loader_failure_or_empty_history():
+    def broken():
+        raise OSError("disco")
+
+    assert CurrentRecommendationCache(broken).get() is None
+    empty = CurrentRecommendationCache(lambda: None)
+    assert empty.get() is None and not empty.loaded
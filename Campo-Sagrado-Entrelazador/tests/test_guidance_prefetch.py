@@ -0,0 +1,132 @@
+"""Pre-generación de guías antes de cada rezo (src/services/guidance_prefetch.py)."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from src.services.ai_service import AsyncClaudeService
+from src.services.guidance_prefetch import GuidancePrefetcher
+
+
+@pytest.fixture
+def engine(history):
+    from src.core.recommendation_engine import SacralRecommendationEngine
+
+    engine = SacralRecommendationEngine()
+    engine.history_store = history
+    return engine
+
+
+@pytest_asyncio.fixture
+async def prefetcher(claude_stub, engine):
+    prefetcher = GuidancePrefetcher(engine, AsyncClaudeService(max_retries=0))
+    yield prefetcher
+    await prefetcher.stop()
+
+
+def test_next_prayer_today_and_tomorrow(engine):
+    prefetcher = GuidancePrefetcher(engine, service=object())
+    morning = engine.tz.localize(datetime(2024, 3, 1, 10, 0))
+    night = engine.tz.localize(datetime(2024, 3, 1, 23, 59))
+
+    prayer, at = prefetcher.next_prayer(morning)
+    assert prayer == "Dhuhr" and at.date() == morning.date() and at > morning
+
+    prayer, at = prefetcher.next_prayer(night)
+    assert prayer == "Fajr" and at.date() == morning.date() + timedelta(days=1)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_serves_guidance_from_memory(claude_stub, prefetcher):
+    claude_stub.reply = lambda body: "Respira y escucha"
+    at = datetime.now(prefetcher.engine.tz) + timedelta(minutes=5)
+
+    entry = await prefetcher.prefetch("Asr", at)
+
+    assert entry is not None and prefetcher.prefetched == 1
+    assert prefetcher.get("Asr") is entry
+    assert prefetcher.guidance("Asr") == "Respira y escucha"
+    assert entry.recommendation["recommended_option"] in ("A", "B")
+    # Una llamada para la guía y otra para enriquecer la recomendación
+    assert len(claude_stub.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_prefetch_falls_back_to_default(claude_stub, prefetcher):
+    claude_stub.failures = [500, 500]
+    at = datetime.now(prefetcher.engine.tz) + timedelta(minutes=5)
+
+    assert await prefetcher.prefetch("Maghrib", at) is None
+
+    assert prefetcher.failed == 1 and prefetcher.get("Maghrib") is None
+    assert prefetcher.guidance("Maghrib") == prefetcher.service.default_prayer_guidance("Maghrib")
+
+
+@pytest.mark.asyncio
+async def test_offline_service_does_not_prefetch(engine):
+    prefetcher = GuidancePrefetcher(engine, AsyncClaudeService())
+    at = datetime.now(engine.tz) + timedelta(minutes=5)
+
+    assert await prefetcher.prefetch("Isha", at) is None
+    assert prefetcher.guidance("Isha").startswith("La quietud nocturna")
+
+
+@pytest.mark.asyncio
+async def test_background_task_prefetches_next_prayer(claude_stub, engine):
+    # Antelación de un día: el próximo rezo ya está dentro de la ventana
+    prefetcher = GuidancePrefetcher(engine, AsyncClaudeService(max_retries=0), lead_minutes=24 * 60)
+    prefetcher.start()
+    try:
+        for _ in range(100):
+            if prefetcher.prefetched:
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        await prefetcher.stop()
+
+    assert prefetcher.prefetched == 1
+    assert len(claude_stub.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_prefetch_is_retried_before_the_prayer(claude_stub, prefetcher, monkeypatch):
+    import src.services.guidance_prefetch as module
+
+    monkeypatch.setattr(module, "_RETRY_BASE_S", 0.01)
+    claude_stub.failures = [500, 500, 500]
+    at = datetime.now(prefetcher.engine.tz) + timedelta(minutes=5)
+
+    entry = await prefetcher._prefetch_until("Dhuhr", at)
+
+    assert entry is not None and prefetcher.get("Dhuhr") is entry
+    assert prefetcher.failed >= 1 and prefetcher.prefetched == 1
+
+
+@pytest.mark.asyncio
+async def test_no_retry_once_the_prayer_has_started(claude_stub, prefetcher):
+    claude_stub.failures = [500] * 4
+    at = datetime.now(prefetcher.engine.tz) + timedelta(seconds=1)
+
+    assert await prefetcher._prefetch_until("Dhuhr", at) is None
+    assert prefetcher.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_sacred_guidance_is_served_from_the_running_prefetcher(claude_stub, prefetcher):
+    import src.services.guidance_prefetch as module
+
+    claude_stub.reply = lambda body: "Pre-generada"
+    await prefetcher.prefetch("Asr", datetime.now(prefetcher.engine.tz) + timedelta(minutes=5))
+    claude_stub.reply = lambda body: "Nueva"
+    service = prefetcher.service
+
+    prefetcher.start()
+    assert await service.generate_sacred_guidance("asr", {}) == "Pre-generada"
+    assert len(claude_stub.requests) == 2
+    assert await service.generate_sacred_guidance("Asr", {}, fresh=True) == "Nueva"
+    assert await service.generate_sacred_guidance("Isha", {}) == "Nueva"
+
+    await prefetcher.stop()
+    assert module.prefetched_guidance("Asr") is None
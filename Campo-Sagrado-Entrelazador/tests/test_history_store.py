@@ -0,0 +1,28 @@
+"""Historial SQLite (src/adapters/history_store.py)."""
+
+import threading
+
+from src.adapters.history_store import RecommendationHistoryStore
+
+
+def test_memory_store_is_shared_by_threads_and_streams(isolated_settings, make_recommendations):
+    store = RecommendationHistoryStore("sqlite:///")
+    assert store.path == ":memory:"
+    ids = store.append_many(make_recommendations(3))
+
+    counts = []
+    thread = threading.Thread(target=lambda: counts.append(store.count()))
+    thread.start()
+    thread.join()
+
+    assert counts == [3]
+    assert [row["id"] for batch in store.stream(batch_size=2) for row in batch] == ids
+    # La conexión de stream() se cierra al acabar; los datos siguen ahí
+    assert store.count() == 3
+
+
+def test_memory_stores_are_independent(isolated_settings, make_recommendations):
+    first, second = RecommendationHistoryStore("sqlite:///"), RecommendationHistoryStore("sqlite:///")
+    first.append_many(make_recommendations(2))
+
+    assert (first.count(), second.count()) == (2, 0)
@@ -0,0 +1,89 @@
+"""
+Presupuesto de tiempo de importación (python -X importtime).
+
+Importar la API o los módulos de CLI no debe construir servicios, tocar
+disco ni cargar dependencias pesadas: se construyen en el primer uso.
+
+Lo que se comprueba siempre es que no se carguen dependencias pesadas ni
+haya efectos secundarios; el presupuesto en milisegundos es opcional.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Milisegundos atribuibles al proyecto al importar la API (sin contar FastAPI,
+# cuyo coste no depende de nosotros). Es una medida de reloj y depende de la
+# máquina: solo se comprueba si se pide (make test-import-time).
+BUDGET_MS = os.environ.get("IMPORT_TIME_BUDGET_MS")
+
+# Mejor de N arranques en frío, para filtrar el ruido de la máquina
+RUNS = 3
+
+# Se cargan bajo demanda, nunca al importar la API
+LAZY_MODULES = ("anthropic", "numpy", "pandas", "requests", "yaml", "watchdog", "pytz")
+
+
+def _run(code: str, workdir: Path, *flags: str) -> subprocess.CompletedProcess:
+    """Ejecuta `code` en un intérprete nuevo con rutas temporales."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(PROJECT_ROOT),
+        "PROJECT_ROOT": str(workdir),
+        "OBSIDIAN_VAULT_PATH": str(workdir / "vault"),
+        "CACHE_PATH": str(workdir / "cache"),
+        "DATABASE_URL": f"sqlite:///{workdir / 'db' / 'history.db'}",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def _import_times(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Módulo -> (propio, acumulado) en microsegundos, de la salida de -X importtime."""
+    times: Dict[str, Tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.setdefault(name.strip(), (int(own), int(cumulative)))
+    return times
+
+
+def _project_import_ms(workdir: Path, module: str) -> float:
+    """Milisegundos de importar `module` en frío, descontando FastAPI."""
+    times = _import_times(_run(f"import {module}", workdir, "-X", "importtime").stderr)
+    framework = times.get("fastapi", (0, 0))[1]
+    return (times[module][1] - framework) / 1000
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(BUDGET_MS is None, reason="IMPORT_TIME_BUDGET_MS no definido (make test-import-time)")
+@pytest.mark.parametrize("module", ["src.api.main", "src.services.obsidian_exporter", "src.utils.config"])
+def test_import_within_budget(module: str, tmp_path: Path):
+    budget = float(BUDGET_MS)
+    elapsed: List[float] = [_project_import_ms(tmp_path, module) for _ in range(RUNS)]
+    assert min(elapsed) <= budget, f"{module}: {min(elapsed):.0f} ms > {budget:.0f} ms"
+
+
+def test_api_import_is_lazy(tmp_path: Path):
+    result = _run(
+        "import sys, src.api.main\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))",
+        tmp_path,
+    )
+    assert result.stdout.strip() == "", f"Importados al cargar la API: {result.stdout.strip()}"
+
+
+def test_import_has_no_side_effects(tmp_path: Path):
+    result = _run("import src.api.main, src.services.obsidian_exporter, src.adapters.history_store", tmp_path)
+    assert result.stdout == ""
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,130 @@
+"""Métricas Prometheus (src/utils/metrics.py)."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.utils import metrics
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    """Métricas activas durante el test (se restaura el estado anterior)."""
+    monkeypatch.setattr(metrics, "_enabled", True)
+
+
+@pytest.fixture
+def disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", False)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Registro vacío: las métricas del test no se mezclan con las de la app."""
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    return metrics.REGISTRY
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = metrics.Histogram("t_seconds", "Duración", ("stage",), buckets=(1.0, 0.125))
+    for value in (0.0625, 0.125, 0.5, 4.0):
+        histogram.labels("x").observe(value)
+
+    assert histogram.buckets == (0.125, 1.0)
+    assert metrics.render().decode("utf-8").splitlines() == [
+        "# HELP t_seconds Duración",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{stage="x",le="0.125"} 2',
+        't_seconds_bucket{stage="x",le="1"} 3',
+        't_seconds_bucket{stage="x",le="+Inf"} 4',
+        't_seconds_sum{stage="x"} 4.6875',
+        't_seconds_count{stage="x"} 4',
+    ]
+
+
+def test_text_exposition_of_counters_gauges_and_collectors(registry):
+    counter = metrics.Counter("t_total", "Consultas", ("cache", "result"))
+    counter.labels("a", "hit").inc(2)
+    counter.collect("b", lambda: {('b"q', "miss"): 1})
+    counter.collect("roto", lambda: 1 / 0)
+    gauge = metrics.Gauge("t_depth", "Profundidad")
+    gauge.labels().set(0.5)
+
+    assert metrics.render() == (
+        "# HELP t_total Consultas\n"
+        "# TYPE t_total counter\n"
+        't_total{cache="a",result="hit"} 2\n'
+        't_total{cache="b\\"q",result="miss"} 1\n'
+        "# HELP t_depth Profundidad\n"
+        "# TYPE t_depth gauge\n"
+        "t_depth 0.5\n"
+    ).encode("utf-8")
+
+
+def test_measuring_points_are_noops_when_disabled(disabled):
+    calls = []
+
+    @metrics.timed("t_timed_off")
+    def work():
+        calls.append(1)
+        return "hecho"
+
+    assert metrics.stage("t_stage_off") is metrics._NO_TIMER
+    assert metrics.upstream("t_upstream_off") is metrics._NO_TIMER
+    with metrics.stage("t_stage_off"), metrics.upstream("t_upstream_off"):
+        pass
+    assert work() == "hecho" and calls == [1]
+
+    assert ("t_stage_off",) not in metrics.STAGE_SECONDS._children
+    assert ("t_timed_off",) not in metrics.STAGE_SECONDS._children
+    assert ("t_upstream_off",) not in metrics.UPSTREAM_SECONDS._children
+    assert metrics.start_server() is None
+
+
+def test_disabled_stages_still_reach_request_collectors(disabled):
+    stages = []
+    token = metrics.REQUEST_STAGES.set(stages)
+    try:
+        with metrics.stage("t_collected"):
+            pass
+    finally:
+        metrics.REQUEST_STAGES.reset(token)
+
+    assert [name for name, _ in stages] == ["t_collected"]
+    assert ("t_collected",) not in metrics.STAGE_SECONDS._children
+
+
+def test_measuring_points_record_when_enabled(enabled):
+    @metrics.timed("t_timed_on")
+    def work():
+        return "hecho"
+
+    assert work() == "hecho"
+    with pytest.raises(OSError):
+        with metrics.upstream("t_upstream_on"):
+            raise OSError("sin red")
+
+    assert metrics.STAGE_SECONDS.labels("t_timed_on").count == 1
+    assert metrics.UPSTREAM_SECONDS.labels("t_upstream_on").count == 1
+    assert metrics.UPSTREAM_REQUESTS.labels("t_upstream_on", "error").value == 1
+
+
+def test_middleware_labels_by_route_template(enabled):
+    app = FastAPI()
+
+    @app.post("/recommendations/{decision_id}/outcome")
+    def outcome(decision_id: str):
+        return {"id": decision_id}
+
+    app.add_middleware(metrics.MetricsMiddleware)
+    template = ("POST", "/recommendations/{decision_id}/outcome", "200")
+    before = metrics.HTTP_REQUEST_SECONDS.labels(*template).count
+    with TestClient(app) as client:
+        assert client.post("/recommendations/abc123/outcome").status_code == 200
+        assert client.post("/recommendations/def456/outcome").status_code == 200
+        assert client.get("/no-existe").status_code == 404
+
+    series = metrics.HTTP_REQUEST_SECONDS._children
+    assert metrics.HTTP_REQUEST_SECONDS.labels(*template).count == before + 2
+    assert not any("abc123" in route for _, route, _ in series)
+    assert ("GET", "sin_ruta", "404") in series
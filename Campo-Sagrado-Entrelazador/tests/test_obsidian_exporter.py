@@ -0,0 +1,100 @@
+"""Exportación a Obsidian (src/services/obsidian_exporter.py)."""
+
+import json
+import threading
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from src.services.markdown_templates import SECTION_MARKER, SECTION_TEMPLATE_VERSION, render_daily_section
+from src.services.obsidian_exporter import ObsidianExporter
+
+
+def _markers(path) -> list:
+    return [m.group(1).decode("ascii") for m in SECTION_MARKER.finditer(path.read_bytes())]
+
+
+def test_concurrent_appends_to_same_note(isolated_settings, make_recommendations):
+    exporter = ObsidianExporter()
+    shared, *own = [render_daily_section(r) for r in make_recommendations(9, step=timedelta(minutes=5))]
+    barrier = threading.Barrier(len(own))
+
+    def append(section):
+        barrier.wait()
+        exporter.append_daily_sections("2024-03-01", [shared, section], exists=False)
+
+    threads = [threading.Thread(target=append, args=(section,)) for section in own]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = _markers(exporter.daily_note_path("2024-03-01"))
+    assert Counter(ids)[shared[0]] == 1
+    assert sorted(ids) == sorted([shared[0]] + [section_id for section_id, _ in own])
+
+    # Una exportación nueva (manifiesto recargado) no vuelve a añadir nada
+    again = ObsidianExporter()
+    _, appended = again.append_daily_sections("2024-03-01", [shared, *own])
+    assert appended == 0
+
+
+def test_manifest_keeps_a_summary_per_note(isolated_settings, make_recommendations):
+    exporter = ObsidianExporter()
+    sections = [render_daily_section(r) for r in make_recommendations(5, step=timedelta(minutes=5))]
+    exporter.append_daily_sections("2024-03-01", sections[:3])
+    exporter.append_daily_sections("2024-03-01", sections[3:])
+
+    manifest = json.loads(exporter.manifest_path.read_text())
+    assert manifest["01-DAILY/2024-03-01-Recommendation.md"] == {
+        "count": 5,
+        "last": sections[-1][0],
+        "v": SECTION_TEMPLATE_VERSION,
+    }
+
+
+def test_reexporting_last_section_does_not_read_the_note(isolated_settings, make_recommendations, monkeypatch):
+    recommendation = make_recommendations(1)[0]
+    ObsidianExporter().export_daily_recommendation(recommendation)
+
+    exporter = ObsidianExporter()
+    monkeypatch.setattr(Path, "read_bytes", lambda self: pytest.fail(f"leído {self}"))
+    exporter.export_daily_recommendation(recommendation)
+    assert (exporter.written, exporter.skipped) == (0, 1)
+
+
+def test_new_process_reads_markers_once(isolated_settings, make_recommendations):
+    sections = [render_daily_section(r) for r in make_recommendations(3, step=timedelta(minutes=5))]
+    ObsidianExporter().append_daily_sections("2024-03-01", sections[:2])
+
+    exporter = ObsidianExporter()
+    _, appended = exporter.append_daily_sections("2024-03-01", sections)
+    assert appended == 1
+    assert _markers(exporter.daily_note_path("2024-03-01")) == [section_id for section_id, _ in sections]
+
+
+def test_legacy_manifest_with_id_lists(isolated_settings, make_recommendations):
+    sections = [render_daily_section(r) for r in make_recommendations(2, step=timedelta(minutes=5))]
+    exporter = ObsidianExporter()
+    exporter.append_daily_sections("2024-03-01", sections)
+    key = "01-DAILY/2024-03-01-Recommendation.md"
+    exporter.manifest_path.write_text(json.dumps({key: [section_id for section_id, _ in sections]}))
+
+    again = ObsidianExporter()
+    _, appended = again.append_daily_sections("2024-03-01", sections)
+    assert appended == 0
+    _, appended = again.append_daily_sections("2024-03-01", sections[:1])
+    assert appended == 0
+
+
+def test_user_edits_survive_appends(isolated_settings, make_recommendations):
+    sections = [render_daily_section(r) for r in make_recommendations(2, step=timedelta(minutes=5))]
+    exporter = ObsidianExporter()
+    path, _ = exporter.append_daily_sections("2024-03-01", sections[:1])
+    path.write_bytes(path.read_bytes() + "\nMis notas\n".encode())
+
+    exporter.append_daily_sections("2024-03-01", sections)
+    content = path.read_bytes()
+    assert b"Mis notas" in content and content.endswith(sections[1][1])
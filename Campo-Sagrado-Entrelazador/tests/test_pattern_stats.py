@@ -0,0 +1,94 @@
+"""Agregados incrementales de patrones (src/core/pattern_stats.py) frente a la analítica completa."""
+
+import math
+from datetime import timedelta
+
+import pytest
+
+from src.core.pattern_stats import PatternStats, observation
+from src.services.pattern_analytics import analyze_columns
+
+# Resultados (elegida, satisfacción, energía antes, energía después) por decisión
+OUTCOMES = [
+    ("A", 8, 5, 7), ("B", 4, 6, 5), ("A", 9, 4, 8), ("B", 6, 7, 7),
+    ("A", 7, 5, 6), ("A", 3, 8, 4), ("B", 8, 3, 7), ("A", 5, 6, 6),
+    ("B", 9, 2, 8), ("A", 6, 7, 6), ("B", 2, 9, 3), ("A", 10, 4, 9),
+]
+
+
+def _assert_close(actual, expected, path="stats"):
+    """Igualdad recursiva; los números con la tolerancia del redondeo a 2 decimales."""
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), path
+        for key in expected:
+            _assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, float) and actual is not None:
+        assert actual == pytest.approx(expected, abs=0.011), path
+    else:
+        assert actual == expected, path
+
+
+def _record_all(history, make_recommendations) -> list:
+    ids = history.append_many(make_recommendations(len(OUTCOMES), step=timedelta(hours=5)))
+    for decision_id, (chosen, satisfaction, before, after) in zip(ids, OUTCOMES):
+        history.record_outcome(decision_id, chosen, satisfaction, before, after)
+    return ids
+
+
+def test_snapshot_matches_full_analysis(history, make_recommendations):
+    ids = _record_all(history, make_recommendations)
+    # Correcciones: el resultado anterior se resta de todos los agregados
+    history.record_outcome(ids[1], "A", 9, 6, 9)
+    history.record_outcome(ids[5], "B", 7, 8, 8)
+    history.record_outcome(ids[5], "A", 1, 2, 1)
+
+    snapshot = history.pattern_stats()
+    expected = analyze_columns(history.decision_columns())
+
+    assert snapshot["sample_size"] == len(OUTCOMES)
+    # La tendencia sale de medias con decaimiento, no de ventanas: se compara aparte
+    trend = snapshot.pop("trend")
+    expected.pop("trend")
+    _assert_close(snapshot, expected)
+    assert trend["half_life_days"] == [7, 30]
+
+
+def test_rebuild_matches_incremental_state(history, make_recommendations):
+    ids = _record_all(history, make_recommendations)
+    history.record_outcome(ids[0], "B", 2, 5, 3)
+    incremental = history.pattern_stats()
+
+    rebuilt = history.rebuild_pattern_stats().snapshot()
+
+    _assert_close(rebuilt, incremental)
+
+
+def test_remove_undoes_add():
+    first = observation(1_709_280_000_000, "A", "MAÑANA", "A", 8, 5, 7)
+    second = observation(1_709_366_400_000, "A", None, "B", 4, 6, 5)
+    stats = PatternStats()
+    stats.add(first)
+    before = PatternStats.from_json(stats.to_json()).state
+
+    stats.add(second)
+    stats.remove(second)
+
+    n, mean, m2 = stats.state["satisfaction"]
+    assert (n, mean) == (1, pytest.approx(8)) and math.isclose(m2, 0, abs_tol=1e-9)
+    assert stats.state["options"] == before["options"]
+    assert stats.state["by_hour"] == before["by_hour"]
+    # Las medias con decaimiento pueden cambiar de referencia, pero no de valor
+    assert [total / weight for total, weight, _ in stats.state["decayed"]] == pytest.approx([8, 8])
+
+    stats.remove(first)
+    assert stats.snapshot() == {"sample_size": 0}
+
+
+def test_observation_without_satisfaction_is_ignored():
+    stats = PatternStats()
+    stats.add(observation(1_709_280_000_000, "A", None, "A", None, 5, 7))
+    assert stats.snapshot() == {"sample_size": 0}
+
+
+def test_state_of_another_version_is_discarded():
+    assert PatternStats.from_json('{"version": 0}') is None
@@ -0,0 +1,193 @@
+"""Análisis map-reduce de periodos (src/services/period_analysis.py) contra el stub local."""
+
+import json
+from collections import Counter
+from datetime import date
+
+import pytest
+import pytest_asyncio
+
+from src.services.ai_service import AsyncClaudeService
+from src.services.period_analysis import (
+    CHUNK_SYSTEM,
+    REDUCE_SYSTEM,
+    PeriodAnalyzer,
+    _split_to_fit,
+    _synthetic_decisions,
+    chunk_by_days,
+)
+from src.services.prompt_budget import compact_json, estimate_tokens
+
+
+def _decision(timestamp: str, **values) -> dict:
+    return {"timestamp": timestamp, "recommended": "A", "chosen": "A", "satisfaction": 7,
+            "energy_before": 6, "energy_after": 7, **values}
+
+
+def _chunk_label(body: dict) -> str:
+    """Fecha del tramo de una petición de map ("Tramo 2024-03-01:" al principio del prompt)."""
+    return body["messages"][0]["content"].split(":", 1)[0].removeprefix("Tramo ")
+
+
+def _reply(chunk_reply=None, finding_chars: int = 20):
+    """Respuestas del stub: JSON por tramo (o chunk_reply(label)) y JSON de fusión."""
+    def reply(body: dict) -> str:
+        if body["system"] == CHUNK_SYSTEM:
+            label = _chunk_label(body)
+            if chunk_reply is not None:
+                custom = chunk_reply(label)
+                if custom is not None:
+                    return custom
+            return json.dumps({"patron": f"patrón {label}", "hallazgos": ["x" * finding_chars]})
+        assert body["system"] == REDUCE_SYSTEM
+        # Parciales recibidos: de tramos ("patron") o de fusiones intermedias
+        prompt = body["messages"][0]["content"]
+        parts = prompt.count('"patron"') + prompt.count('"patron_principal"')
+        return json.dumps({"patron_principal": "fusión", "partes": parts})
+    return reply
+
+
+@pytest_asyncio.fixture
+async def analyzer(claude_stub):
+    service = AsyncClaudeService(max_retries=0)
+    yield PeriodAnalyzer(service, chunk_days=1, concurrency=3, retries=2)
+    await service.aclose()
+
+
+def test_chunk_by_days_uses_local_days():
+    decisions = [
+        _decision("2024-03-01T10:00:00+00:00"),
+        # 23:30 UTC ya es el día 2 en Europe/Madrid
+        _decision("2024-03-01T23:30:00+00:00"),
+        _decision("2024-03-02T08:00:00"),
+        _decision("2024-03-05T08:00:00+00:00"),
+    ]
+
+    chunks = chunk_by_days(decisions, 1)
+    assert [(start, end, len(rows)) for start, end, rows in chunks] == [
+        (date(2024, 3, 1), date(2024, 3, 1), 1),
+        (date(2024, 3, 2), date(2024, 3, 2), 2),
+        (date(2024, 3, 5), date(2024, 3, 5), 1),
+    ]
+
+    chunks = chunk_by_days(decisions, 3)
+    assert [(start, end, len(rows)) for start, end, rows in chunks] == [
+        (date(2024, 3, 1), date(2024, 3, 3), 3),
+        (date(2024, 3, 4), date(2024, 3, 6), 1),
+    ]
+
+
+def test_split_to_fit_keeps_groups_within_room():
+    partials = [{"hallazgos": ["x" * 200], "n": i} for i in range(10)]
+    room = estimate_tokens(compact_json(partials[:3]))
+
+    groups = _split_to_fit(partials, room)
+
+    assert [p for group in groups for p in group] == partials
+    assert all(len(group) >= 2 for group in groups[:-1])
+    assert all(estimate_tokens(compact_json(group)) <= room for group in groups if len(group) > 2)
+
+
+@pytest.mark.asyncio
+async def test_analyze_maps_every_chunk_and_reduces(claude_stub, analyzer):
+    claude_stub.reply = _reply()
+    decisions = _synthetic_decisions(5, per_day=6)
+
+    result = await analyzer.analyze(decisions)
+
+    assert result["chunks"]["ok"] == result["chunks"]["total"] == len(chunk_by_days(decisions))
+    assert result["chunks"]["failed"] == []
+    assert result["patron_principal"] == "fusión"
+    assert result["partes"] == result["chunks"]["ok"]
+    assert result["stats"]["sample_size"] == len(decisions)
+    assert claude_stub.max_active <= 3
+
+
+@pytest.mark.asyncio
+async def test_invalid_chunk_answer_is_retried(claude_stub, analyzer):
+    decisions = _synthetic_decisions(3, per_day=4)
+    flaky = chunk_by_days(decisions)[1][0].isoformat()
+    attempts = Counter()
+
+    def chunk_reply(label):
+        attempts[label] += 1
+        return "esto no es JSON" if label == flaky and attempts[label] == 1 else None
+
+    claude_stub.reply = _reply(chunk_reply)
+    result = await analyzer.analyze(decisions)
+
+    assert attempts[flaky] == 2
+    assert result["chunks"]["ok"] == result["chunks"]["total"]
+
+
+@pytest.mark.asyncio
+async def test_failed_chunks_are_reported(claude_stub, analyzer):
+    decisions = _synthetic_decisions(4, per_day=4)
+    broken = chunk_by_days(decisions)[2][0].isoformat()
+    attempts = Counter()
+
+    def chunk_reply(label):
+        attempts[label] += 1
+        return "[1, 2, 3]" if label == broken else None
+
+    claude_stub.reply = _reply(chunk_reply)
+    result = await analyzer.analyze(decisions)
+
+    assert attempts[broken] == analyzer.retries + 1
+    assert result["chunks"]["failed"] == [broken]
+    assert result["chunks"]["ok"] == result["chunks"]["total"] - 1
+    assert result["partes"] == result["chunks"]["ok"]
+
+
+@pytest.mark.asyncio
+async def test_reduce_merges_in_levels_when_over_budget(claude_stub, analyzer, monkeypatch):
+    from src.utils.config import settings
+
+    monkeypatch.setattr(settings, "CLAUDE_REDUCE_TOKEN_BUDGET", 1200)
+    claude_stub.reply = _reply(finding_chars=600)
+    decisions = _synthetic_decisions(8, per_day=3)
+
+    result = await analyzer.analyze(decisions)
+
+    systems = Counter(body["system"] for body in claude_stub.requests)
+    assert systems[CHUNK_SYSTEM] == result["chunks"]["total"]
+    # Fusiones intermedias + la final
+    assert systems[REDUCE_SYSTEM] > 1
+    assert result["patron_principal"] == "fusión"
+    # La fusión final recibe los resultados intermedios, no los parciales de cada tramo
+    assert result["partes"] < result["chunks"]["ok"]
+
+
+@pytest.mark.asyncio
+async def test_all_chunks_failing(claude_stub, analyzer):
+    claude_stub.reply = _reply(lambda label: "nada")
+
+    result = await analyzer.analyze(_synthetic_decisions(2, per_day=2))
+
+    assert result["error"] == "Ningún tramo pudo analizarse"
+    assert result["chunks"]["ok"] == 0 and len(result["chunks"]["failed"]) == result["chunks"]["total"]
+
+
+@pytest.mark.asyncio
+async def test_without_data_or_client(isolated_settings):
+    service = AsyncClaudeService()
+    assert service.client is None
+    analyzer = PeriodAnalyzer(service)
+
+    assert (await analyzer.analyze([]))["status"] == "sin_datos"
+    assert (await analyzer.analyze(_synthetic_decisions(2)))["status"] == "offline"
+
+
+def test_cli_against_stub(isolated_settings, monkeypatch, capsys):
+    from src.services.period_analysis import main
+    from src.utils.config import settings
+
+    # main(--stub) apunta la configuración al stub: se restaura al terminar
+    monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", "")
+    monkeypatch.setattr(settings, "ANTHROPIC_BASE_URL", None)
+    monkeypatch.setattr(settings, "CLAUDE_CACHE_ENABLED", False)
+
+    main(["--stub", "--days", "3"])
+
+    output = capsys.readouterr().out
+    assert "Tramos: 3/3 analizados" in output
@@ -0,0 +1,99 @@
+"""Cola write-behind de recomendaciones (src/services/persistence_queue.py)."""
+
+import pytest
+
+import src.services.persistence_queue as module
+from src.services.persistence_queue import RecommendationWriteBehind
+
+
+class FlakyEngine:
+    """Motor cuyo record_history falla las primeras `failures` veces."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.recorded = []
+
+    def record_history(self, recommendations):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disco lleno")
+        self.recorded.extend(recommendations)
+
+
+class FlakyExporter:
+    """Exportador cuyo export_many falla las primeras `failures` veces."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.exported = []
+
+    def export_many(self, recommendations, current=None):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("vault no disponible")
+        self.exported.extend(recommendations)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(module, "_RETRY_BASE_S", 0.001)
+    monkeypatch.setattr(module, "_RETRY_MAX_S", 0.01)
+
+
+def _queue(engine, exporter) -> RecommendationWriteBehind:
+    return RecommendationWriteBehind(engine, exporter, coalesce_ms=0)
+
+
+def test_failed_history_write_is_retried(make_recommendations):
+    engine, exporter = FlakyEngine(failures=2), FlakyExporter()
+    queue = _queue(engine, exporter)
+    recommendations = make_recommendations(3)
+    for recommendation in recommendations:
+        queue.submit(recommendation)
+
+    assert queue.flush(timeout=5)
+    queue.stop()
+
+    assert engine.recorded == exporter.exported == recommendations
+    assert queue.failed_writes == 2 and queue.lost == 0 and queue.pending == 0
+
+
+def test_failed_export_does_not_record_history_twice(make_recommendations):
+    engine, exporter = FlakyEngine(), FlakyExporter(failures=1)
+    queue = _queue(engine, exporter)
+    recommendations = make_recommendations(2)
+    for recommendation in recommendations:
+        queue.submit(recommendation)
+
+    assert queue.flush(timeout=5)
+    queue.stop()
+
+    assert engine.recorded == recommendations and exporter.exported == recommendations
+    assert queue.failed_writes == 1
+
+
+def test_batch_is_dropped_and_reported_after_max_attempts(make_recommendations, monkeypatch):
+    monkeypatch.setattr(module, "_MAX_ATTEMPTS", 3)
+    engine, exporter = FlakyEngine(failures=10), FlakyExporter()
+    queue = _queue(engine, exporter)
+    queue.submit(make_recommendations(1)[0])
+
+    assert queue.flush(timeout=5) is False
+    assert (queue.failed_writes, queue.lost, queue.pending) == (3, 1, 0)
+
+    # Las siguientes escrituras vuelven a funcionar con normalidad
+    engine.failures = 0
+    queue.submit(make_recommendations(1)[0])
+    assert queue.flush(timeout=5)
+    queue.stop()
+    assert len(engine.recorded) == 1
+
+
+def test_failure_while_stopping_counts_as_lost(make_recommendations):
+    engine, exporter = FlakyEngine(failures=10), FlakyExporter()
+    queue = RecommendationWriteBehind(engine, exporter, coalesce_ms=200)
+    queue.submit(make_recommendations(1)[0])
+
+    queue.stop()
+
+    assert queue.lost == 1 and queue.pending == 0
@@ -0,0 +1,126 @@
+"""Caché diaria de horarios de rezo (src/core/prayer_cache.py)."""
+
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytz
+
+from src.core.prayer_cache import PrayerTimesCache
+
+TIMINGS = {"Fajr": "05:46", "Dhuhr": "13:22"}
+
+
+def _today() -> date:
+    from src.utils.config import settings
+
+    return datetime.now(pytz.timezone(settings.TIMEZONE)).date()
+
+
+def _cache(isolated_settings, fetcher=lambda day: TIMINGS, **options) -> PrayerTimesCache:
+    return PrayerTimesCache(fetcher, cache_dir=isolated_settings / "cache", **options)
+
+
+def test_fetching_a_future_day_keeps_recent_entries(isolated_settings):
+    cache = _cache(isolated_settings)
+    today = _today()
+    for day in (today - timedelta(days=10), today - timedelta(days=3), today):
+        cache.get(day)
+
+    cache.get(today + timedelta(days=30))
+
+    days = {key.split("|", 1)[0] for key in json.loads(cache.path.read_text())}
+    assert days == {(today + timedelta(days=n)).isoformat() for n in (-3, 0, 30)}
+
+
+def test_hits_and_persistence(isolated_settings):
+    calls = []
+    cache = _cache(isolated_settings, lambda day: calls.append(day) or TIMINGS)
+    today = _today()
+
+    assert cache.get(today) == TIMINGS
+    assert cache.get(today) == TIMINGS
+    assert (cache.misses, cache.hits, len(calls)) == (1, 1, 1)
+
+    # Otro proceso lee la entrada del disco
+    reloaded = _cache(isolated_settings, lambda day: calls.append(day) or TIMINGS)
+    assert reloaded.get(today) == TIMINGS and len(calls) == 1
+
+
+def test_concurrent_misses_share_one_fetch(isolated_settings):
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch(day):
+        calls.append(day)
+        release.wait(2)
+        return TIMINGS
+
+    cache = _cache(isolated_settings, slow_fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(_today()))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [TIMINGS] * 5 and len(calls) == 1
+
+
+def test_stale_entry_is_served_while_refreshing(isolated_settings):
+    answers = iter([TIMINGS, {"Fajr": "05:45"}])
+    refreshed = threading.Event()
+
+    def fetch(day):
+        timings = next(answers)
+        if timings is not TIMINGS:
+            refreshed.set()
+        return timings
+
+    cache = _cache(isolated_settings, fetch, ttl_hours=0)
+    today = _today()
+    cache.get(today)
+
+    assert cache.get(today) == TIMINGS and cache.stale_hits == 1
+    assert refreshed.wait(2)
+    for _ in range(100):
+        if cache.get(today) == {"Fajr": "05:45"}:
+            break
+        time.sleep(0.01)
+    assert cache.get(today) == {"Fajr": "05:45"}
+
+
+def test_fetch_errors_propagate_and_corrupt_file_is_discarded(isolated_settings):
+    def broken(day):
+        raise OSError("sin red")
+
+    path = isolated_settings / "cache" / "prayer_times.json"
+    path.parent.mkdir(parents=True)
+    path.write_text("{no es json")
+    cache = _cache(isolated_settings, broken)
+
+    with pytest.raises(OSError, match="sin red"):
+        cache.get(_today())
+    assert cache.misses == 1
+
+
+def test_counters_are_exact_under_concurrency(isolated_settings):
+    cache = _cache(isolated_settings)
+    today = _today()
+    cache.get(today)
+
+    def hammer():
+        for _ in range(2000):
+            cache.get(today)
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (cache.misses, cache.hits, cache.stale_hits) == (1, 16000, 0)
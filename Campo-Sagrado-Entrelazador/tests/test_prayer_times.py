@@ -0,0 +1,88 @@
+"""Calculadora local de horarios de rezo (src/core/prayer_times.py) frente a tablas de referencia."""
+
+from datetime import date
+
+import pytest
+
+from src.core.prayer_times import PRAYER_NAMES, PrayerTimesCalculator
+
+MADRID = (40.4168, -3.7038, "Europe/Madrid")
+LONDON = (51.5074, -0.1278, "Europe/London")
+OSLO = (59.9139, 10.7522, "Europe/Oslo")
+
+# Muslim World League (Fajr 18°, Isha 17°), Asr estándar. Referencia calculada
+# aparte con las ecuaciones del calculador solar de NOAA (otro modelo del sol
+# que el de praytimes.org), iterando cada evento a su propia hora.
+# Londres y Oslo en el solsticio: el sol no baja de -18°/-17°, así que Fajr e
+# Isha salen del ajuste 'angle based' (18/60 y 17/60 de la noche).
+REFERENCE = [
+    (MADRID, date(2024, 6, 20), "04:39 06:45 14:17 18:16 21:48 21:48 23:45"),
+    (MADRID, date(2024, 12, 21), "06:56 08:35 13:13 15:34 17:52 17:52 19:25"),
+    (MADRID, date(2024, 3, 20), "05:46 07:18 13:22 16:48 19:27 19:27 20:53"),
+    (MADRID, date(2024, 9, 22), "06:31 08:03 14:07 17:33 20:11 20:11 21:37"),
+    (LONDON, date(2024, 6, 20), "02:31 04:43 13:02 17:25 21:21 21:21 23:27"),
+    (OSLO, date(2024, 6, 20), "02:21 03:54 13:19 18:00 22:44 22:44 00:12"),
+]
+
+# Teherán (Fajr 17.7°, Maghrib 4.5°, Isha 14°), misma referencia. En Oslo en
+# el solsticio de verano también Maghrib sale del ajuste (4.5/60 de la noche).
+TEHRAN_REFERENCE = [
+    (MADRID, date(2024, 6, 20), "04:42 06:45 14:17 18:16 21:48 22:12 23:19"),
+    (OSLO, date(2024, 6, 20), "02:22 03:54 13:19 18:00 22:44 23:07 23:56"),
+    (OSLO, date(2024, 12, 21), "06:35 09:18 12:15 13:08 15:12 15:54 17:24"),
+]
+
+
+def _minutes(hhmm: str) -> int:
+    hour, minute = map(int, hhmm.split(":"))
+    return hour * 60 + minute
+
+
+@pytest.mark.parametrize(
+    "method, place, day, expected",
+    [(3, *row) for row in REFERENCE] + [(7, *row) for row in TEHRAN_REFERENCE],
+    ids=lambda value: str(value),
+)
+def test_matches_reference_timetable(method, place, day, expected):
+    latitude, longitude, timezone = place
+    times = PrayerTimesCalculator(latitude, longitude, method=method, school=0, timezone=timezone).times_for(day)
+
+    for name, reference in zip(PRAYER_NAMES, expected.split()):
+        # Al minuto: ±1 solo por el redondeo de modelos distintos
+        difference = (_minutes(times[name]) - _minutes(reference) + 720) % 1440 - 720
+        assert abs(difference) <= 1, f"{name}: {times[name]} frente a {reference}"
+
+
+def test_high_latitude_uses_angle_based_portions():
+    latitude, longitude, timezone = LONDON
+    calculator = PrayerTimesCalculator(latitude, longitude, method=3, school=0, timezone=timezone)
+    row = dict(zip(PRAYER_NAMES, calculator.minutes_for(date(2024, 6, 20)).tolist()))
+    fajr, sunrise, sunset, isha = row["Fajr"], row["Sunrise"], row["Sunset"], row["Isha"]
+    night = (sunrise - sunset) % 1440
+
+    assert abs((sunrise - fajr) - 18 / 60 * night) <= 1
+    assert abs((isha - sunset) - 17 / 60 * night) <= 1
+
+
+def test_high_latitude_adjusts_angle_based_maghrib():
+    latitude, longitude, timezone = OSLO
+    for method, angle in ((0, 4.0), (7, 4.5)):
+        calculator = PrayerTimesCalculator(latitude, longitude, method=method, school=0, timezone=timezone)
+        row = dict(zip(PRAYER_NAMES, calculator.minutes_for(date(2024, 6, 20)).tolist()))
+        night = (row["Sunrise"] - row["Sunset"]) % 1440
+
+        assert abs((row["Maghrib"] - row["Sunset"]) - angle / 60 * night) <= 1, method
+
+
+def test_daylight_saving_shift():
+    latitude, longitude, timezone = MADRID
+    calculator = PrayerTimesCalculator(latitude, longitude, method=3, school=0, timezone=timezone)
+    # 31 de marzo de 2024: cambio a horario de verano (el mediodía solar salta ~1 h)
+    before = _minutes(calculator.times_for(date(2024, 3, 30))["Dhuhr"])
+    after = _minutes(calculator.times_for(date(2024, 3, 31))["Dhuhr"])
+    assert 59 <= after - before <= 60
+
+
+def test_unsupported_method():
+    with pytest.raises(ValueError):
+        PrayerTimesCalculator(method=99)
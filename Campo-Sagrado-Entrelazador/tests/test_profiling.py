@@ -0,0 +1,52 @@
+"""Perfilado bajo demanda (src/utils/profiling.py)."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.utils import metrics
+from src.utils.profiling import ProfilingMiddleware, server_timing
+
+
+@pytest.fixture
+def client(isolated_settings, monkeypatch):
+    """App mínima con una etapa medida, montada con el perfilado activo."""
+    from src.utils.config import settings
+
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "PROFILING_PATH", str(isolated_settings / "profiles"))
+
+    app = FastAPI()
+
+    @app.get("/trabajo")
+    def work():
+        for _ in range(2):
+            with metrics.stage("engine_compute"):
+                sum(range(1000))
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_server_timing_sums_repeated_stages():
+    header = server_timing([("engine_compute", 0.001), ("json_save", 0.002), ("engine_compute", 0.003)], 0.01)
+    assert header == 'engine_compute;dur=4.00;desc="x2", json_save;dur=2.00, total;dur=10.00'
+
+
+def test_requested_profile_is_saved(client, isolated_settings):
+    response = client.get("/trabajo", headers={"X-Campo-Profile": "1"})
+
+    assert response.status_code == 200
+    assert 'engine_compute;dur=' in response.headers["server-timing"]
+    name = response.headers["x-campo-profile-file"]
+    assert "GET-trabajo" in name and (isolated_settings / "profiles" / name).exists()
+
+
+def test_unsampled_requests_are_untouched(client):
+    for headers in ({}, {"X-Campo-Profile": "0"}):
+        response = client.get("/trabajo", headers=headers)
+        assert response.status_code == 200
+        assert "server-timing" not in response.headers
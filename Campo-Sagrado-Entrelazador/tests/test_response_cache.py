@@ -0,0 +1,99 @@
+"""Caché de respuestas de Claude (src/services/response_cache.py)."""
+
+import json
+import os
+
+import pytest
+
+from src.services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache_dir(isolated_settings):
+    return isolated_settings / "cache" / "claude"
+
+
+def test_key_groups_temperatures_by_step(cache_dir):
+    cache = ResponseCache(cache_dir, temperature_step=0.1)
+    key = cache.key("haiku", "sys", "hola", 0.7, 100)
+
+    assert cache.key("haiku", "sys", "hola", 0.72, 100) == key
+    assert cache.key("haiku", "sys", "hola", 0.8, 100) != key
+    assert cache.key("haiku", "sys", "hola", 0.7, 200) != key
+
+
+def test_memory_and_disk_layers(cache_dir):
+    cache = ResponseCache(cache_dir)
+    key = cache.key("haiku", "sys", "hola", 0.5, 100)
+    assert cache.get(key) is None
+
+    cache.put(key, "respuesta", model="haiku")
+    assert cache.get(key) == "respuesta"
+
+    # Tras un reinicio la entrada sale del disco y vuelve a la memoria
+    restarted = ResponseCache(cache_dir)
+    assert restarted.get(key) == "respuesta"
+    assert restarted.get(key) == "respuesta"
+    assert (restarted.hits, restarted.disk_hits, restarted.misses) == (2, 1, 0)
+    assert json.loads((cache_dir / f"{key}.json").read_text())["model"] == "haiku"
+
+
+def test_entries_expire(cache_dir):
+    cache = ResponseCache(cache_dir, ttl_hours=0)
+    cache.put("k", "vieja")
+
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_lru_and_disk_limit(cache_dir):
+    cache = ResponseCache(cache_dir, max_entries=3)
+    for i in range(5):
+        cache.put(f"k{i}", f"v{i}")
+        # mtimes distintos: la poda en disco borra las más antiguas
+        os.utime(cache_dir / f"k{i}.json", (i, i))
+
+    assert cache.evictions == 2 and cache.stats()["entries"] == 3
+    assert sorted(path.stem for path in cache_dir.glob("*.json")) == ["k2", "k3", "k4"]
+    assert cache.get("k0") is None and cache.get("k4") == "v4"
+
+
+def test_unreadable_disk_entry_is_a_miss(cache_dir):
+    cache_dir.mkdir(parents=True)
+    (cache_dir / "roto.json").write_text("{")
+
+    cache = ResponseCache(cache_dir)
+    assert cache.get("roto") is None and cache.misses == 1
+
+
+def test_clear_and_stats(cache_dir):
+    cache = ResponseCache(cache_dir)
+    cache.put("k", "v")
+    cache.get("k")
+    cache.note_bypass()
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["bypassed"], stats["hit_ratio"]) == (1, 1, 1.0)
+
+    cache.clear()
+    assert cache.get("k") is None and not list(cache_dir.glob("*.json"))
+
+
+@pytest.mark.asyncio
+async def test_service_serves_repeats_from_cache(claude_stub, monkeypatch):
+    from src.services.ai_service import AsyncClaudeService
+    from src.utils.config import settings
+
+    monkeypatch.setattr(settings, "CLAUDE_CACHE_ENABLED", True)
+    service = AsyncClaudeService()
+    request = {"prompt": "¿A o B?", "system": "guía", "max_tokens": 50, "temperature": 0.5}
+    try:
+        first = await service.create_message(**request)
+        second = await service.create_message(**request)
+        fresh = await service.create_message(**request, fresh=True)
+    finally:
+        await service.aclose()
+
+    assert first == second == fresh
+    assert len(claude_stub.requests) == 2
+    assert (service.cache.hits, service.cache.bypassed) == (1, 1)
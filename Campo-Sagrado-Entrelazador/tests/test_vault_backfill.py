@@ -0,0 +1,100 @@
+"""Reconstrucción del vault desde el historial (src/services/vault_backfill.py)."""
+
+from datetime import datetime, timedelta
+
+from src.services import markdown_templates, vault_backfill
+from src.services.markdown_templates import SECTION_MARKER, MarkdownTemplate
+from src.services.obsidian_exporter import ObsidianExporter
+from src.services.vault_backfill import VaultBackfill
+
+
+def _backfill(history, isolated_settings, exporter=None) -> VaultBackfill:
+    return VaultBackfill(
+        history_store=history,
+        exporter=exporter or ObsidianExporter(),
+        workers=1,
+        io_workers=2,
+        checkpoint_path=isolated_settings / "cache" / "checkpoint.json",
+    )
+
+
+def _markers(path) -> list:
+    return [m.group(1) for m in SECTION_MARKER.finditer(path.read_bytes())]
+
+
+def test_backfill_into_empty_vault(history, isolated_settings, make_recommendations):
+    history.append_many(make_recommendations(2))
+    exporter = ObsidianExporter()
+    assert not exporter.daily_path.exists()
+
+    stats = _backfill(history, isolated_settings, exporter).run(progress=False)
+
+    assert stats["days"] == 1 and stats["sections"] == 2
+    assert len(_markers(exporter.daily_note_path("2024-03-01"))) == 2
+    assert (exporter.dashboards_path / "Current-Recommendation.md").exists()
+
+
+def test_backfill_with_empty_history(history, isolated_settings):
+    stats = _backfill(history, isolated_settings).run(progress=False)
+    assert stats == {"days": 0, "pending": 0, "sections": 0, "written": 0, "skipped": 0}
+
+
+def test_resume_from_checkpoint_does_not_duplicate(history, isolated_settings, make_recommendations):
+    history.append_many(make_recommendations(4, step=timedelta(hours=12)))
+    exporter = ObsidianExporter()
+    first = _backfill(history, isolated_settings, exporter).run(progress=False)
+    assert (first["days"], first["pending"], first["sections"]) == (2, 2, 4)
+
+    # Más recomendaciones del segundo día: solo ese día vuelve a procesarse
+    history.append_many(make_recommendations(2, start=datetime(2024, 3, 2, 22, 0), step=timedelta(minutes=30)))
+    second = _backfill(history, isolated_settings, ObsidianExporter()).run(progress=False)
+    assert (second["pending"], second["sections"]) == (1, 2)
+
+    third = _backfill(history, isolated_settings, ObsidianExporter()).run(progress=False)
+    assert (third["pending"], third["sections"]) == (0, 0)
+
+    for date_str, expected in (("2024-03-01", 2), ("2024-03-02", 4)):
+        ids = _markers(exporter.daily_note_path(date_str))
+        assert len(ids) == len(set(ids)) == expected
+
+
+def test_restart_after_lost_manifest_does_not_duplicate(history, isolated_settings, make_recommendations):
+    history.append_many(make_recommendations(3))
+    exporter = ObsidianExporter()
+    _backfill(history, isolated_settings, exporter).run(progress=False)
+    note = exporter.daily_note_path("2024-03-01")
+    content = note.read_bytes()
+
+    # Interrupción sin manifiesto ni checkpoint: las marcas de la nota bastan
+    exporter.manifest_path.unlink()
+    stats = _backfill(history, isolated_settings, ObsidianExporter()).run(restart=True, progress=False)
+
+    assert (stats["pending"], stats["sections"]) == (1, 0)
+    assert note.read_bytes() == content
+
+
+def test_template_change_rerenders_existing_sections(history, isolated_settings, make_recommendations, monkeypatch):
+    history.append_many(make_recommendations(3))
+    exporter = ObsidianExporter()
+    _backfill(history, isolated_settings, exporter).run(progress=False)
+    note = exporter.daily_note_path("2024-03-01")
+    placeholder = "> Espacio para notas personales sobre la implementación de esta recomendación..."
+    content = note.read_text(encoding="utf-8")
+    note.write_text(content.replace(placeholder, placeholder + "\nMe sirvió.", 1) + "\nNotas del día.\n", encoding="utf-8")
+
+    # Nueva plantilla: el render del pool (fork) y la versión del checkpoint la ven
+    source = markdown_templates.DAILY_SECTION_SOURCE.replace("🧠 Contexto Cognitivo", "🧠 Contexto del momento")
+    monkeypatch.setattr(markdown_templates, "DAILY_SECTION_TEMPLATE", MarkdownTemplate(source))
+    monkeypatch.setattr(markdown_templates, "SECTION_TEMPLATE_VERSION", "0ff1ce")
+    monkeypatch.setattr(vault_backfill, "TEMPLATE_VERSION", "otra")
+    stats = _backfill(history, isolated_settings, ObsidianExporter()).run(progress=False)
+
+    rerendered = note.read_text(encoding="utf-8")
+    assert (stats["pending"], stats["sections"]) == (1, 3)
+    assert "Contexto Cognitivo" not in rerendered and rerendered.count("Contexto del momento") == 3
+    assert rerendered.count(" v0ff1ce -->") == len(_markers(note)) == 3
+    assert rerendered.count(placeholder + "\nMe sirvió.") == 1 and rerendered.endswith("\nNotas del día.\n")
+
+    # Ya está al día: otra pasada no reescribe nada
+    again = _backfill(history, isolated_settings, ObsidianExporter()).run(restart=True, progress=False)
+    assert again["sections"] == 0 and note.read_text(encoding="utf-8") == rerendered
@@ -0,0 +1,131 @@
+"""Índice del vault (src/services/vault_index.py)."""
+
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from src.services.markdown_templates import render_daily_section
+from src.services.obsidian_exporter import ObsidianExporter
+from src.services.vault_index import VaultIndex
+
+PLACEHOLDER = "> Espacio para notas personales sobre la implementación de esta recomendación..."
+
+
+@pytest.fixture
+def vault(isolated_settings, make_recommendations):
+    """Vault exportado de verdad: el dashboard y dos notas diarias (3 y 2 secciones)."""
+    exporter = ObsidianExporter()
+    recommendations = make_recommendations(5, step=timedelta(hours=6))
+    exporter.export_many(recommendations)
+    return exporter, recommendations
+
+
+def _index(isolated_settings) -> VaultIndex:
+    return VaultIndex(index_path=isolated_settings / "cache" / "vault_index.json")
+
+
+def _write_reflection(path, text: str, occurrence: int = 1) -> None:
+    content = path.read_text(encoding="utf-8")
+    parts = content.split(PLACEHOLDER)
+    parts[occurrence - 1] += text
+    path.write_text(PLACEHOLDER.join(parts), encoding="utf-8")
+
+
+def test_indexes_sections_of_exported_notes(vault, isolated_settings):
+    exporter, recommendations = vault
+    index = _index(isolated_settings)
+
+    assert len(index) == 3
+    note = index.note("01-DAILY/2024-03-01-Recommendation.md")
+    assert note["date"] == "2024-03-01" and len(note["sections"]) == 3
+    section = index.section(render_daily_section(recommendations[0])[0])
+    assert section["option"] == recommendations[0].recommended_option
+    assert section["time"] == recommendations[0].timestamp.strftime("%H:%M")
+    # El marcador de posición no cuenta como reflexión
+    assert index.feedback_for(recommendations[0]) is None
+    assert index.reflections() == []
+
+
+def test_refresh_reads_only_changed_notes(vault, isolated_settings):
+    exporter, recommendations = vault
+    index = _index(isolated_settings)
+    index.refresh()
+    parsed = index.parsed
+
+    _write_reflection(exporter.daily_note_path("2024-03-02"), "\nMe sentí con foco.")
+    assert index.refresh() == 1 and index.parsed == parsed + 1
+
+    assert index.feedback_for(recommendations[3]).endswith("Me sentí con foco.")
+    assert [item["date"] for item in index.reflections()] == ["2024-03-02"]
+    assert index.reflections(since=date(2024, 3, 3)) == []
+    assert index.reflections(until=date(2024, 3, 2)) == []
+
+
+def test_persisted_index_survives_restart(vault, isolated_settings):
+    exporter, recommendations = vault
+    _index(isolated_settings).refresh()
+
+    restarted = _index(isolated_settings)
+    assert restarted.refresh() == 0 and restarted.parsed == 0
+    assert len(restarted) == 3
+    assert restarted.section(render_daily_section(recommendations[4])[0])["date"] == "2024-03-02"
+
+
+def test_deleted_and_updated_paths(vault, isolated_settings):
+    exporter, recommendations = vault
+    index = _index(isolated_settings)
+    index.refresh()
+    second = exporter.daily_note_path("2024-03-02")
+
+    _write_reflection(exporter.daily_note_path("2024-03-01"), "\nBien.", occurrence=2)
+    index.update_path(exporter.daily_note_path("2024-03-01"))
+    assert index.feedback_for(recommendations[1]).endswith("Bien.")
+
+    second.unlink()
+    index.update_path(second)
+    assert len(index) == 2 and index.section(render_daily_section(recommendations[3])[0]) is None
+
+    # Rutas fuera del vault se ignoran
+    index.update_path(isolated_settings / "otra.md")
+    index.stop_watching()
+    assert _index(isolated_settings).note("01-DAILY/2024-03-02-Recommendation.md") is None
+
+
+def test_legacy_note_and_bad_frontmatter(isolated_settings):
+    daily = isolated_settings / "vault" / "01-DAILY"
+    daily.mkdir(parents=True)
+    (daily / "2024-01-05-Recommendation.md").write_text(
+        "---\ndate: [sin cerrar\n---\n# Nota\n\n## 💭 Reflexiones\n\nUna nota antigua.\n", encoding="utf-8"
+    )
+    (daily / "vacía.md").write_bytes(b"")
+    (daily / ".oculta.md").write_text("no se indexa")
+
+    index = _index(isolated_settings)
+
+    assert len(index) == 2
+    note = index.note("01-DAILY/2024-01-05-Recommendation.md")
+    assert note["frontmatter"] == {} and note["date"] == "2024-01-05"
+    assert note["sections"] == [{"id": None, "time": None, "option": None, "reflection": "Una nota antigua."}]
+
+
+def test_watchdog_keeps_index_current(vault, isolated_settings):
+    exporter, recommendations = vault
+    index = _index(isolated_settings)
+    assert index.start_watching()
+    try:
+        _write_reflection(exporter.daily_note_path("2024-03-01"), "\nVigilado.")
+        for _ in range(100):
+            if index.feedback_for(recommendations[0]):
+                break
+            time.sleep(0.05)
+    finally:
+        index.stop_watching()
+
+    assert index.feedback_for(recommendations[0]).endswith("Vigilado.")
+
+
+def test_missing_vault(isolated_settings):
+    index = _index(isolated_settings)
+    assert len(index) == 0
+    assert not index.start_watching()